@@ -0,0 +1,136 @@
+import json
+import os
+
+import fragment_cache
+from copy_directory import copy_file
+from manifest import hash_bytes, hash_file, load_manifest, remove_output, save_manifest
+
+ASSET_MANIFEST_FILENAME = "asset-manifest.json"
+FINGERPRINT_LENGTH = 8
+
+# URL -> fingerprinted URL for the current build, or None when fingerprinting
+# is off. active_digest identifies the whole mapping, for memoized templates;
+# pages depend only on the URLs they reference, see urls_digest.
+active_urls = None
+active_digest = ""
+
+
+def configure(urls):
+    global active_urls, active_digest
+    digest = hash_bytes(json.dumps(urls, sort_keys=True).encode("utf-8")) if urls else ""
+    if digest != active_digest:
+        # Memoized blocks may link to the old names
+        fragment_cache.configure(fragment_cache.max_bytes())
+    active_urls = urls
+    active_digest = digest
+
+
+def asset_url(url):
+    # /images/a.png -> /images/a.3f2a9c1b.png; anything not in the manifest is left alone
+    if active_urls is None or not url.startswith("/"):
+        return url
+    end = len(url)
+    for separator in "?#":
+        index = url.find(separator)
+        if index != -1 and index < end:
+            end = index
+    fingerprinted = active_urls.get(url[:end])
+    if fingerprinted is None:
+        return url
+    return fingerprinted + url[end:]
+
+
+def urls_digest(urls):
+    # Identifies the fingerprinted names of the given URLs, "" when none of
+    # them has one, so a page only changes with the assets it references
+    if active_urls is None:
+        return ""
+    renamed = sorted(set((url, asset_url(url)) for url in urls if asset_url(url) != url))
+    return hash_bytes(json.dumps(renamed).encode("utf-8")) if renamed else ""
+
+
+def fingerprinted_name(relative_path, digest):
+    stem, extension = os.path.splitext(relative_path)
+    return f"{stem}.{digest[:FINGERPRINT_LENGTH]}{extension}"
+
+
+def url_for(relative_path):
+    return "/" + relative_path.replace(os.sep, "/")
+
+
+def fingerprint_assets(dir_path_static, dest_dir_path):
+    # Copy every static file to a content-hashed name next to the original
+    # and return the URL mapping. Hashes are reused while a file's mtime and
+    # size stay put, and a name only changes when the content does.
+    manifest = load_manifest(dest_dir_path)
+    previous = manifest.get("fingerprints", {})
+    fingerprints = {}
+    urls = {}
+    stats = {"written": 0, "unchanged": 0, "pruned": 0}
+
+    for root, dirs, files in os.walk(dir_path_static):
+        dirs.sort()
+        for file in sorted(files):
+            from_path = os.path.join(root, file)
+            relative_path = os.path.relpath(from_path, dir_path_static)
+            stat = os.stat(from_path)
+            known = previous.get(relative_path)
+            if known is not None and known["mtime_ns"] == stat.st_mtime_ns and known["size"] == stat.st_size:
+                digest = known["hash"]
+            else:
+                digest = hash_file(from_path)
+            fingerprinted = fingerprinted_name(relative_path, digest)
+            dest_path = os.path.join(dest_dir_path, fingerprinted)
+            if os.path.exists(dest_path):
+                stats["unchanged"] += 1
+            else:
+                os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+                copy_file(from_path, dest_path)
+                stats["written"] += 1
+            fingerprints[relative_path] = {
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "hash": digest,
+                "path": fingerprinted,
+            }
+            urls[url_for(relative_path)] = url_for(fingerprinted)
+
+    current = set(entry["path"] for entry in fingerprints.values())
+    for entry in previous.values():
+        if entry["path"] not in current:
+            remove_output(dest_dir_path, entry["path"])
+            stats["pruned"] += 1
+
+    write_asset_manifest(dest_dir_path, urls)
+    manifest["fingerprints"] = fingerprints
+    save_manifest(dest_dir_path, manifest)
+    return urls, stats
+
+
+def write_asset_manifest(dest_dir_path, urls):
+    # Published with the site, for anything outside the build that needs the names
+    path = os.path.join(dest_dir_path, ASSET_MANIFEST_FILENAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(urls, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def remove_fingerprints(dest_dir_path):
+    # Fingerprinting switched off: drop the hashed copies an earlier build wrote
+    manifest = load_manifest(dest_dir_path)
+    previous = manifest.pop("fingerprints", None)
+    if previous is None:
+        return 0
+    for entry in previous.values():
+        remove_output(dest_dir_path, entry["path"])
+    remove_output(dest_dir_path, ASSET_MANIFEST_FILENAME)
+    save_manifest(dest_dir_path, manifest)
+    return len(previous)
+
+
+def format_fingerprint_stats(stats):
+    return (
+        f"Fingerprinted assets: {stats['written']} written, {stats['unchanged']} unchanged, "
+        f"{stats['pruned']} pruned"
+    )
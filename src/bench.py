@@ -0,0 +1,265 @@
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import tempfile
+import time
+
+from copy_directory import copy_files_recursive
+from inline_markdown import text_to_textnodes
+from markdown_blocks import inline_texts, markdown_to_blocks, markdown_to_html_node, scan_blocks
+from template import compile_template
+
+WORDS = ["middle", "earth", "ring", "shire", "elves", "dwarves", "wizard", "tower", "river", "song"]
+STAGES = (
+    "markdown_to_blocks",
+    "text_to_textnodes",
+    "markdown_to_html_node",
+    "to_html",
+    "template",
+    "write",
+    "copy_files_recursive",
+)
+BENCH_TEMPLATE = "<html><head><title>{{ Title }}</title></head><body><article>{{ Content }}</article></body></html>"
+
+
+def add_arguments(parser):
+    parser.add_argument("--pages", type=int, default=200, help="number of synthetic pages")
+    parser.add_argument("--paragraphs", type=int, default=10, help="paragraphs per page")
+    parser.add_argument("--paragraph-words", type=int, default=80, help="words per paragraph")
+    parser.add_argument("--link-density", type=float, default=0.05, help="fraction of words that are links")
+    parser.add_argument("--image-density", type=float, default=0.01, help="fraction of words that are images")
+    parser.add_argument("--list-depth", type=int, default=2, help="lists per list group (one per nesting level)")
+    parser.add_argument("--code-blocks", type=int, default=1, help="fenced code blocks per page")
+    parser.add_argument("--static-files", type=int, default=50, help="files in the synthetic static directory")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="take the best of N runs per stage")
+    parser.add_argument("--save", metavar="PATH", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a saved JSON baseline")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="flag stages slower than the baseline by more than this fraction",
+    )
+
+
+def corpus_params(args):
+    return {
+        "pages": args.pages,
+        "paragraphs": args.paragraphs,
+        "paragraph_words": args.paragraph_words,
+        "link_density": args.link_density,
+        "image_density": args.image_density,
+        "list_depth": args.list_depth,
+        "code_blocks": args.code_blocks,
+        "static_files": args.static_files,
+        "seed": args.seed,
+    }
+
+
+def generate_corpus(
+    root,
+    pages=200,
+    paragraphs=10,
+    paragraph_words=80,
+    link_density=0.05,
+    image_density=0.01,
+    list_depth=2,
+    code_blocks=1,
+    static_files=50,
+    seed=0,
+    size_skew=(1,),
+):
+    # Writes root/contents/pageN/index.md and root/static/, same seed same site.
+    # Each page gets paragraphs times a multiplier drawn from size_skew.
+    rng = random.Random(seed)
+    content_dir = os.path.join(root, "contents")
+    static_dir = os.path.join(root, "static")
+
+    for i in range(pages):
+        blocks = [f"# Page {i}"]
+        page_paragraphs = paragraphs * rng.choice(size_skew)
+        for p in range(page_paragraphs):
+            if p % 4 == 1:
+                blocks.append(f"## Section {p}")
+            blocks.append(synthetic_paragraph(rng, paragraph_words, link_density, image_density, pages))
+            if p % 3 == 2:
+                blocks.append(synthetic_list(rng, list_depth))
+            if p % 5 == 4:
+                blocks.append("> " + " ".join(rng.choice(WORDS) for _ in range(20)))
+        for _ in range(code_blocks):
+            code = "\n".join(f"def {rng.choice(WORDS)}_{n}():\n    return {n}" for n in range(3))
+            blocks.append(f"```\n{code}\n```")
+        page_dir = os.path.join(content_dir, f"page{i}")
+        os.makedirs(page_dir)
+        with open(os.path.join(page_dir, "index.md"), "w") as f:
+            f.write("\n\n".join(blocks))
+
+    os.makedirs(os.path.join(static_dir, "images"))
+    for i in range(static_files):
+        with open(os.path.join(static_dir, "images", f"image{i}.png"), "wb") as f:
+            # Sizes follow the seed; the bytes themselves don't matter
+            f.write(os.urandom(rng.randrange(1024, 65536)))
+    return content_dir, static_dir
+
+
+def synthetic_paragraph(rng, words, link_density, image_density, pages):
+    parts = []
+    for _ in range(words):
+        word = rng.choice(WORDS)
+        roll = rng.random()
+        if roll < image_density:
+            parts.append(f"![{word}](/images/image{rng.randrange(50)}.png)")
+        elif roll < image_density + link_density:
+            parts.append(f"[{word}](/page{rng.randrange(pages)}/)")
+        elif roll < image_density + link_density + 0.05:
+            parts.append(f"**{word}**")
+        elif roll < image_density + link_density + 0.08:
+            parts.append(f"*{word}*")
+        elif roll < image_density + link_density + 0.10:
+            parts.append(f"`{word}`")
+        else:
+            parts.append(word)
+    return " ".join(parts)
+
+
+def synthetic_list(rng, depth):
+    # The parser has no nested lists, so each level is a list block of its
+    # own, alternating "- ", "1. " and "* " items
+    lists = []
+    for level in range(depth):
+        lines = []
+        for item in range(4):
+            word = rng.choice(WORDS)
+            if level % 3 == 0:
+                lines.append(f"- {word} {item}")
+            elif level % 3 == 1:
+                lines.append(f"{item + 1}. {word} level {level}")
+            else:
+                lines.append(f"* {word} level {level}")
+        lists.append("\n".join(lines))
+    return "\n\n".join(lists)
+
+
+def best_of(repeat, func):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def run_stages(content_dir, static_dir, work_dir, repeat=3):
+    markdowns = []
+    for root, dirs, files in os.walk(content_dir):
+        for file in sorted(files):
+            with open(os.path.join(root, file)) as f:
+                markdowns.append(f.read())
+    template = compile_template(BENCH_TEMPLATE)
+
+    blocks = [list(scan_blocks(markdown)) for markdown in markdowns]
+    texts = [text for page_blocks in blocks for block in page_blocks for text in inline_texts(block)]
+    nodes = [markdown_to_html_node(markdown) for markdown in markdowns]
+    htmls = [node.to_html() for node in nodes]
+    pages = [template.render({"Title": "Bench", "Content": html}) for html in htmls]
+    out_dir = os.path.join(work_dir, "out")
+    os.makedirs(out_dir, exist_ok=True)
+
+    def write_pages():
+        for i, page in enumerate(pages):
+            with open(os.path.join(out_dir, f"page{i}.html"), "w") as f:
+                f.write(page)
+
+    def copy_static():
+        dest_dir = os.path.join(work_dir, "static-copy")
+        if os.path.exists(dest_dir):
+            shutil.rmtree(dest_dir)
+        copy_files_recursive(static_dir, dest_dir)
+
+    stages = {
+        "markdown_to_blocks": lambda: [markdown_to_blocks(markdown) for markdown in markdowns],
+        "text_to_textnodes": lambda: [text_to_textnodes(text) for text in texts],
+        "markdown_to_html_node": lambda: [markdown_to_html_node(markdown) for markdown in markdowns],
+        "to_html": lambda: [node.to_html() for node in nodes],
+        "template": lambda: [template.render({"Title": "Bench", "Content": html}) for html in htmls],
+        "write": write_pages,
+        "copy_files_recursive": copy_static,
+    }
+    results = {}
+    # copy_files_recursive prints each file it copies
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name in STAGES:
+            results[name] = best_of(repeat, stages[name])
+    return results
+
+
+def compare_results(results, baseline, threshold):
+    regressions = []
+    rows = []
+    for name in STAGES:
+        current = results["stages"].get(name)
+        previous = baseline["stages"].get(name)
+        if current is None or previous is None or previous == 0:
+            continue
+        ratio = current / previous
+        regressed = ratio > 1 + threshold
+        rows.append((name, previous, current, ratio, regressed))
+        if regressed:
+            regressions.append(name)
+    return rows, regressions
+
+
+def run(args):
+    params = corpus_params(args)
+    root = tempfile.mkdtemp(prefix="static-site-bench-")
+    try:
+        content_dir, static_dir = generate_corpus(root, **params)
+        stages = run_stages(content_dir, static_dir, root, repeat=args.repeat)
+    finally:
+        shutil.rmtree(root)
+
+    results = {
+        "params": params,
+        "python": platform.python_version(),
+        "stages": stages,
+    }
+    print(f"{'stage':<24} {'seconds':>9} {'us/page':>9}")
+    for name in STAGES:
+        print(f"{name:<24} {stages[name]:>9.4f} {stages[name] * 1e6 / max(args.pages, 1):>9.1f}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("params") != params:
+            print("Warning: baseline was recorded with different corpus parameters")
+        rows, regressions = compare_results(results, baseline, args.threshold)
+        print(f"\n{'stage':<24} {'baseline':>9} {'current':>9} {'ratio':>7}")
+        for name, previous, current, ratio, regressed in rows:
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{name:<24} {previous:>9.4f} {current:>9.4f} {ratio:>6.2f}x{flag}")
+        if regressions:
+            print(f"{len(regressions)} stage(s) regressed by more than {args.threshold:.0%}")
+            return False
+    return True
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Benchmark each build stage on a synthetic site")
+    add_arguments(parser)
+    if not run(parser.parse_args()):
+        sys.exit(1)
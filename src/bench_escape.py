@@ -0,0 +1,58 @@
+import argparse
+import html
+import timeit
+
+from htmlnode import LeafNode, escape_text
+
+TRANSLATE_TABLE = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+
+SAMPLES = {
+    "clean short": "the road goes ever on",
+    "clean long": "and whither then I cannot say " * 20,
+    "dirty short": "a < b && c > d",
+    "dirty long": "x" * 600 + " <end>",
+}
+
+
+def unescaped(node):
+    # The renderer before escaping, as a floor
+    return f"<{node.tag}>{node.value}</{node.tag}>"
+
+
+def with_html_escape(node):
+    return f"<{node.tag}>{html.escape(node.value, quote=False)}</{node.tag}>"
+
+
+def with_translate(node):
+    return f"<{node.tag}>{node.value.translate(TRANSLATE_TABLE)}</{node.tag}>"
+
+
+def with_escape_text(node):
+    return f"<{node.tag}>{escape_text(node.value)}</{node.tag}>"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time LeafNode rendering with each way of escaping its text")
+    parser.add_argument("--number", type=int, default=200000, help="leaves rendered per timing")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    renderers = [
+        ("unescaped", unescaped),
+        ("html.escape", with_html_escape),
+        ("translate", with_translate),
+        ("escape_text", with_escape_text),
+        ("to_html", LeafNode.to_html),
+    ]
+    print(f"{'sample':<12}" + "".join(f" {name:>12}" for name, render in renderers) + "   (ns per leaf)")
+    for sample, text in SAMPLES.items():
+        node = LeafNode("p", text)
+        line = f"{sample:<12}"
+        for name, render in renderers:
+            seconds = min(timeit.repeat(lambda: render(node), number=args.number, repeat=args.repeat))
+            line += f" {seconds / args.number * 1e9:>12.0f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
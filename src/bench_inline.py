@@ -0,0 +1,46 @@
+import argparse
+import timeit
+
+from inline_markdown import (
+    split_nodes_delimiter,
+    split_nodes_image,
+    split_nodes_link,
+    text_to_textnodes,
+)
+from textnode import TextNode, text_type_text, text_type_bold, text_type_italic, text_type_code
+
+
+def staged_text_to_textnodes(text):
+    nodes = [TextNode(text, text_type_text)]
+    nodes = split_nodes_delimiter(nodes, "**", text_type_bold)
+    nodes = split_nodes_delimiter(nodes, "*", text_type_italic)
+    nodes = split_nodes_delimiter(nodes, "`", text_type_code)
+    nodes = split_nodes_image(nodes)
+    nodes = split_nodes_link(nodes)
+    return nodes
+
+
+def link_paragraph(links):
+    parts = []
+    for i in range(links):
+        parts.append(f"see [page {i}](/pages/{i}) and **note {i}**")
+        if i % 10 == 0:
+            parts.append(f"![figure {i}](/images/{i}.png)")
+    return " ".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the inline tokenizer against the staged pipeline")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'links':>6} {'staged ms':>10} {'scanner ms':>11} {'speedup':>8}")
+    for links in (10, 100, 500, 1000, 2000):
+        text = link_paragraph(links)
+        staged = min(timeit.repeat(lambda: staged_text_to_textnodes(text), number=1, repeat=args.repeat))
+        scanner = min(timeit.repeat(lambda: text_to_textnodes(text), number=1, repeat=args.repeat))
+        print(f"{links:>6} {staged * 1000:>10.2f} {scanner * 1000:>11.2f} {staged / scanner:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
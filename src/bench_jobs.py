@@ -0,0 +1,78 @@
+import argparse
+import contextlib
+import filecmp
+import io
+import os
+import shutil
+import tempfile
+import time
+
+from bench import generate_corpus
+from extract import generate_pages_recursive
+
+# A few pages dominate, like a real site, so largest-first scheduling matters
+PAGE_SIZE_SKEW = (1, 1, 1, 2, 8)
+
+
+def job_counts(max_jobs):
+    counts = [1]
+    while counts[-1] * 2 <= max_jobs:
+        counts.append(counts[-1] * 2)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark page generation across --jobs values")
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--paragraphs", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-jobs", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp()
+    try:
+        content_dir, static_dir = generate_corpus(
+            root,
+            pages=args.pages,
+            paragraphs=args.paragraphs,
+            static_files=0,
+            seed=args.seed,
+            size_skew=PAGE_SIZE_SKEW,
+        )
+        template_path = os.path.join(root, "template.html")
+        with open(template_path, "w") as f:
+            f.write("<title>{{ Title }}</title><article>{{ Content }}</article>")
+
+        baseline = None
+        serial_dir = None
+        print(f"{'jobs':>5} {'seconds':>9} {'speedup':>8}")
+        for jobs in job_counts(args.max_jobs):
+            dest_dir = os.path.join(root, f"public-{jobs}")
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_pages_recursive(content_dir, template_path, dest_dir, jobs=jobs)
+            elapsed = time.perf_counter() - start
+            if baseline is None:
+                baseline = elapsed
+                serial_dir = dest_dir
+            else:
+                # Parallel output must match the serial build byte for byte
+                compare_trees(serial_dir, dest_dir)
+            print(f"{jobs:>5} {elapsed:>9.3f} {baseline / elapsed:>7.2f}x")
+    finally:
+        shutil.rmtree(root)
+
+
+def compare_trees(left, right):
+    for dirpath, dirnames, filenames in os.walk(left):
+        for filename in filenames:
+            if not filename.endswith(".html"):
+                continue
+            left_path = os.path.join(dirpath, filename)
+            right_path = os.path.join(right, os.path.relpath(left_path, left))
+            if not filecmp.cmp(left_path, right_path, shallow=False):
+                raise AssertionError(f"{right_path} differs from the serial build")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import timeit
+import tracemalloc
+
+from textnode import TextNode, text_node_to_html_node, text_type_text, text_type_link, text_type_image
+
+
+class DictTextNode:
+    # The pre-slots layout: a __dict__ per node and string text types
+    def __init__(self, text, text_type, url=None):
+        self.text = text
+        self.text_type = text_type
+        self.url = url
+
+
+class DictLeafNode:
+    def __init__(self, tag, value, props=None):
+        self.tag = tag
+        self.value = value
+        self.children = None
+        self.props = props
+
+
+def dict_text_node_to_html_node(text_node):
+    if text_node.text_type == "text":
+        return DictLeafNode(None, text_node.text)
+    if text_node.text_type == "link":
+        return DictLeafNode("a", text_node.text, {"href": text_node.url})
+    if text_node.text_type == "image":
+        return DictLeafNode("img", "", {"src": text_node.url, "alt": text_node.text})
+    raise ValueError(f"Invalid text type: {text_node.text_type}")
+
+
+def bytes_per_node(build, count):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    nodes = build(count)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del nodes
+    return (after - before) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure bytes per node for dict-backed and slotted nodes")
+    parser.add_argument("--nodes", type=int, default=100000)
+    args = parser.parse_args()
+
+    # Text is shared so only the node objects themselves are measured
+    text = "some text"
+    url = "/images/rivendell.png"
+    text_types = [("text", text_type_text), ("link", text_type_link), ("image", text_type_image)]
+
+    def dict_text_nodes(count):
+        return [DictTextNode(text, text_types[i % 3][0], url) for i in range(count)]
+
+    def slotted_text_nodes(count):
+        return [TextNode(text, text_types[i % 3][1], url) for i in range(count)]
+
+    dict_sources = dict_text_nodes(args.nodes)
+    slotted_sources = slotted_text_nodes(args.nodes)
+
+    def dict_leaves(count):
+        return [dict_text_node_to_html_node(node) for node in dict_sources[:count]]
+
+    def slotted_leaves(count):
+        return [text_node_to_html_node(node) for node in slotted_sources[:count]]
+
+    print(f"{'node':<10} {'dict B/node':>12} {'slots B/node':>13}")
+    print(f"{'TextNode':<10} {bytes_per_node(dict_text_nodes, args.nodes):>12.1f} "
+          f"{bytes_per_node(slotted_text_nodes, args.nodes):>13.1f}")
+    print(f"{'LeafNode':<10} {bytes_per_node(dict_leaves, args.nodes):>12.1f} "
+          f"{bytes_per_node(slotted_leaves, args.nodes):>13.1f}")
+
+    dict_time = timeit.timeit(lambda: dict_leaves(args.nodes), number=3) / 3
+    slotted_time = timeit.timeit(lambda: slotted_leaves(args.nodes), number=3) / 3
+    print(f"text_node_to_html_node: if-chain {dict_time * 1e9 / args.nodes:.0f} ns/node, "
+          f"dispatch table {slotted_time * 1e9 / args.nodes:.0f} ns/node")
+
+
+if __name__ == "__main__":
+    main()
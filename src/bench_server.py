@@ -0,0 +1,130 @@
+import argparse
+import asyncio
+import functools
+import http.client
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from static_server import StaticServer, start_server
+
+
+def write_site(root, small_files, large_files, seed):
+    # Small pages the file cache can hold, and large images that go out with sendfile
+    rng = random.Random(seed)
+    paths = []
+    for i in range(small_files):
+        path = f"/page{i}/index.html"
+        os.makedirs(os.path.join(root, f"page{i}"))
+        with open(os.path.join(root, path.lstrip("/")), "w") as f:
+            f.write("<p>" + "lorem ipsum " * rng.randrange(200, 800) + "</p>")
+        paths.append(path)
+    large_paths = []
+    for i in range(large_files):
+        path = f"/image{i}.png"
+        with open(os.path.join(root, path.lstrip("/")), "wb") as f:
+            f.write(os.urandom(rng.randrange(512 * 1024, 2 * 1024 * 1024)))
+        large_paths.append(path)
+    return paths, large_paths
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def run_http_server(root, ready):
+    handler = functools.partial(QuietHandler, directory=root)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    ready.send(httpd.server_address[1])
+    httpd.serve_forever()
+
+
+def run_static_server(root, ready):
+    loop = asyncio.new_event_loop()
+    listener = loop.run_until_complete(start_server(StaticServer(root), 0, "127.0.0.1"))
+    ready.send(listener.sockets[0].getsockname()[1])
+    loop.run_forever()
+
+
+def load(port, paths, requests, concurrency):
+    # Each client thread keeps one connection open for as long as the server allows
+    latencies = []
+    lock = threading.Lock()
+    per_client = requests // concurrency
+
+    def client(seed):
+        rng = random.Random(seed)
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        timings = []
+        for _ in range(per_client):
+            start = time.perf_counter()
+            connection.request("GET", rng.choice(paths))
+            response = connection.getresponse()
+            response.read()
+            timings.append(time.perf_counter() - start)
+        connection.close()
+        with lock:
+            latencies.extend(timings)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests_per_second": len(latencies) / elapsed,
+        "p50": latencies[len(latencies) // 2] * 1000,
+        "p99": latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the asyncio file server against http.server")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--small-files", type=int, default=200)
+    parser.add_argument("--large-files", type=int, default=5)
+    parser.add_argument("--large-fraction", type=float, default=0.05, help="share of requests for large files")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp()
+    try:
+        small_paths, large_paths = write_site(root, args.small_files, args.large_files, args.seed)
+        # Weight the path list so large files get roughly --large-fraction of requests
+        large_count = int(len(small_paths) * args.large_fraction / max(1 - args.large_fraction, 0.01))
+        paths = list(small_paths)
+        if large_paths:
+            paths += [large_paths[i % len(large_paths)] for i in range(large_count)]
+
+        print(f"{'server':<14} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+        for name, target in (("http.server", run_http_server), ("static_server", run_static_server)):
+            # Each server runs in its own process so it doesn't share a GIL with the clients
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=target, args=(root, sender), daemon=True)
+            process.start()
+            try:
+                port = receiver.recv()
+                result = load(port, paths, args.requests, args.concurrency)
+            finally:
+                process.terminate()
+                process.join()
+            print(
+                f"{name:<14} {result['requests_per_second']:>9.0f} "
+                f"{result['p50']:>8.2f} {result['p99']:>8.2f}"
+            )
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
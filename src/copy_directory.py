@@ -1,16 +1,161 @@
 import os
 import shutil
 
+from manifest import hash_file, load_manifest, remove_output, save_manifest
 
-def copy_files_recursive(source_dir_path, dest_dir_path):
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# ioctl number for FICLONE (_IOW(0x94, 9, int)), used for reflinks on btrfs/xfs
+FICLONE = 0x40049409
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def new_copy_stats():
+    return {
+        "copied_files": 0,
+        "copied_bytes": 0,
+        "skipped_files": 0,
+        "skipped_bytes": 0,
+        "pruned_files": 0,
+        "methods": {},
+        "synced": [],
+    }
+
+
+def copy_files_recursive(source_dir_path, dest_dir_path, checksum=False, hardlink=False, stats=None, root=None):
+    if stats is None:
+        stats = new_copy_stats()
+    if root is None:
+        root = dest_dir_path
     if not os.path.exists(dest_dir_path):
         os.mkdir(dest_dir_path)
 
-    for filename in os.listdir(source_dir_path):
+    for filename in sorted(os.listdir(source_dir_path)):
         from_path = os.path.join(source_dir_path, filename)
         dest_path = os.path.join(dest_dir_path, filename)
-        print(f" * {from_path} -> {dest_path}")
         if os.path.isfile(from_path):
-            shutil.copy(from_path, dest_path)
+            size = os.path.getsize(from_path)
+            stats["synced"].append(os.path.relpath(dest_path, root))
+            if is_up_to_date(from_path, dest_path, checksum):
+                stats["skipped_files"] += 1
+                stats["skipped_bytes"] += size
+                continue
+            print(f" * {from_path} -> {dest_path}")
+            method = copy_file(from_path, dest_path, hardlink)
+            stats["copied_files"] += 1
+            stats["copied_bytes"] += size
+            stats["methods"][method] = stats["methods"].get(method, 0) + 1
         else:
-            copy_files_recursive(from_path, dest_path)
+            copy_files_recursive(from_path, dest_path, checksum, hardlink, stats, root)
+    return stats
+
+
+def sync_static(source_dir_path, dest_dir_path, checksum=False, hardlink=False):
+    stats = copy_files_recursive(source_dir_path, dest_dir_path, checksum, hardlink)
+
+    # Prune files we copied on an earlier run whose source is gone. Only
+    # files recorded in the manifest are touched, so generated pages that
+    # share the output directory are left alone.
+    manifest = load_manifest(dest_dir_path)
+    synced = set(stats["synced"])
+    for relative_path in manifest.get("static", []):
+        if relative_path not in synced:
+            print(f" * pruning {os.path.join(dest_dir_path, relative_path)}")
+            remove_output(dest_dir_path, relative_path)
+            stats["pruned_files"] += 1
+    manifest["static"] = sorted(synced)
+    save_manifest(dest_dir_path, manifest)
+    return stats
+
+
+def is_up_to_date(from_path, dest_path, checksum=False):
+    if not os.path.isfile(dest_path):
+        return False
+    from_stat = os.stat(from_path)
+    dest_stat = os.stat(dest_path)
+    if from_stat.st_size != dest_stat.st_size:
+        return False
+    if checksum:
+        return hash_file(from_path) == hash_file(dest_path)
+    return int(from_stat.st_mtime) == int(dest_stat.st_mtime)
+
+
+def copy_file(from_path, dest_path, hardlink=False):
+    # Never write through an existing file: it may be a hardlink to the source
+    if os.path.lexists(dest_path):
+        os.remove(dest_path)
+
+    if hardlink:
+        try:
+            os.link(from_path, dest_path)
+            return "hardlink"
+        except OSError:
+            pass
+
+    with open(from_path, "rb") as from_file, open(dest_path, "wb") as to_file:
+        method = copy_file_contents(from_file, to_file)
+    shutil.copystat(from_path, dest_path)
+    return method
+
+
+def copy_file_contents(from_file, to_file):
+    from_fd = from_file.fileno()
+    to_fd = to_file.fileno()
+    size = os.fstat(from_fd).st_size
+
+    if fcntl is not None:
+        try:
+            fcntl.ioctl(to_fd, FICLONE, from_fd)
+            return "reflink"
+        except OSError:
+            pass
+
+    if hasattr(os, "copy_file_range"):
+        try:
+            copy_with(os.copy_file_range, from_fd, to_fd, size)
+            return "copy_file_range"
+        except OSError:
+            os.ftruncate(to_fd, 0)
+
+    if hasattr(os, "sendfile"):
+        try:
+            copy_with(sendfile_at, from_fd, to_fd, size)
+            return "sendfile"
+        except OSError:
+            os.ftruncate(to_fd, 0)
+
+    from_file.seek(0)
+    to_file.seek(0)
+    shutil.copyfileobj(from_file, to_file, COPY_CHUNK_SIZE)
+    return "copy"
+
+
+def copy_with(copy_func, from_fd, to_fd, size):
+    offset = 0
+    while offset < size:
+        copied = copy_func(from_fd, to_fd, min(COPY_CHUNK_SIZE, size - offset), offset, offset)
+        if copied == 0:
+            break
+        offset += copied
+    if offset != size:
+        raise OSError(f"short copy: {offset} of {size} bytes")
+
+
+def sendfile_at(from_fd, to_fd, count, from_offset, to_offset):
+    os.lseek(to_fd, to_offset, os.SEEK_SET)
+    return os.sendfile(to_fd, from_fd, from_offset, count)
+
+
+def format_copy_stats(stats):
+    methods = ", ".join(f"{name}: {count}" for name, count in sorted(stats["methods"].items()))
+    summary = (
+        f"Static files: {stats['copied_files']} copied ({stats['copied_bytes']} bytes), "
+        f"{stats['skipped_files']} skipped ({stats['skipped_bytes']} bytes), "
+        f"{stats['pruned_files']} pruned"
+    )
+    if methods:
+        summary += f" [{methods}]"
+    return summary
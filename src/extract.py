@@ -1,32 +1,148 @@
+import argparse
+import datetime
 import os
-from markdown_blocks import markdown_to_html_node
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
+import assets
+import fragment_cache
+import image_size
+from htmlnode import escape_attribute
+from includes import expand_includes, include_tree, partials_dir, read_partial
+from inline_markdown import text_to_textnodes
+from link_graph import linking_pages, prefetch_hints, source_links
+from markdown_blocks import block_type_paragraph, iter_lines, markdown_to_html_node, scan_blocks
+from metadata import MetadataIndex, layout_path, split_front_matter
+from manifest import (
+    GENERATOR_VERSION,
+    hash_bytes,
+    hash_file,
+    load_manifest,
+    page_entry,
+    remove_output,
+    save_manifest,
+)
+import profiler
+import search_index
+from profiler import stage
+from shards import select_pages
+from template import load_template, template_asset_urls, template_hash, template_includes
+from textnode import text_type_image
 
-def generate_page(from_path, template_path, dest_path):
+# Why a change to an optional render input rebuilt a page, for "main.py why"
+CONTEXT_REASONS = {
+    "assets": "asset fingerprints changed",
+    "template_assets": "template asset fingerprints changed",
+    "images": "image sizes changed",
+}
+
+
+def generate_page(from_path, template_path, dest_path, page_path=None, cache=None, prefetch=None):
+    # Returns the render cache status for the page (hit, miss, error or None),
+    # the partials it included, as name -> content hash, its search index
+    # entry when the index is on, and its links
     print(f" * {from_path} {template_path} -> {dest_path}")
-    from_file = open(from_path, "r")
-    markdown_content = from_file.read()
-    from_file.close()
+    template, values, cache_status, includes, index_entry, links = render_page(
+        from_path, template_path, page_path, cache, page_path or dest_path, prefetch
+    )
+
+    # to_html, the template fill and the file write are one streamed pass
+    with stage("render+write", page_path or dest_path):
+        dest_dir_path = os.path.dirname(dest_path)
+        if dest_dir_path != "":
+            os.makedirs(dest_dir_path, exist_ok=True)
+        # Stream into a temporary file so a failed render never leaves a half-written page
+        tmp_path = dest_path + ".tmp"
+        try:
+            with open(tmp_path, "w") as to_file:
+                template.write(to_file, values)
+            os.replace(tmp_path, dest_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return cache_status, includes, index_entry, links
+
+
+def render_page(from_path, template_path, page_path=None, cache=None, page=None, prefetch=None):
+    # Everything generate_page does short of writing the output: returns the
+    # template and the values to fill it with, plus what generate_page returns
+    page = page or page_path or from_path
+    cache_status = None
+    with stage("read", page):
+        from_file = open(from_path, "r")
+        text = from_file.read()
+        from_file.close()
+        includes = {}
+        text = expand_includes(text, partials_dir(template_path), includes)
+        fields, markdown_content = split_front_matter(text)
+
+        template = load_template(template_path)
+
+    cached = None
+    if cache is not None:
+        with stage("cache", page):
+            # The front matter stays in the key since its title is cached too
+            source_bytes = text.encode("utf-8")
+            cache_status, cached = cache.lookup(source_bytes)
+            # Rendered against asset names or image sizes that have changed since
+            if cached is not None and body_context(cached[2]) != cached[3]:
+                cache_status, cached = "miss", None
+
+    links = []
+    with stage("parse", page):
+        if cached is not None:
+            title, content, links, context = cached
+        else:
+            title = fields.get("title") or extract_title(markdown_content)
+            content = markdown_to_html_node(markdown_content, links)
+            if cache is not None:
+                # The cache needs the body as a string, so render it up front
+                content = content.to_html()
+                cache.store(source_bytes, title, content, links, body_context(links))
 
-    template_file = open(template_path, "r")
-    template = template_file.read()
-    template_file.close()
+        values = {
+            # Text values may land in an attribute, so quotes are escaped too
+            "Title": escape_attribute(title),
+            "Content": content,
+            "Path": escape_attribute(page_path or ""),
+        }
+        if template.uses("Date"):
+            modified = datetime.date.fromtimestamp(os.path.getmtime(from_path)).isoformat()
+            values["Date"] = escape_attribute(fields.get("date") or modified)
+        if template.uses("Tags"):
+            values["Tags"] = escape_attribute(", ".join(fields["tags"]))
+        if template.uses("Description"):
+            values["Description"] = escape_attribute(extract_description(markdown_content))
+        if template.uses("Prefetch"):
+            values["Prefetch"] = "".join(
+                f'<link rel="prefetch" href="{escape_attribute(url)}">' for url in prefetch or []
+            )
 
-    node = markdown_to_html_node(markdown_content)
-    html = node.to_html()
+    index_entry = None
+    if search_index.active:
+        with stage("index", page):
+            terms = search_index.page_terms(markdown_content)
+            index_entry = {"url": page_path, "title": title, "terms": terms}
+    return template, values, cache_status, includes, index_entry, links
 
-    title = extract_title(markdown_content)
-    template = template.replace("{{ Title }}", title)
-    template = template.replace("{{ Content }}", html)
 
-    dest_dir_path = os.path.dirname(dest_path)
-    if dest_dir_path != "":
-        os.makedirs(dest_dir_path, exist_ok=True)
-    to_file = open(dest_path, "w")
-    to_file.write(template)
+def index_source(from_path, template_path, url):
+    # A search index entry for a page without rendering it, for pages built
+    # before the index was turned on
+    with open(from_path, "r") as f:
+        fields, markdown_content = split_front_matter(expand_includes(f.read(), partials_dir(template_path)))
+    terms = search_index.page_terms(markdown_content)
+    return {"url": url, "title": fields.get("title") or extract_title(markdown_content), "terms": terms}
 
 
-def generate_pages_recursive(dir_path_content, template_path, dest_dir_path):
+def page_url(relative_dest):
+    url = "/" + relative_dest.replace(os.sep, "/")
+    if url.endswith("/index.html"):
+        url = url[: -len("index.html")]
+    return url
+
+
+def find_pages(dir_path_content, dest_dir_path):
+    pages = []
     # Walk through the content directory
     for root, dirs, files in os.walk(dir_path_content):
         for file in files:
@@ -40,20 +156,543 @@ def generate_pages_recursive(dir_path_content, template_path, dest_dir_path):
                 # Replace .md extension with .html and construct the destination path
                 dest_path = os.path.join(dest_dir_path, os.path.splitext(relative_path)[0] + ".html")
 
-                # Call the generate_page function to generate the HTML file
-                generate_page(from_path, template_path, dest_path)
+                pages.append((from_path, dest_path))
 
     # Special handling for a specific page if needed
     # For example, serve the contents.html directly at /majesty
     specific_page_src = os.path.join(dir_path_content, "contents.md")
     specific_page_dest = os.path.join(dest_dir_path, "contents.html")
-    if os.path.exists(specific_page_src):
-        generate_page(specific_page_src, template_path, specific_page_dest)
+    if os.path.exists(specific_page_src) and (specific_page_src, specific_page_dest) not in pages:
+        pages.append((specific_page_src, specific_page_dest))
+    return pages
+
+
+def generate_pages_recursive(
+    dir_path_content,
+    template_path,
+    dest_dir_path,
+    force=False,
+    jobs=1,
+    cache=None,
+    drafts=False,
+    shard=None,
+    prefetch=0,
+):
+    # shard is (index, count) to build only that shard's share of the pages;
+    # the manifest then records the shard for "main.py merge". prefetch is
+    # how many of each page's most-linked neighbours it hints at.
+    manifest = load_manifest(dest_dir_path)
+    old_pages = manifest["pages"]
+    new_pages = {}
+    reasons = {}
+    summary = {"rebuilt": [], "skipped": [], "deleted": [], "failed": [], "drafts": []}
+    current_template_includes = template_includes(template_path)
+    partial_hashes = PartialHashes(partials_dir(template_path))
+    metadata_index = MetadataIndex(dest_dir_path)
+    failures = {}
+    to_build = []
+    # Pages that can be skipped, with what rebuilding them would take
+    skippable = {}
+
+    pages = find_pages(dir_path_content, dest_dir_path)
+    if shard is not None:
+        pages = select_pages(pages, dir_path_content, *shard)
+    for from_path, dest_path in pages:
+        relative_dest = os.path.relpath(dest_path, dest_dir_path)
+        relative_source = os.path.relpath(from_path, dir_path_content)
+        # Drafts and layouts come from the metadata index, without reading page bodies
+        try:
+            fields = metadata_index.get(from_path, relative_source)
+            page_template_path = layout_path(template_path, fields.get("layout"))
+        except (OSError, ValueError) as e:
+            failures[relative_dest] = f"{type(e).__name__}: {e}"
+            continue
+        if fields["draft"] and not drafts:
+            summary["drafts"].append(relative_dest)
+            continue
+        with stage("hash", page_url(relative_dest)):
+            source_hash = hash_file(from_path)
+        old_entry = old_pages.get(relative_dest)
+        # Worked out from the links the page had last time, which is right for
+        # a page that is skipped; a rebuilt page gets its own after the render
+        context = None
+        if old_entry is not None and "links" in old_entry:
+            context = render_context(old_entry["links"], page_template_path)
+        entry = page_entry(relative_source, source_hash, template_hash(page_template_path), context)
+
+        # Only re-render when the source, template, an included partial or the generator changed
+        if force:
+            page_reasons = ["forced with --force"]
+        else:
+            # Partial-level reasons are only worked out for the default template
+            if page_template_path == template_path:
+                old_includes, new_includes = manifest.get("template_includes", {}), current_template_includes
+            else:
+                old_includes, new_includes = {}, {}
+            page_reasons = rebuild_reasons(old_entry, entry, partial_hashes, old_includes, new_includes)
+            if not page_reasons and not os.path.exists(dest_path):
+                page_reasons = ["output missing"]
+
+        # Rebuilt pages get their links from the render. Skipped pages keep
+        # theirs, and only a manifest from before links were recorded, or
+        # prefetch hints, which need every page's links ahead of the render,
+        # make the source be read here.
+        if old_entry is not None and "links" in old_entry and page_reasons in ([], ["output missing"]):
+            entry["links"] = old_entry["links"]
+        elif prefetch > 0 or not page_reasons:
+            with stage("links", page_url(relative_dest)):
+                try:
+                    entry["links"] = source_links(from_path, page_template_path)
+                except (OSError, ValueError):
+                    # The render reports it
+                    entry["links"] = []
+        if not page_reasons:
+            old_entry["links"] = entry["links"]
+            new_pages[relative_dest] = old_entry
+            skippable[relative_dest] = (entry, from_path, dest_path, page_template_path)
+            continue
+        new_pages[relative_dest] = entry
+        reasons[relative_dest] = page_reasons
+        to_build.append((relative_dest, from_path, dest_path, page_template_path))
+
+    with stage("link_graph"):
+        for relative_dest, link_reasons in link_graph_reasons(old_pages, new_pages, skippable, failures, prefetch):
+            entry, from_path, dest_path, page_template_path = skippable.pop(relative_dest)
+            entry["prefetch"] = new_pages[relative_dest].get("prefetch")
+            new_pages[relative_dest] = entry
+            reasons[relative_dest] = link_reasons
+            to_build.append((relative_dest, from_path, dest_path, page_template_path))
+    summary["skipped"] = [relative_dest for relative_dest in new_pages if relative_dest in skippable]
+    to_build = [page + (new_pages[page[0]].get("prefetch"),) for page in to_build]
+
+    metadata_index.save()
+    summary["metadata"] = metadata_index.stats
+    build_failures, includes, index_entries, links = generate_pages(to_build, jobs, cache)
+    failures.update(build_failures)
+    for relative_dest, from_path, dest_path, page_template_path, page_prefetch in to_build:
+        if relative_dest in failures:
+            # Leave it out of the manifest so the next build retries it
+            del new_pages[relative_dest]
+            summary["failed"].append((relative_dest, failures[relative_dest]))
+        else:
+            entry = new_pages[relative_dest]
+            entry["includes"] = includes[relative_dest]
+            entry["links"] = links[relative_dest]
+            context = render_context(links[relative_dest], page_template_path)
+            if context:
+                entry["context"] = context
+            else:
+                entry.pop("context", None)
+            summary["rebuilt"].append(relative_dest)
+
+    # Delete outputs whose sources are gone
+    for relative_dest in old_pages:
+        if relative_dest not in new_pages and relative_dest not in failures:
+            print(f" * deleting {os.path.join(dest_dir_path, relative_dest)}")
+            remove_output(dest_dir_path, relative_dest)
+            summary["deleted"].append(relative_dest)
+
+    if search_index.active:
+        with stage("search_index"):
+            summary["search"] = update_search_index(
+                dir_path_content, template_path, dest_dir_path, new_pages, index_entries
+            )
+
+    for relative_dest, error in failures.items():
+        if relative_dest not in build_failures:
+            summary["failed"].append((relative_dest, error))
+
+    manifest["version"] = GENERATOR_VERSION
+    manifest["template_hash"] = template_hash(template_path)
+    manifest["template_includes"] = current_template_includes
+    manifest["pages"] = new_pages
+    # Why each page was rebuilt, for "main.py why"; pages skipped this time keep no reason
+    manifest["reasons"] = {relative_dest: reasons[relative_dest] for relative_dest in summary["rebuilt"]}
+    if shard is not None:
+        manifest["shard"] = {
+            "index": shard[0],
+            "count": shard[1],
+            "failed": summary["failed"],
+            "drafts": summary["drafts"],
+        }
+    save_manifest(dest_dir_path, manifest)
+    return summary
+
+
+def link_graph_reasons(old_pages, new_pages, skippable, failures, prefetch):
+    # Skipped pages whose output depends on other pages: those linking to a
+    # page that appeared or went away, as when it was renamed, and those
+    # whose prefetch hints changed. Sets every page's "prefetch" entry.
+    gone = set(old_pages) - set(new_pages) - set(failures)
+    appeared = set(new_pages) - set(old_pages)
+    changed = {relative_dest.replace(os.sep, "/"): relative_dest for relative_dest in gone | appeared}
+    found = {}
+    skipped_pages = {relative_dest: new_pages[relative_dest] for relative_dest in skippable}
+    for relative_dest, targets in linking_pages(skipped_pages, changed).items():
+        found[relative_dest] = [
+            f"linked page {page_url(changed[target])} was {'removed' if changed[target] in gone else 'added'}"
+            for target in targets
+        ]
+
+    hints = prefetch_hints(new_pages, prefetch) if prefetch > 0 else {}
+    for relative_dest, entry in new_pages.items():
+        urls = [page_url(target) for target in hints.get(relative_dest, [])]
+        if relative_dest in skippable:
+            if entry.get("prefetch", []) != urls:
+                found.setdefault(relative_dest, []).append("prefetch hints changed")
+            # A skipped page keeps its entry, and the hints it was built with
+            if relative_dest not in found:
+                continue
+        if urls:
+            entry["prefetch"] = urls
+        else:
+            entry.pop("prefetch", None)
+    return sorted(found.items())
+
+
+def update_search_index(dir_path_content, template_path, dest_dir_path, pages, index_entries):
+    # Pages built this time bring their entries; the index reads the
+    # sources of any others it hasn't seen yet
+    sources = {
+        relative_dest: os.path.join(dir_path_content, entry["source"]) for relative_dest, entry in pages.items()
+    }
+    return search_index.update_index(
+        dest_dir_path,
+        index_entries,
+        sources,
+        lambda relative_dest: index_source(sources[relative_dest], template_path, page_url(relative_dest)),
+    )
+
+
+class PartialHashes:
+    # Current content hash per partial, each file read at most once per build
+    def __init__(self, dir_path_partials):
+        self.dir_path_partials = dir_path_partials
+        self.hashes = {}
+
+    def get(self, name):
+        if name not in self.hashes:
+            try:
+                self.hashes[name] = hash_bytes(read_partial(self.dir_path_partials, name))
+            except ValueError:
+                self.hashes[name] = None
+        return self.hashes[name]
+
+
+def rebuild_reasons(old_entry, entry, partial_hashes, old_template_includes, template_includes):
+    # Everything that makes the page's last output stale; empty means it can be skipped
+    if old_entry is None:
+        return ["new page"]
+    reasons = []
+    if old_entry.get("version") != entry["version"]:
+        reasons.append("generator version changed")
+    if old_entry.get("source_hash") != entry["source_hash"]:
+        reasons.append(f"source {entry['source']} changed")
+    if old_entry.get("template_hash") != entry["template_hash"]:
+        changed = [
+            name
+            for name in sorted(set(old_template_includes) | set(template_includes))
+            if old_template_includes.get(name) != template_includes.get(name)
+        ]
+        if changed:
+            reasons.extend(f"template partial {name} changed" for name in changed)
+        else:
+            reasons.append("template changed")
+    old_context = old_entry.get("context", {})
+    context = entry.get("context", {})
+    for name in sorted(set(old_context) | set(context)):
+        if old_context.get(name) != context.get(name):
+            reasons.append(CONTEXT_REASONS.get(name, f"{name} changed"))
+    for name, included_hash in sorted(old_entry.get("includes", {}).items()):
+        current_hash = partial_hashes.get(name)
+        if current_hash is None:
+            reasons.append(f"included partial {name} is missing")
+        elif current_hash != included_hash:
+            reasons.append(f"included partial {name} changed")
+    return reasons
+
+
+def pages_including(manifest, name):
+    # Outputs whose last build included the partial, directly or not
+    return sorted(
+        relative_dest
+        for relative_dest, entry in manifest["pages"].items()
+        if name in entry.get("includes", {})
+    )
+
+
+def resolve_page(page, dir_path_content, dest_dir_path):
+    # Accepts /majesty/, majesty/index.html, public/majesty/index.html or
+    # contents/majesty/index.md and returns the output path relative to public
+    if page.endswith(".md"):
+        if os.path.exists(page):
+            page = os.path.relpath(page, dir_path_content)
+        return os.path.normpath(os.path.splitext(page)[0] + ".html")
+    if os.path.isfile(page) and is_within_dir(page, dest_dir_path):
+        return os.path.relpath(page, dest_dir_path)
+    relative = page.lstrip("/")
+    if relative == "" or relative.endswith("/"):
+        relative += "index.html"
+    elif not relative.endswith(".html"):
+        relative += "/index.html"
+    return os.path.normpath(relative)
+
+
+def is_within_dir(path, dir_path):
+    return os.path.abspath(path).startswith(os.path.abspath(dir_path) + os.sep)
+
+
+def explain_page(page, dir_path_content, template_path, dest_dir_path):
+    # Lines describing why the last build rebuilt a page, and what it depends on now
+    manifest = load_manifest(dest_dir_path)
+    relative_dest = resolve_page(page, dir_path_content, dest_dir_path)
+    entry = manifest["pages"].get(relative_dest)
+    if entry is None:
+        return [f"{relative_dest} is not in the last build's manifest"]
+
+    lines = [f"{relative_dest} (from {entry['source']})"]
+    reasons = manifest.get("reasons", {}).get(relative_dest)
+    if reasons:
+        lines.append("Rebuilt in the last build because:")
+        lines.extend(f"  - {reason}" for reason in reasons)
+    else:
+        lines.append("Not rebuilt in the last build: nothing it depends on changed")
+
+    dir_path_partials = partials_dir(template_path)
+    lines.append("Depends on:")
+    sources = [
+        (os.path.basename(template_path), template_path),
+        (entry["source"], os.path.join(dir_path_content, entry["source"])),
+    ]
+    for label, path in sources:
+        lines.append(f"  {label}")
+        try:
+            with open(path, "r") as f:
+                text = f.read()
+        except OSError:
+            continue
+        for depth, name in include_tree(text, dir_path_partials):
+            lines.append("  " + "  " * (depth + 1) + name)
+    return lines
+
+
+def generate_selected_pages(
+    dir_path_content, template_path, dest_dir_path, from_paths, reason="rebuilt while serving", drafts=False
+):
+    # Rebuild just the given sources, in order, and keep the manifest in
+    # step. Sources that no longer exist, or became drafts, have their
+    # output removed.
+    manifest = load_manifest(dest_dir_path)
+    manifest.setdefault("reasons", {})
+    summary = {"rebuilt": [], "skipped": [], "deleted": [], "failed": [], "drafts": []}
+    metadata_index = MetadataIndex(dest_dir_path)
+    index_entries = {}
+
+    for from_path in from_paths:
+        relative_source = os.path.relpath(from_path, dir_path_content)
+        relative_dest = os.path.splitext(relative_source)[0] + ".html"
+        dest_path = os.path.join(dest_dir_path, relative_dest)
+        fields = None
+        if os.path.exists(from_path):
+            try:
+                fields = metadata_index.get(from_path, relative_source)
+                page_template_path = layout_path(template_path, fields.get("layout"))
+            except (OSError, ValueError) as e:
+                summary["failed"].append((relative_dest, f"{type(e).__name__}: {e}"))
+                continue
+        else:
+            metadata_index.forget(relative_source)
+        if fields is None or (fields["draft"] and not drafts):
+            remove_output(dest_dir_path, relative_dest)
+            manifest["pages"].pop(relative_dest, None)
+            manifest["reasons"].pop(relative_dest, None)
+            summary["deleted" if fields is None else "drafts"].append(relative_dest)
+            continue
+        # Hints stay as the last full build worked them out
+        prefetch = manifest["pages"].get(relative_dest, {}).get("prefetch")
+        try:
+            status, includes, index_entries[relative_dest], links = generate_page(
+                from_path, page_template_path, dest_path, page_url(relative_dest), None, prefetch
+            )
+        except Exception as e:
+            manifest["pages"].pop(relative_dest, None)
+            summary["failed"].append((relative_dest, f"{type(e).__name__}: {e}"))
+            continue
+        entry = page_entry(
+            relative_source,
+            hash_file(from_path),
+            template_hash(page_template_path),
+            render_context(links, page_template_path),
+        )
+        entry["includes"] = includes
+        entry["links"] = links
+        if prefetch:
+            entry["prefetch"] = prefetch
+        manifest["pages"][relative_dest] = entry
+        manifest["reasons"][relative_dest] = [reason]
+        summary["rebuilt"].append(relative_dest)
+
+    metadata_index.save(prune=False)
+    if search_index.active:
+        summary["search"] = update_search_index(
+            dir_path_content, template_path, dest_dir_path, manifest["pages"], index_entries
+        )
+
+    manifest["template_includes"] = template_includes(template_path)
+    save_manifest(dest_dir_path, manifest)
+    return summary
+
+
+def parse_jobs(value):
+    # argparse type for --jobs: 0 means every core, a negative count is
+    # refused before anything in public/ is touched
+    if not value.isdigit():
+        raise argparse.ArgumentTypeError(f"expected 0 or a positive number of workers, got {value!r}")
+    return int(value)
+
+
+def generate_pages(pages, jobs=1, cache=None):
+    # pages holds (output path, source, destination, template, prefetch hints)
+    # for each page.
+    # Returns the failed pages' errors and every built page's included
+    # partials, search index entry and links
+    failures = {}
+    includes = {}
+    index_entries = {}
+    links = {}
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+
+    if jobs == 1 or len(pages) <= 1:
+        for relative_dest, from_path, dest_path, template_path, prefetch in pages:
+            try:
+                status, includes[relative_dest], index_entries[relative_dest], links[relative_dest] = generate_page(
+                    from_path, template_path, dest_path, page_url(relative_dest), cache, prefetch
+                )
+            except Exception as e:
+                failures[relative_dest] = f"{type(e).__name__}: {e}"
+                continue
+            if cache is not None:
+                cache.record(status)
+        return failures, includes, index_entries, links
+
+    # Largest sources first so one huge page doesn't hold up the end of the build
+    pages = sorted(pages, key=lambda page: os.path.getsize(page[1]), reverse=True)
+    profiling = profiler.is_active()
+    fragments = fragment_cache.active()
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=init_worker,
+        initargs=(
+            fragment_cache.max_bytes(),
+            assets.active_urls,
+            image_size.active_sizes,
+            search_index.active,
+        ),
+    ) as executor:
+        futures = {}
+        for relative_dest, from_path, dest_path, template_path, prefetch in pages:
+            page_args = (from_path, template_path, dest_path, page_url(relative_dest), cache, prefetch)
+            future = executor.submit(generate_page_in_worker, profiling, *page_args)
+            futures[future] = relative_dest
+        for future in as_completed(futures):
+            try:
+                (status, page_includes, index_entry, rendered_links), events, fragment_stats = future.result()
+            except Exception as e:
+                failures[futures[future]] = f"{type(e).__name__}: {e}"
+                continue
+            includes[futures[future]] = page_includes
+            index_entries[futures[future]] = index_entry
+            links[futures[future]] = rendered_links
+            if profiling:
+                profiler.active_profiler.merge(events)
+            # Workers get a copy of the caches, so the stats are kept here
+            if cache is not None:
+                cache.record(status)
+            if fragments is not None:
+                fragments.add_stats(*fragment_stats)
+    return failures, includes, index_entries, links
+
+
+def init_worker(fragment_cache_size, asset_urls, image_sizes, search):
+    # Workers start from the parent's settings even where they aren't forked
+    fragment_cache.configure(fragment_cache_size)
+    assets.configure(asset_urls)
+    image_size.configure(image_sizes)
+    search_index.configure(search)
+
+
+def body_context(links):
+    # Everything besides the markdown that changes the rendered body: the
+    # fingerprinted names of the URLs it links to and the sizes of its images
+    context = {}
+    digest = assets.urls_digest(url for kind, url, start_line, end_line in links)
+    if digest:
+        context["assets"] = digest
+    digest = image_size.urls_digest(url for kind, url, start_line, end_line in links if kind == "image")
+    if digest:
+        context["images"] = digest
+    return context
+
+
+def render_context(links, template_path):
+    # The body's context plus the fingerprinted URLs in the page's template
+    context = body_context(links)
+    digest = assets.urls_digest(template_asset_urls(template_path))
+    if digest:
+        context["template_assets"] = digest
+    return context
+
+
+def stale_context_pages(dir_path_content, template_path, dest_dir_path):
+    # Sources of the built pages whose asset names or image sizes changed
+    # since, going by the links each one recorded
+    manifest = load_manifest(dest_dir_path)
+    metadata_index = MetadataIndex(dest_dir_path)
+    sources = []
+    for relative_dest, entry in sorted(manifest["pages"].items()):
+        from_path = os.path.join(dir_path_content, entry["source"])
+        try:
+            fields = metadata_index.get(from_path, entry["source"])
+            page_template_path = layout_path(template_path, fields.get("layout"))
+        except (OSError, ValueError):
+            # Rebuilding it reports the problem
+            sources.append(from_path)
+            continue
+        if entry.get("context", {}) != render_context(entry.get("links", []), page_template_path):
+            sources.append(from_path)
+    return sources
+
+
+def generate_page_in_worker(profiling, *page_args):
+    # Returns generate_page's result, its profile events and the fragment
+    # cache hits and misses it caused, for the parent to merge
+    fragments = fragment_cache.active()
+    hits, misses = (fragments.hits, fragments.misses) if fragments is not None else (0, 0)
+    if profiling:
+        result, events = profiler.run_profiled(generate_page, *page_args)
+    else:
+        result, events = generate_page(*page_args), None
+    if fragments is not None:
+        hits, misses = fragments.hits - hits, fragments.misses - misses
+    return result, events, (hits, misses)
 
 
 def extract_title(md):
-    lines = md.split("\n")
-    for line in lines:
+    # Stops at the first heading instead of splitting the whole page
+    for line in iter_lines(md):
         if line.startswith("# "):
             return line[2:]
     raise ValueError("No title found")
+
+
+def extract_description(md, max_length=160):
+    for block in scan_blocks(md):
+        if block.block_type != block_type_paragraph:
+            continue
+        text_nodes = text_to_textnodes(" ".join(block.lines))
+        text = "".join(node.text for node in text_nodes if node.text_type != text_type_image)
+        if len(text) > max_length:
+            text = text[:max_length].rsplit(" ", 1)[0] + "..."
+        return text
+    return ""
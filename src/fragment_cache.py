@@ -0,0 +1,74 @@
+from collections import OrderedDict
+
+from manifest import hash_bytes
+
+DEFAULT_FRAGMENT_CACHE_SIZE = 32 * 1024 * 1024
+
+
+class FragmentCache:
+    # Rendered HTML per block, shared by every page this process builds.
+    # Footers, disclaimers and other boilerplate are parsed once. Not
+    # thread-safe: get reorders the LRU, so only one thread may use a cache.
+    def __init__(self, max_bytes=DEFAULT_FRAGMENT_CACHE_SIZE):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        html = self.entries.get(key)
+        if html is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return html
+
+    def put(self, key, html):
+        entry_size = len(key) + len(html)
+        if entry_size > self.max_bytes:
+            return
+        if key in self.entries:
+            self.size -= len(key) + len(self.entries.pop(key))
+        self.entries[key] = html
+        self.size += entry_size
+        while self.size > self.max_bytes:
+            old_key, old_html = self.entries.popitem(last=False)
+            self.size -= len(old_key) + len(old_html)
+
+    def add_stats(self, hits, misses):
+        # Counts reported back from pool workers, which have their own cache
+        self.hits += hits
+        self.misses += misses
+
+    def format_stats(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0.0
+        return f"Fragment cache: {self.hits} hits, {self.misses} misses ({rate:.0%} hit rate)"
+
+
+# The cache markdown_to_html_node uses, or None when memoization is off
+active_cache = FragmentCache()
+
+
+def configure(max_bytes):
+    # 0 turns memoization off for memory-constrained builds
+    global active_cache
+    active_cache = FragmentCache(max_bytes) if max_bytes > 0 else None
+    return active_cache
+
+
+def active():
+    return active_cache
+
+
+def max_bytes():
+    return active_cache.max_bytes if active_cache is not None else 0
+
+
+def block_key(block_type, lines):
+    # Blocks arrive already trimmed by scan_blocks; inner whitespace can
+    # change the output (code blocks, paragraph joins), so it stays in.
+    # Hashed, so a large block isn't held twice, as key and as source.
+    return hash_bytes((block_type + "\0" + "\n".join(lines)).encode("utf-8"))
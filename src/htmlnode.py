@@ -1,4 +1,30 @@
+import io
+
+
+def escape_text(text):
+    # Most text has nothing to escape: a few C-level scans and no copy.
+    # Only the characters actually present get a replace pass. In
+    # bench_escape.py that beats html.escape on clean text and str.translate
+    # throughout; on text full of markup html.escape is as fast or faster.
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
+
+
+def escape_attribute(value):
+    value = escape_text(value)
+    if '"' in value:
+        value = value.replace('"', "&quot;")
+    return value
+
+
 class HTMLNode:
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag=None, value=None, children=None, props=None):
         self.tag = tag
         self.value = value
@@ -6,14 +32,29 @@ class HTMLNode:
         self.props = props
 
     def to_html(self):
-        raise NotImplementedError("to_html method not implemented")
+        parts = []
+        self.render(parts.append)
+        return "".join(parts)
+
+    def iter_html(self):
+        raise NotImplementedError("iter_html method not implemented")
+
+    def render(self, write):
+        raise NotImplementedError("render method not implemented")
+
+    def write_html(self, stream):
+        # Accepts text streams, or binary ones which get UTF-8
+        if isinstance(stream, (io.RawIOBase, io.BufferedIOBase)):
+            self.render(lambda chunk: stream.write(chunk.encode("utf-8")))
+        else:
+            self.render(stream.write)
 
     def props_to_html(self):
         if self.props is None:
             return ""
         props_html = ""
         for prop in self.props:
-            props_html += f' {prop}="{self.props[prop]}"'
+            props_html += f' {prop}="{escape_attribute(self.props[prop])}"'
         return props_html
 
     def __repr__(self):
@@ -21,6 +62,9 @@ class HTMLNode:
 
 
 class LeafNode(HTMLNode):
+    # value is text and gets escaped; use RawHTMLNode for markup
+    __slots__ = ()
+
     def __init__(self, tag, value, props=None):
         super().__init__(tag, value, None, props)
 
@@ -28,26 +72,112 @@ class LeafNode(HTMLNode):
         if self.value is None:
             raise ValueError("Invalid HTML: no value")
         if self.tag is None:
-            return self.value
-        return f"<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>"
+            return escape_text(self.value)
+        return f"<{self.tag}{self.props_to_html()}>{escape_text(self.value)}</{self.tag}>"
+
+    def iter_html(self):
+        yield self.to_html()
+
+    def render(self, write):
+        write(self.to_html())
 
     def __repr__(self):
         return f"LeafNode({self.tag}, {self.value}, {self.props})"
 
 
+class LinkNode(LeafNode):
+    # An <a> leaf that keeps href in a slot instead of a props dict
+    __slots__ = ("href",)
+
+    def __init__(self, value, href):
+        self.tag = "a"
+        self.value = value
+        self.children = None
+        self.href = href
+
+    @property
+    def props(self):
+        return {"href": self.href}
+
+    def props_to_html(self):
+        return f' href="{escape_attribute(self.href)}"'
+
+
+class ImageNode(LeafNode):
+    # An <img> leaf that keeps src and alt in slots instead of a props dict.
+    # lazy adds loading="lazy" and decoding="async", after width and height
+    # when the image's size is known.
+    __slots__ = ("src", "alt", "size", "lazy")
+
+    def __init__(self, src, alt, size=None, lazy=False):
+        self.tag = "img"
+        self.value = ""
+        self.children = None
+        self.src = src
+        self.alt = alt
+        self.size = size
+        self.lazy = lazy
+
+    @property
+    def props(self):
+        props = {"src": self.src, "alt": self.alt}
+        if self.size is not None:
+            props["width"] = str(self.size[0])
+            props["height"] = str(self.size[1])
+        if self.lazy:
+            props["loading"] = "lazy"
+            props["decoding"] = "async"
+        return props
+
+    def props_to_html(self):
+        props_html = f' src="{escape_attribute(self.src)}" alt="{escape_attribute(self.alt)}"'
+        if self.size is not None:
+            props_html += f' width="{self.size[0]}" height="{self.size[1]}"'
+        if self.lazy:
+            props_html += ' loading="lazy" decoding="async"'
+        return props_html
+
+
+class RawHTMLNode(LeafNode):
+    # Markup that is already safe, such as a memoized block or highlighted
+    # code, written out as-is instead of being escaped a second time
+    __slots__ = ()
+
+    def __init__(self, html):
+        super().__init__(None, html)
+
+    def to_html(self):
+        return self.value
+
+    def __repr__(self):
+        return f"RawHTMLNode({self.value})"
+
+
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children, props=None):
         super().__init__(tag, None, children, props)
 
-    def to_html(self):
+    def iter_html(self):
+        self.check()
+        yield f"<{self.tag}{self.props_to_html()}>"
+        for child in self.children:
+            yield from child.iter_html()
+        yield f"</{self.tag}>"
+
+    def render(self, write):
+        self.check()
+        write(f"<{self.tag}{self.props_to_html()}>")
+        for child in self.children:
+            child.render(write)
+        write(f"</{self.tag}>")
+
+    def check(self):
         if self.tag is None:
             raise ValueError("Invalid HTML: no tag")
         if self.children is None:
             raise ValueError("Invalid HTML: no children")
-        children_html = ""
-        for child in self.children:
-            children_html += child.to_html()
-        return f"<{self.tag}{self.props_to_html()}>{children_html}</{self.tag}>"
 
     def __repr__(self):
         return f"ParentNode({self.tag}, children: {self.children}, {self.props})"
@@ -0,0 +1,148 @@
+import json
+import os
+import struct
+
+import fragment_cache
+from manifest import hash_bytes, hash_file, load_manifest, save_manifest
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".webp")
+HEADER_BYTES = 64
+
+# URL -> (width, height) for the current build, or None when sizing is off.
+# active_digest identifies the whole table, to tell when it changed; pages
+# depend only on the images they reference, see urls_digest.
+active_sizes = None
+active_digest = ""
+
+
+def configure(sizes):
+    global active_sizes, active_digest
+    digest = hash_bytes(json.dumps(sorted(sizes.items())).encode("utf-8")) if sizes is not None else ""
+    if digest != active_digest:
+        # Memoized blocks may carry the old sizes
+        fragment_cache.configure(fragment_cache.max_bytes())
+    active_sizes = sizes
+    active_digest = digest
+
+
+def image_size(url):
+    if active_sizes is None:
+        return None
+    return active_sizes.get(url.split("?", 1)[0].split("#", 1)[0])
+
+
+def urls_digest(urls):
+    # Identifies the sizes of the given image URLs, "" when sizing is off or
+    # there are none. With sizing on, even an unsized image gets lazy loading.
+    urls = set(urls)
+    if active_sizes is None or not urls:
+        return ""
+    sizes = [(url, image_size(url)) for url in sorted(urls)]
+    return hash_bytes(json.dumps(sizes).encode("utf-8"))
+
+
+def probe_image(path):
+    # (width, height) from the header bytes alone, or None for anything
+    # unrecognized or cut off before its size
+    with open(path, "rb") as f:
+        header = f.read(HEADER_BYTES)
+        if header.startswith(b"\x89PNG\r\n\x1a\n") and header[12:16] == b"IHDR" and len(header) >= 24:
+            return struct.unpack(">II", header[16:24])
+        if header[:6] in (b"GIF87a", b"GIF89a") and len(header) >= 10:
+            return struct.unpack("<HH", header[6:10])
+        if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+            return webp_size(header)
+        if header[:2] == b"\xff\xd8":
+            return jpeg_size(f)
+    return None
+
+
+def webp_size(header):
+    chunk = header[12:16]
+    if chunk == b"VP8 " and header[23:26] == b"\x9d\x01\x2a" and len(header) >= 30:
+        width, height = struct.unpack("<HH", header[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and header[20:21] == b"\x2f" and len(header) >= 25:
+        bits = int.from_bytes(header[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(header) >= 30:
+        return int.from_bytes(header[24:27], "little") + 1, int.from_bytes(header[27:30], "little") + 1
+    return None
+
+
+def jpeg_size(f):
+    # Walk the segment headers, seeking past their bodies, up to the first SOF
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        while marker[1] == 0xFF:
+            # Fill bytes before a marker
+            marker = marker[1:] + f.read(1)
+        code = marker[1]
+        if code == 0xD8 or 0xD0 <= code <= 0xD7 or code == 0x01:
+            continue
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0]
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            segment = f.read(5)
+            if len(segment) < 5:
+                return None
+            height, width = struct.unpack(">HH", segment[1:5])
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def probe_static_images(dir_path_static, dest_dir_path):
+    # Size every image in static/. Files whose mtime and size haven't
+    # changed since the last build are not opened at all, and a changed
+    # file whose content hash was seen before reuses that probe.
+    manifest = load_manifest(dest_dir_path)
+    previous = manifest.get("images", {})
+    by_hash = {entry["hash"]: entry for entry in previous.values()}
+    images = {}
+    sizes = {}
+    stats = {"probed": 0, "reused": 0}
+
+    for root, dirs, files in os.walk(dir_path_static):
+        for file in files:
+            if not file.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            path = os.path.join(root, file)
+            relative_path = os.path.relpath(path, dir_path_static)
+            stat = os.stat(path)
+            entry = previous.get(relative_path)
+            if entry is None or entry["mtime_ns"] != stat.st_mtime_ns or entry["size"] != stat.st_size:
+                digest = hash_file(path)
+                known = by_hash.get(digest)
+                if known is not None:
+                    size = known["width"], known["height"]
+                    stats["reused"] += 1
+                else:
+                    size = probe_image(path)
+                    stats["probed"] += 1
+                if size is None:
+                    continue
+                entry = {
+                    "mtime_ns": stat.st_mtime_ns,
+                    "size": stat.st_size,
+                    "hash": digest,
+                    "width": size[0],
+                    "height": size[1],
+                }
+                by_hash[digest] = entry
+            else:
+                stats["reused"] += 1
+            images[relative_path] = entry
+            sizes["/" + relative_path.replace(os.sep, "/")] = (entry["width"], entry["height"])
+
+    manifest["images"] = images
+    save_manifest(dest_dir_path, manifest)
+    return sizes, stats
+
+
+def format_image_stats(stats):
+    return f"Image sizes: {stats['probed']} probed, {stats['reused']} reused"
@@ -0,0 +1,73 @@
+import os
+import re
+
+from manifest import hash_bytes
+
+# {{ include nav.html }} in a template or a page pulls in partials/nav.html
+INCLUDE_PATTERN = re.compile(r"\{\{\s*include\s+([\w./-]+)\s*\}\}")
+
+
+def partials_dir(template_path):
+    # Partials live next to the template: ./template.html -> ./partials/
+    return os.path.join(os.path.dirname(template_path), "partials")
+
+
+def partial_path(dir_path_partials, name):
+    path = os.path.normpath(os.path.join(dir_path_partials, name))
+    if not os.path.abspath(path).startswith(os.path.abspath(dir_path_partials) + os.sep):
+        raise ValueError(f"Include outside the partials directory: {name}")
+    return path
+
+
+def read_partial(dir_path_partials, name):
+    try:
+        with open(partial_path(dir_path_partials, name), "rb") as f:
+            return f.read()
+    except OSError:
+        raise ValueError(f"Include not found: {name}")
+
+
+def partial_text(data):
+    # Decoded like open(..., "r"); trailing newlines dropped so an inline include stays inline
+    return data.decode().replace("\r\n", "\n").replace("\r", "\n").rstrip("\n")
+
+
+def expand_includes(text, dir_path_partials, includes=None, stack=()):
+    # Replace every include with the partial's own expanded text. includes
+    # collects name -> content hash for each partial used, directly or not.
+    if "{{" not in text:
+        return text
+
+    def replace(match):
+        name = match.group(1)
+        if name in stack:
+            raise ValueError(f"Include cycle: {' -> '.join(stack + (name,))}")
+        data = read_partial(dir_path_partials, name)
+        if includes is not None:
+            includes[name] = hash_bytes(data)
+        return expand_includes(partial_text(data), dir_path_partials, includes, stack + (name,))
+
+    return INCLUDE_PATTERN.sub(replace, text)
+
+
+def direct_includes(text):
+    names = []
+    for match in INCLUDE_PATTERN.finditer(text):
+        if match.group(1) not in names:
+            names.append(match.group(1))
+    return names
+
+
+def include_tree(text, dir_path_partials, depth=0, stack=()):
+    # (depth, name) pairs for the partials text includes, read from disk as they are now
+    lines = []
+    for name in direct_includes(text):
+        lines.append((depth, name))
+        if name in stack:
+            continue
+        try:
+            data = read_partial(dir_path_partials, name)
+        except ValueError:
+            continue
+        lines.extend(include_tree(partial_text(data), dir_path_partials, depth + 1, stack + (name,)))
+    return lines
@@ -11,16 +11,75 @@ from textnode import (
 )
 
 
+IMAGE_PATTERN = re.compile(r"!\[(.*?)\]\((.*?)\)")
+LINK_PATTERN = re.compile(r"(?<!!)\[(.*?)\]\((.*?)\)")
+DELIMITER_PATTERN = re.compile(r"[*`]")
+
+
 def text_to_textnodes(text):
-    nodes = [TextNode(text, text_type_text)]
-    nodes = split_nodes_delimiter(nodes, "**", text_type_bold)
-    nodes = split_nodes_delimiter(nodes, "*", text_type_italic)
-    nodes = split_nodes_delimiter(nodes, "`", text_type_code)
-    nodes = split_nodes_image(nodes)
-    nodes = split_nodes_link(nodes)
+    # Single left-to-right scan that yields the same nodes as running
+    # split_nodes_delimiter for "**", "*" and "`", then split_nodes_image
+    # and split_nodes_link, without building the intermediate lists.
+    nodes = []
+    pos = 0
+    length = len(text)
+    while pos < length:
+        match = DELIMITER_PATTERN.search(text, pos)
+        end = match.start() if match else length
+        if end > pos:
+            split_text_segment(text, pos, end, nodes)
+        if match is None:
+            break
+
+        if text.startswith("**", end):
+            # Bold is split first, so its content is never split again
+            close = text.find("**", end + 2)
+            delimiter_length = 2
+            text_type = text_type_bold
+        elif text[end] == "*":
+            # Italic must close inside the same stretch between bold markers
+            close = text.find("*", end + 1)
+            if close != -1 and text.startswith("**", close):
+                close = -1
+            delimiter_length = 1
+            text_type = text_type_italic
+        else:
+            # Code is split after bold and italic, so a star ends the stretch
+            next_delimiter = DELIMITER_PATTERN.search(text, end + 1)
+            close = next_delimiter.start() if next_delimiter else -1
+            if close != -1 and text[close] != "`":
+                close = -1
+            delimiter_length = 1
+            text_type = text_type_code
+
+        if close == -1:
+            raise ValueError("Invalid markdown, formatted section not closed")
+        if close > end + delimiter_length:
+            nodes.append(TextNode(text[end + delimiter_length : close], text_type))
+        pos = close + delimiter_length
     return nodes
 
 
+def split_text_segment(text, start, end, nodes):
+    # Images first, then links in the text between images, matching the
+    # order of split_nodes_image and split_nodes_link
+    pos = start
+    while True:
+        image = IMAGE_PATTERN.search(text, pos, end)
+        piece_end = image.start() if image else end
+        for link in LINK_PATTERN.finditer(text, pos, piece_end):
+            if link.start() > pos:
+                nodes.append(TextNode(text[pos : link.start()], text_type_text))
+            nodes.append(TextNode(link.group(1), text_type_link, link.group(2)))
+            pos = link.end()
+        if piece_end > pos:
+            nodes.append(TextNode(text[pos:piece_end], text_type_text))
+        if image is None:
+            return
+        nodes.append(TextNode(image.group(1), text_type_image, image.group(2)))
+        pos = image.end()
+
+
 def split_nodes_delimiter(old_nodes, delimiter, text_type):
     new_nodes = []
     for old_node in old_nodes:
@@ -97,12 +156,10 @@ def split_nodes_link(old_nodes):
 
 
 def extract_markdown_images(text):
-    pattern = r"!\[(.*?)\]\((.*?)\)"
-    matches = re.findall(pattern, text)
+    matches = IMAGE_PATTERN.findall(text)
     return matches
 
 
 def extract_markdown_links(text):
-    pattern = r"(?<!!)\[(.*?)\]\((.*?)\)"
-    matches = re.findall(pattern, text)
+    matches = LINK_PATTERN.findall(text)
     return matches
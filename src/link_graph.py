@@ -0,0 +1,142 @@
+import os
+import posixpath
+import re
+from urllib.parse import unquote
+
+from includes import expand_includes, partials_dir
+from markdown_blocks import block_links, scan_blocks
+from metadata import split_front_matter
+
+# Links with a scheme (https:, mailto:) or a host (//cdn) aren't ours to check
+EXTERNAL_PATTERN = re.compile(r"^(?:[a-zA-Z][a-zA-Z0-9+.-]*:|//)")
+
+
+def page_links(markdown):
+    # What markdown_to_html_node collects while rendering, without the render
+    links = []
+    for block in scan_blocks(markdown):
+        links.extend(block_links(block))
+    return links
+
+
+def source_links(from_path, template_path):
+    # For pages the build needs links of without rendering them
+    with open(from_path, "r") as f:
+        text = expand_includes(f.read(), partials_dir(template_path))
+    fields, markdown = split_front_matter(text)
+    return page_links(markdown)
+
+
+def resolve(url, relative_dest):
+    # The output a link on the page at relative_dest points at, as a
+    # "/"-separated path under public, or None for external and in-page links
+    path = url.split("#", 1)[0].split("?", 1)[0]
+    if path == "" or EXTERNAL_PATTERN.match(path):
+        return None
+    path = unquote(path)
+    if not path.startswith("/"):
+        path = posixpath.join("/" + posixpath.dirname(relative_dest.replace(os.sep, "/")), path)
+    resolved = posixpath.normpath(path).lstrip("/")
+    if resolved == ".":
+        resolved = ""
+    if path.endswith("/") or resolved == "":
+        resolved = posixpath.join(resolved, "index.html")
+    return resolved
+
+
+def known_outputs(manifest):
+    # Everything the build put in public: pages, static files and listings
+    outputs = set(relative_dest.replace(os.sep, "/") for relative_dest in manifest["pages"])
+    outputs.update(manifest.get("static", []))
+    outputs.update(relative_dest.replace(os.sep, "/") for relative_dest in manifest.get("listings", {}))
+    return outputs
+
+
+def find_output(target, outputs):
+    # /majesty resolves too, since the server redirects it to /majesty/
+    if target in outputs:
+        return target
+    if posixpath.join(target, "index.html") in outputs:
+        return posixpath.join(target, "index.html")
+    return None
+
+
+def page_targets(relative_dest, links, outputs=None):
+    # The outputs a page links to, in order of first appearance. With
+    # outputs, targets that don't exist are dropped.
+    targets = []
+    for kind, url, start_line, end_line in links:
+        target = resolve(url, relative_dest)
+        if target is None:
+            continue
+        if outputs is not None:
+            target = find_output(target, outputs)
+            if target is None:
+                continue
+        if target not in targets:
+            targets.append(target)
+    return targets
+
+
+def linking_pages(pages, targets):
+    # page -> the targets it links to, for the pages linking into targets;
+    # they are rebuilt when a page they point at appears or goes away
+    targets = set(targets)
+    found = {}
+    for relative_dest, entry in pages.items():
+        for target in page_targets(relative_dest, entry.get("links", [])):
+            for candidate in (target, posixpath.join(target, "index.html")):
+                if candidate in targets:
+                    found.setdefault(relative_dest, []).append(candidate)
+    return found
+
+
+def prefetch_hints(pages, limit):
+    # Each page's most-linked neighbours: the pages it links to, ranked by
+    # how many pages of the site link to them
+    page_outputs = set(relative_dest.replace(os.sep, "/") for relative_dest in pages)
+    targets = {}
+    inbound = {}
+    for relative_dest, entry in pages.items():
+        links = [link for link in entry.get("links", []) if link[0] == "link"]
+        targets[relative_dest] = [
+            target
+            for target in page_targets(relative_dest, links, page_outputs)
+            if target != relative_dest.replace(os.sep, "/")
+        ]
+        for target in targets[relative_dest]:
+            inbound[target] = inbound.get(target, 0) + 1
+    hints = {}
+    for relative_dest, neighbours in targets.items():
+        # sorted is stable, so equally linked neighbours keep page order
+        ranked = sorted(neighbours, key=lambda target: -inbound[target])
+        hints[relative_dest] = ranked[:limit]
+    return hints
+
+
+def check_links(dir_path_content, manifest):
+    # One pass over every page's recorded links against the set of outputs.
+    # Returns (source path, first line, last line, kind, url) per broken link.
+    outputs = known_outputs(manifest)
+    broken = []
+    for relative_dest, entry in sorted(manifest["pages"].items()):
+        for kind, url, start_line, end_line in entry.get("links", []):
+            target = resolve(url, relative_dest)
+            if target is not None and find_output(target, outputs) is None:
+                source = os.path.join(dir_path_content, entry["source"])
+                broken.append((source, start_line, end_line, kind, url))
+    return broken
+
+
+def format_broken_links(broken):
+    lines = []
+    for source, start_line, end_line, kind, url in broken:
+        span = f"{start_line}" if start_line == end_line else f"{start_line}-{end_line}"
+        lines.append(f" ! {source}:{span}: broken {kind} {url}")
+    return lines
+
+
+def format_link_stats(manifest, broken):
+    pages = manifest["pages"].values()
+    links = sum(len(entry.get("links", [])) for entry in pages)
+    return f"Links: {links} links on {len(manifest['pages'])} pages checked, {len(broken)} broken"
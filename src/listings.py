@@ -0,0 +1,297 @@
+import argparse
+import datetime
+import html
+import json
+import os
+import re
+
+import assets
+from extract import page_url
+from htmlnode import LeafNode, LinkNode, ParentNode, escape_attribute
+from manifest import GENERATOR_VERSION, hash_bytes, load_manifest, remove_output, save_manifest
+from metadata import MetadataIndex
+from template import load_template, template_asset_urls, template_hash
+
+DEFAULT_PAGE_SIZE = 10
+FEED_SIZE = 20
+TAGS_DIR = "tags"
+ARCHIVE_DIR = "archive"
+SITEMAP_FILENAME = "sitemap.xml"
+FEED_FILENAME = "feed.xml"
+SLUG_PATTERN = re.compile(r"[^\w]+")
+
+
+def parse_page_size(value):
+    # argparse type for --page-size: 0 would divide by zero, and a negative
+    # size gives listing pages with nothing on them
+    if not value.isdigit() or int(value) < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive number of entries, got {value!r}")
+    return int(value)
+
+
+def tag_slug(tag):
+    return SLUG_PATTERN.sub("-", tag.lower()).strip("-") or "tag"
+
+
+def tag_slugs(tags):
+    # tag -> slug. Tags sharing a slug ("C++" and "C#" are both "c") each get
+    # a short hash of the tag appended, so neither listing overwrites the other.
+    by_slug = {}
+    for tag in tags:
+        by_slug.setdefault(tag_slug(tag), []).append(tag)
+    slugs = {}
+    for slug, members in by_slug.items():
+        for tag in members:
+            slugs[tag] = slug if len(members) == 1 else f"{slug}-{hash_bytes(tag.encode('utf-8'))[:8]}"
+    return slugs
+
+
+def collect_pages(dest_dir_path, manifest):
+    # Title, date and tags of every built page, straight from the metadata
+    # index the build just saved; no page body is read here
+    entries = MetadataIndex(dest_dir_path).entries
+    pages = []
+    for relative_dest, entry in sorted(manifest["pages"].items()):
+        metadata = entries.get(entry["source"])
+        if metadata is None:
+            continue
+        fields = metadata["fields"]
+        modified = datetime.datetime.fromtimestamp(metadata["mtime_ns"] / 1e9, datetime.timezone.utc)
+        pages.append(
+            {
+                "path": relative_dest,
+                "url": page_url(relative_dest),
+                "title": fields.get("title") or page_url(relative_dest),
+                "date": fields.get("date"),
+                "tags": fields.get("tags", []),
+                "modified": modified.date().isoformat(),
+            }
+        )
+    return pages
+
+
+def newest_first(pages):
+    # Dated pages newest first, then undated ones by title
+    dated = [page for page in pages if page["date"]]
+    undated = [page for page in pages if not page["date"]]
+    dated.sort(key=lambda page: (page["date"], page["url"]), reverse=True)
+    undated.sort(key=lambda page: (page["title"], page["url"]))
+    return dated + undated
+
+
+def item(page):
+    return {"url": page["url"], "title": page["title"], "date": page["date"]}
+
+
+def paginate(base, title, pages, page_size):
+    # /base/, /base/page/2/, ... with newer and older links between them
+    chunks = [pages[i : i + page_size] for i in range(0, len(pages), page_size)] or [[]]
+    urls = [f"/{base}/"] + [f"/{base}/page/{number}/" for number in range(2, len(chunks) + 1)]
+    listings = []
+    for number, chunk in enumerate(chunks, 1):
+        page_title = title if len(chunks) == 1 else f"{title} (page {number} of {len(chunks)})"
+        listings.append(
+            {
+                "title": page_title,
+                "items": [item(page) for page in chunk],
+                "newer": urls[number - 2] if number > 1 else None,
+                "older": urls[number] if number < len(chunks) else None,
+                "path": urls[number - 1],
+            }
+        )
+    return listings
+
+
+def plan_listings(pages, dir_path_content, page_size):
+    # url -> listing: section indexes for directories without an index.md,
+    # one page per tag plus a tag index, and the paginated archive of dated pages
+    listings = {}
+    sections = {}
+    for page in pages:
+        section = os.path.dirname(page["path"])
+        if section and os.path.basename(page["path"]) != "index.html":
+            sections.setdefault(section, []).append(page)
+    for section, members in sorted(sections.items()):
+        if os.path.exists(os.path.join(dir_path_content, section, "index.md")):
+            continue
+        title = os.path.basename(section).replace("-", " ").replace("_", " ").title()
+        for listing in paginate(section.replace(os.sep, "/"), title, newest_first(members), page_size):
+            listings[listing["path"]] = listing
+
+    tags = {}
+    for page in pages:
+        for tag in page["tags"]:
+            tags.setdefault(tag, []).append(page)
+    if tags:
+        slugs = tag_slugs(tags)
+        tag_items = [
+            {"url": f"/{TAGS_DIR}/{slugs[tag]}/", "title": f"{tag} ({len(members)})", "date": None}
+            for tag, members in sorted(tags.items())
+        ]
+        listings[f"/{TAGS_DIR}/"] = {"title": "Tags", "items": tag_items, "newer": None, "older": None}
+        for tag, members in sorted(tags.items()):
+            base = f"{TAGS_DIR}/{slugs[tag]}"
+            for listing in paginate(base, f"Tagged {tag}", newest_first(members), page_size):
+                listings[listing["path"]] = listing
+
+    dated = [page for page in pages if page["date"]]
+    if dated:
+        for listing in paginate(ARCHIVE_DIR, "Archive", newest_first(dated), page_size):
+            listings[listing["path"]] = listing
+    return listings
+
+
+def listing_html(listing):
+    items = []
+    for entry in listing["items"]:
+        children = [LinkNode(entry["title"], entry["url"])]
+        if entry["date"]:
+            children.append(LeafNode(None, " "))
+            children.append(LeafNode("time", entry["date"], {"datetime": entry["date"]}))
+        items.append(ParentNode("li", children))
+    children = [ParentNode("ul", items) if items else LeafNode("p", "Nothing here yet.")]
+    links = []
+    if listing["newer"]:
+        links.append(LeafNode("a", "Newer", {"href": listing["newer"], "rel": "prev"}))
+    if listing["older"]:
+        links.append(LeafNode("a", "Older", {"href": listing["older"], "rel": "next"}))
+    if links:
+        children.append(ParentNode("nav", links))
+    return ParentNode("div", children, {"class": "listing"})
+
+
+def render_listing(template_path, url, listing):
+    values = {
+        "Title": escape_attribute(listing["title"]),
+        "Content": listing_html(listing).to_html(),
+        "Path": escape_attribute(url),
+    }
+    return load_template(template_path).render(values)
+
+
+def atom_date(date):
+    # Front matter dates are usually plain days
+    return date if "T" in date else date + "T00:00:00Z"
+
+
+def sitemap_xml(site_url, pages, listing_urls):
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">',
+    ]
+    for page in pages:
+        lastmod = page["date"] or page["modified"]
+        loc = html.escape(site_url + page["url"])
+        lines.append(f"<url><loc>{loc}</loc><lastmod>{html.escape(lastmod)}</lastmod></url>")
+    for url in listing_urls:
+        lines.append(f"<url><loc>{html.escape(site_url + url)}</loc></url>")
+    lines.append("</urlset>")
+    return "\n".join(lines) + "\n"
+
+
+def feed_xml(site_url, site_title, pages):
+    entries = newest_first([page for page in pages if page["date"]])[:FEED_SIZE]
+    updated = atom_date(entries[0]["date"]) if entries else "1970-01-01T00:00:00Z"
+    lines = [
+        '<?xml version="1.0" encoding="utf-8"?>',
+        '<feed xmlns="http://www.w3.org/2005/Atom">',
+        f"<title>{html.escape(site_title)}</title>",
+        f'<link href="{html.escape(site_url)}/"/>',
+        f'<link rel="self" href="{html.escape(site_url)}/{FEED_FILENAME}"/>',
+        f"<id>{html.escape(site_url)}/</id>",
+        f"<updated>{updated}</updated>",
+        f"<author><name>{html.escape(site_title)}</name></author>",
+    ]
+    for page in entries:
+        url = html.escape(site_url + page["url"])
+        lines.append(
+            f'<entry><title>{html.escape(page["title"])}</title><link href="{url}"/><id>{url}</id>'
+            f"<updated>{atom_date(page['date'])}</updated></entry>"
+        )
+    lines.append("</feed>")
+    return "\n".join(lines) + "\n"
+
+
+def write_text(dest_path, text):
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    tmp_path = dest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, dest_path)
+
+
+def generate_listings(
+    dir_path_content, template_path, dest_dir_path, listings=True, site_url=None, page_size=DEFAULT_PAGE_SIZE
+):
+    # Writes section, tag and archive pages (listings) and sitemap.xml and
+    # feed.xml (site_url). Each output is rewritten only when its entries,
+    # their order or the template changed; outputs no longer produced are
+    # removed.
+    manifest = load_manifest(dest_dir_path)
+    previous = manifest.get("listings", {})
+    pages = collect_pages(dest_dir_path, manifest)
+    # output path -> (what it depends on, how to render it)
+    outputs = {}
+
+    if listings:
+        current_template_hash = template_hash(template_path)
+        # Fingerprinted URLs in the template, as pages are keyed on them
+        template_assets = assets.urls_digest(template_asset_urls(template_path))
+        for url, listing in plan_listings(pages, dir_path_content, page_size).items():
+            relative_dest = os.path.normpath(url.strip("/") + "/index.html")
+            if relative_dest in manifest["pages"]:
+                # A hand-written page wins over a generated one
+                continue
+            key = [GENERATOR_VERSION, current_template_hash, template_assets, listing]
+            outputs[relative_dest] = (key, (url, listing))
+    if site_url:
+        site_url = site_url.rstrip("/")
+        listing_urls = sorted(page_url(relative_dest) for relative_dest in outputs)
+        sitemap = sitemap_xml(site_url, pages, listing_urls)
+        outputs[SITEMAP_FILENAME] = (sitemap, sitemap)
+        root = next((page for page in pages if page["url"] == "/"), None)
+        feed = feed_xml(site_url, root["title"] if root else site_url, pages)
+        outputs[FEED_FILENAME] = (feed, feed)
+
+    stats = {"written": 0, "unchanged": 0, "removed": 0, "urls": []}
+    recorded = {}
+    for relative_dest, (key, source) in sorted(outputs.items()):
+        recorded[relative_dest] = hash_bytes(json.dumps(key, sort_keys=True).encode("utf-8"))
+        dest_path = os.path.join(dest_dir_path, relative_dest)
+        if previous.get(relative_dest) == recorded[relative_dest] and os.path.exists(dest_path):
+            stats["unchanged"] += 1
+            continue
+        if isinstance(source, str):
+            write_text(dest_path, source)
+        else:
+            write_text(dest_path, render_listing(template_path, *source))
+        stats["written"] += 1
+        stats["urls"].append(page_url(relative_dest))
+    stats["removed"] = prune_listings(dest_dir_path, manifest, previous, recorded)
+
+    manifest["listings"] = recorded
+    save_manifest(dest_dir_path, manifest)
+    return stats
+
+
+def prune_listings(dest_dir_path, manifest, previous, recorded):
+    removed = 0
+    for relative_dest in previous:
+        if relative_dest not in recorded and relative_dest not in manifest["pages"]:
+            remove_output(dest_dir_path, relative_dest)
+            removed += 1
+    return removed
+
+
+def remove_listings(dest_dir_path):
+    # Builds without --listings or --site-url drop what an earlier one generated
+    manifest = load_manifest(dest_dir_path)
+    if not manifest.get("listings"):
+        return
+    prune_listings(dest_dir_path, manifest, manifest["listings"], {})
+    manifest["listings"] = {}
+    save_manifest(dest_dir_path, manifest)
+
+
+def format_listing_stats(stats):
+    return f"Listings: {stats['written']} written, {stats['unchanged']} unchanged, {stats['removed']} removed"
@@ -0,0 +1,60 @@
+import json
+import threading
+
+LIVERELOAD_PATH = "/__livereload"
+LIVERELOAD_SCRIPT = """<script>
+(function () {
+  var key = "livereload-edited";
+  var edited = sessionStorage.getItem(key);
+  if (edited) {
+    sessionStorage.removeItem(key);
+    fetch("%(path)s/loaded?edited=" + edited + "&path=" + encodeURIComponent(location.pathname));
+  }
+  var source = new EventSource("%(path)s?path=" + encodeURIComponent(location.pathname));
+  source.onmessage = function (event) {
+    sessionStorage.setItem(key, JSON.parse(event.data).edited);
+    location.reload();
+  };
+})();
+</script>
+""" % {"path": LIVERELOAD_PATH}
+
+
+class LiveReload:
+    # Open EventSource connections and the page each one is looking at.
+    # A client is anything with a put(message) method; the watcher thread
+    # calls reload() while the server owns the connections.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clients = {}
+
+    def connect(self, page_path, client):
+        with self.lock:
+            self.clients[client] = page_path
+        return client
+
+    def disconnect(self, client):
+        with self.lock:
+            self.clients.pop(client, None)
+
+    def viewed_pages(self):
+        with self.lock:
+            return set(self.clients.values())
+
+    def reload(self, edited, page_paths=None, exclude=()):
+        message = json.dumps({"edited": edited})
+        with self.lock:
+            for client, page_path in self.clients.items():
+                if page_path in exclude:
+                    continue
+                if page_paths is None or page_path in page_paths:
+                    client.put(message)
+
+
+def inject_script(body):
+    # The reload script goes just before </body>, or at the end without one
+    script = LIVERELOAD_SCRIPT.encode("utf-8")
+    index = body.rfind(b"</body>")
+    if index == -1:
+        return body + script
+    return body[:index] + script + body[index:]
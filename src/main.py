@@ -1,26 +1,451 @@
+import argparse
 import os
 import shutil
+import sys
 
-from copy_directory import copy_files_recursive
-from extract import generate_page, generate_pages_recursive
+import assets
+import bench
+import fragment_cache
+import image_size
+import link_graph
+import listings
+import metadata
+import precompress
+import profiler
+import render_cache
+import search_index
+import shards
+from copy_directory import format_copy_stats, sync_static
+from extract import explain_page, generate_page, generate_pages_recursive, parse_jobs, update_search_index
+from manifest import load_manifest
+from preview import preview
+from server import serve
 
 dir_path_static = "./static"
 dir_path_public = "./public"
 dir_path_content = "./contents"
 template_path = "./template.html"
+dir_path_shards = "./.shards"
 
 
-def main():
-    print("Deleting public directory...")
-    if os.path.exists(dir_path_public):
-        shutil.rmtree(dir_path_public)
+def add_build_arguments(parser):
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="delete the public directory and rebuild every page",
+    )
+    parser.add_argument(
+        "--checksum",
+        action="store_true",
+        help="compare static files by content hash instead of size and mtime",
+    )
+    parser.add_argument(
+        "--hardlink",
+        action="store_true",
+        help="hardlink static files into public instead of copying when possible",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=parse_jobs,
+        default=1,
+        help="render pages on N worker processes (0 uses every core)",
+    )
+    parser.add_argument(
+        "--cache",
+        nargs="?",
+        const=render_cache.DEFAULT_CACHE_DIR,
+        help="keep rendered pages in a render cache: a directory, or an http:// URL of a cache server "
+        f"(no value: {render_cache.DEFAULT_CACHE_DIR}); off unless given",
+    )
+    parser.add_argument(
+        "--cache-size",
+        default="256M",
+        help="size limit for a local render cache, e.g. 512M or 2G (default: 256M)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="render every page from scratch even when --cache is given",
+    )
+    parser.add_argument(
+        "--fragment-cache-size",
+        default="32M",
+        help="memory limit for reusing rendered blocks repeated across pages (default: 32M)",
+    )
+    parser.add_argument(
+        "--no-fragment-cache",
+        action="store_true",
+        help="render every block from scratch, for memory-constrained builds",
+    )
+    parser.add_argument(
+        "--fingerprint",
+        action="store_true",
+        help="also publish static files under content-hashed names and link pages to those",
+    )
+    parser.add_argument(
+        "--no-image-sizes",
+        action="store_true",
+        help="leave width, height and lazy loading off images from static/",
+    )
+    parser.add_argument(
+        "--drafts",
+        action="store_true",
+        help="also build pages whose front matter says draft: true",
+    )
+    parser.add_argument(
+        "--listings",
+        action="store_true",
+        help="generate section indexes, tag pages and a paginated archive from page front matter",
+    )
+    parser.add_argument(
+        "--page-size",
+        type=listings.parse_page_size,
+        default=listings.DEFAULT_PAGE_SIZE,
+        help=f"entries per generated listing page (default: {listings.DEFAULT_PAGE_SIZE})",
+    )
+    parser.add_argument(
+        "--site-url",
+        help="absolute URL the site is served from; also writes sitemap.xml and an Atom feed.xml",
+    )
+    parser.add_argument(
+        "--search",
+        action="store_true",
+        help="write a search index split into per-prefix shards under public/search",
+    )
+    parser.add_argument(
+        "--check-links",
+        action="store_true",
+        help="report links and images pointing at pages or files the build doesn't have, with source lines",
+    )
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=0,
+        metavar="N",
+        help="fill {{ Prefetch }} with prefetch hints for each page's N most-linked neighbours "
+        "(ignored by shard builds)",
+    )
+    parser.add_argument(
+        "--precompress",
+        action="store_true",
+        help="write a .gz next to each html, css, js, svg and json output for the server to hand out",
+    )
+    parser.add_argument(
+        "--precompress-min-size",
+        type=int,
+        default=precompress.DEFAULT_MIN_SIZE,
+        help=f"skip outputs smaller than this many bytes (default: {precompress.DEFAULT_MIN_SIZE})",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="time every build stage per page and write a Chrome trace",
+    )
+    parser.add_argument(
+        "--trace-file",
+        default="build-trace.json",
+        help="where --profile writes its trace-event JSON (default: build-trace.json)",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=10,
+        help="how many of the slowest pages --profile lists",
+    )
 
-    print("Copying static files to public directory...")
-    copy_files_recursive(dir_path_static, dir_path_public)
 
-    print("Generating pages recursively...")
-    generate_pages_recursive(dir_path_content, template_path, dir_path_public)
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build the static site into ./public")
+    commands = parser.add_subparsers(dest="command")
 
+    build_parser = commands.add_parser("build", help="build the site (the default)")
+    add_build_arguments(build_parser)
+    build_parser.add_argument(
+        "--shard",
+        type=shards.parse_shard,
+        metavar="I/N",
+        help="build only the I-th of N deterministic shares of the pages, into the shard directory, "
+        "for \"merge\" to put together",
+    )
+    build_parser.add_argument(
+        "--shard-dir",
+        default=dir_path_shards,
+        help=f"where shard builds write and merge reads (default: {dir_path_shards})",
+    )
 
-main()
+    merge_parser = commands.add_parser(
+        "merge", help="put shard builds together into public, then write the search index, listings and sitemap"
+    )
+    add_build_arguments(merge_parser)
+    merge_parser.add_argument(
+        "--shard-dir",
+        default=dir_path_shards,
+        help=f"where the shard builds are (default: {dir_path_shards})",
+    )
+    merge_parser.add_argument(
+        "--shards", type=int, help="how many shards the build was split into, when the directory has several splits"
+    )
 
+    serve_parser = commands.add_parser("serve", help="build, then serve the public directory")
+    add_build_arguments(serve_parser)
+    serve_parser.add_argument("--port", type=int, default=8888)
+    serve_parser.add_argument("--bind", default="", help="address to listen on (default: all)")
+    serve_parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="rebuild what changed in contents, static and the template, and live-reload browsers",
+    )
+    serve_parser.add_argument(
+        "--file-cache-size",
+        default="32M",
+        help="memory for keeping small files in the server (default: 32M)",
+    )
+
+    preview_parser = commands.add_parser(
+        "preview", help="serve pages rendered as they are requested, without building the site first"
+    )
+    preview_parser.add_argument("--port", type=int, default=8888)
+    preview_parser.add_argument("--bind", default="", help="address to listen on (default: all)")
+    preview_parser.add_argument(
+        "--file-cache-size",
+        default="32M",
+        help="memory for keeping rendered pages in the server (default: 32M)",
+    )
+
+    cache_parser = commands.add_parser("cache-server", help="serve a render cache over HTTP for other builds")
+    cache_parser.add_argument("--port", type=int, default=8899)
+    cache_parser.add_argument("--bind", default="", help="address to listen on (default: all)")
+    cache_parser.add_argument("--dir", default="./.cache/server", help="where the server stores entries")
+    cache_parser.add_argument("--cache-size", default="1G", help="size limit for stored entries (default: 1G)")
+
+    why_parser = commands.add_parser("why", help="explain why the last build rebuilt a page")
+    why_parser.add_argument("page", help="a URL like /majesty/, an output path or a source .md path")
+
+    bench_parser = commands.add_parser("bench", help="time each build stage on a synthetic site")
+    bench.add_arguments(bench_parser)
+
+    if argv is None:
+        argv = sys.argv[1:]
+    # Plain "main.py [options]" still means build
+    if not argv or argv[0] not in commands.choices and argv[0] not in ("-h", "--help"):
+        argv = ["build"] + list(argv)
+    return parser.parse_args(argv)
+
+
+def build(args):
+    if args.profile:
+        profiler.start()
+
+    # A shard builds its share of the pages into its own directory;
+    # "merge" puts the shards together and does everything else in public
+    shard = getattr(args, "shard", None)
+    merging = args.command == "merge"
+    dest_dir_path = dir_path_public
+    if shard is not None:
+        dest_dir_path = shards.shard_dir(args.shard_dir, *shard)
+
+    if args.force:
+        print(f"Deleting {dest_dir_path}...")
+        if os.path.exists(dest_dir_path):
+            shutil.rmtree(dest_dir_path)
+
+    if shard is None:
+        print("Copying static files to public directory...")
+        with profiler.stage("sync_static"):
+            copy_stats = sync_static(
+                dir_path_static, dir_path_public, checksum=args.checksum, hardlink=args.hardlink
+            )
+        print(format_copy_stats(copy_stats))
+
+    if args.fingerprint:
+        with profiler.stage("fingerprint"):
+            asset_urls, fingerprint_stats = assets.fingerprint_assets(dir_path_static, dest_dir_path)
+        assets.configure(asset_urls)
+        print(assets.format_fingerprint_stats(fingerprint_stats))
+    else:
+        assets.remove_fingerprints(dest_dir_path)
+        assets.configure(None)
+
+    if args.no_image_sizes:
+        image_size.configure(None)
+    else:
+        with profiler.stage("image_sizes"):
+            sizes, image_stats = image_size.probe_static_images(dir_path_static, dest_dir_path)
+        image_size.configure(sizes)
+        print(image_size.format_image_stats(image_stats))
+
+    cache = None
+    if args.cache and not args.no_cache and not merging:
+        cache = render_cache.open_cache(args.cache, render_cache.parse_size(args.cache_size))
+
+    fragments = None
+    if not merging:
+        fragments = fragment_cache.configure(
+            0 if args.no_fragment_cache else render_cache.parse_size(args.fragment_cache_size)
+        )
+
+    if args.search:
+        search_index.configure(True)
+    else:
+        search_index.remove_index(dest_dir_path)
+        search_index.configure(False)
+
+    if merging:
+        print(f"Merging shards from {args.shard_dir}...")
+        with profiler.stage("merge"):
+            try:
+                summary = shards.merge_shards(args.shard_dir, dir_path_public, args.shards, args.force)
+            except ValueError as e:
+                print(f"Cannot merge: {e}")
+                return False
+        print(shards.format_merge_stats(summary))
+        if search_index.active:
+            # Shards built with --search bring their pages' terms along
+            with profiler.stage("search_index"):
+                summary["search"] = update_search_index(
+                    dir_path_content,
+                    template_path,
+                    dir_path_public,
+                    load_manifest(dir_path_public)["pages"],
+                    summary["index_entries"],
+                )
+    else:
+        if shard is not None:
+            print(f"Generating shard {shard[0]}/{shard[1]} into {dest_dir_path}...")
+        else:
+            print("Generating pages recursively...")
+        with profiler.stage("generate_pages"):
+            summary = generate_pages_recursive(
+                dir_path_content,
+                template_path,
+                dest_dir_path,
+                force=args.force,
+                jobs=args.jobs,
+                cache=cache,
+                drafts=args.drafts,
+                shard=shard,
+                # Ranking neighbours needs every page's links
+                prefetch=args.prefetch if shard is None else 0,
+            )
+        print(
+            f"Pages: {len(summary['rebuilt'])} rebuilt, "
+            f"{len(summary['skipped'])} skipped, "
+            f"{len(summary['deleted'])} deleted, "
+            f"{len(summary['failed'])} failed"
+        )
+        print(metadata.format_metadata_stats(summary["metadata"], len(summary["drafts"])))
+    if cache is not None:
+        cache.finish()
+        print(cache.format_stats())
+    if fragments is not None:
+        print(fragments.format_stats())
+    if "search" in summary:
+        print(search_index.format_search_stats(summary["search"]))
+    for page, error in summary["failed"]:
+        print(f" ! {page}: {error}")
+
+    # Listings, the sitemap and precompression cover the whole site, so
+    # shards leave them to the merge
+    if shard is None:
+        build_site_outputs(args)
+        if args.check_links:
+            manifest = load_manifest(dir_path_public)
+            with profiler.stage("check_links"):
+                broken = link_graph.check_links(dir_path_content, manifest)
+            print(link_graph.format_link_stats(manifest, broken))
+            for line in link_graph.format_broken_links(broken):
+                print(line)
+
+    if args.profile:
+        build_profile = profiler.stop()
+        print()
+        print(build_profile.format_report(args.profile_top))
+        build_profile.write_trace(args.trace_file)
+        print(f"Wrote trace to {args.trace_file}")
+    return not summary["failed"]
+
+
+def build_site_outputs(args):
+    if args.listings or args.site_url:
+        with profiler.stage("listings"):
+            listing_stats = listings.generate_listings(
+                dir_path_content,
+                template_path,
+                dir_path_public,
+                listings=args.listings,
+                site_url=args.site_url,
+                page_size=args.page_size,
+            )
+        print(listings.format_listing_stats(listing_stats))
+    else:
+        listings.remove_listings(dir_path_public)
+
+    if args.precompress:
+        with profiler.stage("precompress"):
+            precompress_stats = precompress.precompress_outputs(dir_path_public, args.precompress_min_size)
+        print(precompress.format_precompress_stats(precompress_stats))
+    else:
+        precompress.remove_precompressed(dir_path_public)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.command == "bench":
+        if not bench.run(args):
+            sys.exit(1)
+        return
+
+    if args.command == "why":
+        print("\n".join(explain_page(args.page, dir_path_content, template_path, dir_path_public)))
+        return
+
+    if args.command == "cache-server":
+        httpd = render_cache.make_cache_server(
+            args.dir, port=args.port, bind=args.bind, max_bytes=render_cache.parse_size(args.cache_size)
+        )
+        print(f"Serving render cache from {args.dir} on http://{args.bind or 'localhost'}:{args.port}/")
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if args.command == "preview":
+        preview(
+            dir_path_static,
+            dir_path_content,
+            template_path,
+            port=args.port,
+            bind=args.bind,
+            file_cache_size=render_cache.parse_size(args.file_cache_size),
+        )
+        return
+
+    if args.command == "serve":
+        build(args)
+        serve(
+            dir_path_static,
+            dir_path_public,
+            dir_path_content,
+            template_path,
+            port=args.port,
+            bind=args.bind,
+            watch=args.watch,
+            fingerprint=args.fingerprint,
+            image_sizes=not args.no_image_sizes,
+            drafts=args.drafts,
+            listings=args.listings,
+            site_url=args.site_url,
+            page_size=args.page_size,
+            file_cache_size=render_cache.parse_size(args.file_cache_size),
+        )
+        return
+
+    if not build(args):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
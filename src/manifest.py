@@ -0,0 +1,69 @@
+import hashlib
+import json
+import os
+
+GENERATOR_VERSION = "4"
+MANIFEST_FILENAME = ".build-manifest.json"
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path):
+    with open(path, "rb") as f:
+        return hash_bytes(f.read())
+
+
+def manifest_path(dest_dir_path):
+    return os.path.join(dest_dir_path, MANIFEST_FILENAME)
+
+
+def load_manifest(dest_dir_path):
+    path = manifest_path(dest_dir_path)
+    if not os.path.exists(path):
+        return {"version": GENERATOR_VERSION, "pages": {}}
+    try:
+        with open(path, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        # A corrupt manifest just means a full rebuild
+        return {"version": GENERATOR_VERSION, "pages": {}}
+    manifest.setdefault("pages", {})
+    return manifest
+
+
+def save_manifest(dest_dir_path, manifest):
+    os.makedirs(dest_dir_path, exist_ok=True)
+    path = manifest_path(dest_dir_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def page_entry(source, source_hash, template_hash, context=None):
+    entry = {
+        "source": source,
+        "source_hash": source_hash,
+        "template_hash": template_hash,
+        "version": GENERATOR_VERSION,
+    }
+    if context:
+        # Digests of optional render inputs, like the names of the assets and
+        # the sizes of the images the page references
+        entry["context"] = context
+    return entry
+
+
+def remove_output(dest_dir_path, relative_path):
+    path = os.path.join(dest_dir_path, relative_path)
+    if os.path.exists(path):
+        os.remove(path)
+    # Clean up directories left empty by the removal
+    dir_path = os.path.dirname(path)
+    while os.path.abspath(dir_path) != os.path.abspath(dest_dir_path):
+        if not os.path.isdir(dir_path) or os.listdir(dir_path):
+            break
+        os.rmdir(dir_path)
+        dir_path = os.path.dirname(dir_path)
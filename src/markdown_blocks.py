@@ -1,6 +1,9 @@
-from htmlnode import ParentNode
+import io
+
+import fragment_cache
+from htmlnode import ParentNode, RawHTMLNode
 from inline_markdown import text_to_textnodes
-from textnode import text_node_to_html_node
+from textnode import text_node_to_html_node, text_type_image, text_type_link
 
 block_type_paragraph = "paragraph"
 block_type_heading = "heading"
@@ -10,47 +13,134 @@ block_type_olist = "ordered_list"
 block_type_ulist = "unordered_list"
 
 
-def markdown_to_blocks(markdown):
-    blocks = markdown.split("\n\n")
-    filtered_blocks = []
-    for block in blocks:
-        if block == "":
+class Block:
+    # A block of markdown with its type and 1-based, inclusive line span
+    __slots__ = ("block_type", "lines", "start_line", "end_line")
+
+    def __init__(self, block_type, lines, start_line, end_line):
+        self.block_type = block_type
+        self.lines = lines
+        self.start_line = start_line
+        self.end_line = end_line
+
+    @property
+    def text(self):
+        return "\n".join(self.lines)
+
+    def __repr__(self):
+        return f"Block({self.block_type}, lines {self.start_line}-{self.end_line})"
+
+
+def iter_lines(markdown):
+    # Strings are read as a stream of lines too, so nothing is split up front
+    if isinstance(markdown, str):
+        markdown = io.StringIO(markdown)
+    for line in markdown:
+        yield line.rstrip("\r\n")
+
+
+def scan_blocks(markdown):
+    # Single pass over the lines: blank lines end a block, except inside a
+    # ``` fence, which runs until its closing fence line. Only the current
+    # block is held in memory.
+    lines = []
+    start_line = 0
+    in_fence = False
+    line_number = 0
+    for line_number, line in enumerate(iter_lines(markdown), 1):
+        if in_fence:
+            lines.append(line)
+            if line.startswith("```"):
+                yield make_block(lines, start_line, line_number)
+                lines = []
+                in_fence = False
+            continue
+        if line.strip() == "":
+            if lines:
+                yield make_block(lines, start_line, line_number - 1)
+                lines = []
             continue
-        block = block.strip()
-        filtered_blocks.append(block)
-    return filtered_blocks
+        if not lines:
+            start_line = line_number
+            in_fence = is_fence_opener(line.strip())
+        lines.append(line)
+
+    if in_fence:
+        # An unclosed fence is ordinary text, split on blank lines as usual
+        *blocks, (lines, start_line) = split_on_blank_lines(lines, start_line)
+        yield from blocks
+    if lines:
+        yield make_block(lines, start_line, line_number)
+
+
+def split_on_blank_lines(lines, start_line):
+    # The finished blocks in lines, then the trailing lines still open and
+    # where they start
+    results = []
+    pending = []
+    pending_start = start_line
+    for offset, line in enumerate(lines):
+        if line.strip() == "":
+            if pending:
+                results.append(make_block(pending, pending_start, start_line + offset - 1))
+                pending = []
+            continue
+        if not pending:
+            pending_start = start_line + offset
+        pending.append(line)
+    results.append((pending, pending_start))
+    return results
+
+
+def is_fence_opener(line):
+    # A line like ```code``` is inline code, not the start of a fence
+    return line.startswith("```") and "```" not in line.lstrip("`")
+
+
+def make_block(lines, start_line, end_line):
+    # Same trimming as strip() on the whole block
+    lines[0] = lines[0].lstrip()
+    lines[-1] = lines[-1].rstrip()
+    return Block(lines_to_block_type(lines), lines, start_line, end_line)
+
+
+def markdown_to_blocks(markdown):
+    return [block.text for block in scan_blocks(markdown)]
 
 
 def block_to_block_type(block):
-    lines = block.split("\n")
+    return lines_to_block_type(block.split("\n"))
+
 
+def lines_to_block_type(lines):
+    first = lines[0]
     if (
-        block.startswith("# ")
-        or block.startswith("## ")
-        or block.startswith("### ")
-        or block.startswith("#### ")
-        or block.startswith("##### ")
-        or block.startswith("###### ")
+        first.startswith("# ")
+        or first.startswith("## ")
+        or first.startswith("### ")
+        or first.startswith("#### ")
+        or first.startswith("##### ")
+        or first.startswith("###### ")
     ):
         return block_type_heading
-    if len(lines) > 1 and lines[0].startswith("```") and lines[-1].startswith("```"):
+    if len(lines) > 1 and first.startswith("```") and lines[-1].startswith("```"):
         return block_type_code
-    if block.startswith(">"):
+    if first.startswith(">"):
         for line in lines:
             if not line.startswith(">"):
                 return block_type_paragraph
         return block_type_quote
-    if block.startswith("* "):
+    if first.startswith("* "):
         for line in lines:
             if not line.startswith("* "):
                 return block_type_paragraph
         return block_type_ulist
-    if block.startswith("- "):
+    if first.startswith("- "):
         for line in lines:
             if not line.startswith("- "):
                 return block_type_paragraph
         return block_type_ulist
-    if block.startswith("1. "):
+    if first.startswith("1. "):
         i = 1
         for line in lines:
             if not line.startswith(f"{i}. "):
@@ -60,29 +150,84 @@ def block_to_block_type(block):
     return block_type_paragraph
 
 
-def markdown_to_html_node(markdown):
-    blocks = markdown_to_blocks(markdown)
+def markdown_to_html_node(markdown, links=None):
+    # links, when given, collects every block's block_links in the same pass
+    cache = fragment_cache.active()
     children = []
-    for block in blocks:
-        html_node = block_to_html_node(block)
-        children.append(html_node)
+    for block in scan_blocks(markdown):
+        if links is not None:
+            links.extend(block_links(block))
+        if cache is None:
+            children.append(lines_to_html_node(block.lines, block.block_type))
+            continue
+        # Blocks repeated across pages (footers, disclaimers) render once
+        key = fragment_cache.block_key(block.block_type, block.lines)
+        html = cache.get(key)
+        if html is None:
+            html = lines_to_html_node(block.lines, block.block_type).to_html()
+            cache.put(key, html)
+        children.append(RawHTMLNode(html))
     return ParentNode("div", children, None)
 
 
+def block_links(block):
+    # [kind, url, first line, last line] for every link and image in a block
+    # outside code, with the span of the block
+    links = []
+    for text in inline_texts(block):
+        # Most blocks link nowhere; skip the inline parse for them
+        if "](" not in text:
+            continue
+        for node in text_to_textnodes(text):
+            if node.text_type == text_type_link:
+                links.append(["link", node.url, block.start_line, block.end_line])
+            elif node.text_type == text_type_image:
+                links.append(["image", node.url, block.start_line, block.end_line])
+    return links
+
+
+def inline_texts(block):
+    # The text lines_to_html_node hands to text_to_textnodes for each block
+    # type: list items without their marker, quotes without ">" and headings
+    # without "#". Code blocks have none that links are taken from.
+    if block.block_type == block_type_paragraph:
+        return [" ".join(block.lines)]
+    if block.block_type == block_type_heading:
+        text = block.text
+        return [text[len(text) - len(text.lstrip("#")) + 1 :]]
+    if block.block_type == block_type_quote:
+        return [" ".join(line.lstrip(">").strip() for line in block.lines)]
+    if block.block_type == block_type_ulist:
+        return [task_item_text(line[2:].strip()) for line in block.lines]
+    if block.block_type == block_type_olist:
+        return [task_item_text(line[3:].strip()) for line in block.lines]
+    return []
+
+
+def task_item_text(text):
+    if text.startswith("[ ]") or text.startswith("[x]"):
+        return text[3:].strip()
+    return text
+
+
 def block_to_html_node(block):
-    block_type = block_to_block_type(block)
+    lines = block.split("\n")
+    return lines_to_html_node(lines, lines_to_block_type(lines))
+
+
+def lines_to_html_node(lines, block_type):
     if block_type == block_type_paragraph:
-        return paragraph_to_html_node(block)
+        return paragraph_to_html_node(lines)
     if block_type == block_type_heading:
-        return heading_to_html_node(block)
+        return heading_to_html_node(lines)
     if block_type == block_type_code:
-        return code_to_html_node(block)
+        return code_to_html_node(lines)
     if block_type == block_type_olist:
-        return olist_to_html_node(block)
+        return olist_to_html_node(lines)
     if block_type == block_type_ulist:
-        return ulist_to_html_node(block)
+        return ulist_to_html_node(lines)
     if block_type == block_type_quote:
-        return quote_to_html_node(block)
+        return quote_to_html_node(lines)
     raise ValueError("Invalid block type")
 
 
@@ -95,14 +240,14 @@ def text_to_children(text):
     return children
 
 
-def paragraph_to_html_node(block):
-    lines = block.split("\n")
+def paragraph_to_html_node(lines):
     paragraph = " ".join(lines)
     children = text_to_children(paragraph)
     return ParentNode("p", children)
 
 
-def heading_to_html_node(block):
+def heading_to_html_node(lines):
+    block = "\n".join(lines)
     level = 0
     for char in block:
         if char == "#":
@@ -116,45 +261,41 @@ def heading_to_html_node(block):
     return ParentNode(f"h{level}", children)
 
 
-def code_to_html_node(block):
-    if not block.startswith("```") or not block.endswith("```"):
+def code_to_html_node(lines):
+    if not lines[0].startswith("```") or not lines[-1].endswith("```"):
         raise ValueError("Invalid code block")
-    text = block[4:-3]
+    text = "\n".join(lines)[4:-3]
     children = text_to_children(text)
     code = ParentNode("code", children)
     return ParentNode("pre", [code])
 
 
-def olist_to_html_node(block):
-    items = block.split("\n")
+def list_item_children(text):
+    # Task items get a checkbox; it is markup, so it skips text escaping
+    if text.startswith("[ ]"):  # Unchecked task item
+        return [RawHTMLNode('<input type="checkbox" disabled> ')] + text_to_children(text[3:].strip())
+    if text.startswith("[x]"):  # Checked task item
+        return [RawHTMLNode('<input type="checkbox" checked disabled> ')] + text_to_children(text[3:].strip())
+    return text_to_children(text)
+
+
+def olist_to_html_node(lines):
     html_items = []
-    for item in items:
+    for item in lines:
         text = item[3:].strip()  # Remove "1. " or similar numbering
-        if text.startswith("[ ]"):  # Unchecked task item
-            text = f'<input type="checkbox" disabled> {text[3:].strip()}'
-        elif text.startswith("[x]"):  # Checked task item
-            text = f'<input type="checkbox" checked disabled> {text[3:].strip()}'
-        children = text_to_children(text)
-        html_items.append(ParentNode("li", children))
+        html_items.append(ParentNode("li", list_item_children(text)))
     return ParentNode("ol", html_items)
 
 
-def ulist_to_html_node(block):
-    items = block.split("\n")
+def ulist_to_html_node(lines):
     html_items = []
-    for item in items:
+    for item in lines:
         text = item[2:].strip()  # Remove "- " or "* " from the start
-        if text.startswith("[ ]"):  # Unchecked task item
-            text = f'<input type="checkbox" disabled> {text[3:].strip()}'
-        elif text.startswith("[x]"):  # Checked task item
-            text = f'<input type="checkbox" checked disabled> {text[3:].strip()}'
-        children = text_to_children(text)
-        html_items.append(ParentNode("li", children))
+        html_items.append(ParentNode("li", list_item_children(text)))
     return ParentNode("ul", html_items)
 
 
-def quote_to_html_node(block):
-    lines = block.split("\n")
+def quote_to_html_node(lines):
     new_lines = []
     for line in lines:
         if not line.startswith(">"):
@@ -0,0 +1,206 @@
+import datetime
+import json
+import os
+import re
+
+FRONT_MATTER_DELIMITER = "---"
+MAX_FRONT_MATTER_LINES = 200
+METADATA_INDEX_FILENAME = ".metadata-index.json"
+METADATA_INDEX_VERSION = 2
+LAYOUT_NAME_PATTERN = re.compile(r"[\w-]+")
+
+
+def parse_value(value):
+    # YAML-lite: quoted strings, booleans, [a, b] lists and plain strings
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        return value[1:-1]
+    if value.lower() in ("true", "yes"):
+        return True
+    if value.lower() in ("false", "no"):
+        return False
+    if value.startswith("[") and value.endswith("]"):
+        return [parse_value(item) for item in value[1:-1].split(",") if item.strip()]
+    return value
+
+
+def parse_front_matter(lines):
+    # key: value pairs, plus "- item" lines under a key with no value.
+    # Comments and blank lines are skipped; anything else is an error.
+    fields = {}
+    list_key = None
+    for line_number, line in enumerate(lines, 2):
+        stripped = line.strip()
+        if stripped == "" or stripped.startswith("#"):
+            continue
+        if stripped.startswith("- ") and list_key is not None:
+            fields[list_key].append(parse_value(stripped[2:]))
+            continue
+        key, separator, value = line.partition(":")
+        if not separator or not key.strip() or key != key.lstrip():
+            raise ValueError(f"Invalid front matter on line {line_number}: {line}")
+        key = key.strip()
+        if value.strip() == "":
+            fields[key] = []
+            list_key = key
+        else:
+            fields[key] = parse_value(value)
+            list_key = None
+    return normalize(fields)
+
+
+def normalize(fields):
+    # tags is always a list of strings, draft a bool and date an ISO string
+    # that sorts chronologically
+    tags = fields.get("tags", [])
+    if isinstance(tags, str):
+        tags = [tag.strip() for tag in tags.split(",") if tag.strip()]
+    fields["tags"] = [str(tag) for tag in tags]
+    fields["draft"] = fields.get("draft") is True
+    for key in ("title", "date", "layout"):
+        if key in fields:
+            fields[key] = str(fields[key]) if fields[key] != [] else None
+    if fields.get("date"):
+        fields["date"] = normalize_date(fields["date"])
+    return fields
+
+
+def normalize_date(value):
+    # A day stays YYYY-MM-DD; a time is moved to UTC and written with a Z, so
+    # plain string comparison orders any two dates. Naive times count as UTC.
+    try:
+        if "T" not in value and " " not in value.strip():
+            return datetime.date.fromisoformat(value.strip()).isoformat()
+        moment = datetime.datetime.fromisoformat(value.strip())
+    except ValueError:
+        raise ValueError(f"Invalid date in front matter: {value}")
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(datetime.timezone.utc)
+    return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def front_matter_lines(lines):
+    # The lines between the opening and closing delimiters, or None when the
+    # file doesn't start with front matter. lines must be an iterator.
+    first = next(lines, None)
+    if first is None or first.rstrip("\r\n") != FRONT_MATTER_DELIMITER:
+        return None
+    header = []
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line == FRONT_MATTER_DELIMITER:
+            return header
+        header.append(line)
+        if len(header) > MAX_FRONT_MATTER_LINES:
+            break
+    return None
+
+
+def split_front_matter(markdown):
+    # Returns the fields and the markdown with the front matter blanked out,
+    # so block line numbers still match the file
+    if not markdown.startswith(FRONT_MATTER_DELIMITER):
+        return normalize({}), markdown
+    lines = markdown.split("\n", MAX_FRONT_MATTER_LINES + 2)
+    header = front_matter_lines(iter(lines))
+    if header is None:
+        return normalize({}), markdown
+    body = lines[len(header) + 2 :]
+    return parse_front_matter(header), "\n" * (len(header) + 2) + "\n".join(body)
+
+
+def read_metadata(path):
+    # Reads the front matter and, when it has no title, lines up to the
+    # first "# " heading; the rest of the body is never read
+    with open(path, "r") as f:
+        header = front_matter_lines(f)
+        if header is None:
+            f.seek(0)
+            fields = normalize({})
+        else:
+            fields = parse_front_matter(header)
+        if fields.get("title") is None:
+            fields["title"] = None
+            for line in f:
+                if line.startswith("# "):
+                    fields["title"] = line[2:].rstrip("\r\n")
+                    break
+    return fields
+
+
+def layout_path(template_path, layout):
+    # layout: post picks template.post.html next to template.html, so
+    # layouts share the template's partials directory
+    if not layout:
+        return template_path
+    if not LAYOUT_NAME_PATTERN.fullmatch(layout):
+        raise ValueError(f"Invalid layout name: {layout}")
+    stem, extension = os.path.splitext(template_path)
+    path = f"{stem}.{layout}{extension}"
+    if not os.path.isfile(path):
+        raise ValueError(f"Layout not found: {layout}")
+    return path
+
+
+def layout_paths(template_path):
+    # Every layout file present next to the template
+    stem, extension = os.path.splitext(template_path)
+    directory = os.path.dirname(template_path) or "."
+    prefix = os.path.basename(stem) + "."
+    return sorted(
+        os.path.join(os.path.dirname(template_path), name)
+        for name in os.listdir(directory)
+        if name.startswith(prefix)
+        and name.endswith(extension)
+        and LAYOUT_NAME_PATTERN.fullmatch(name[len(prefix) : len(name) - len(extension)])
+    )
+
+
+class MetadataIndex:
+    # Front matter and title per source, kept between builds in the output
+    # directory. An entry is reused while the file's mtime and size match.
+    def __init__(self, dest_dir_path):
+        self.path = os.path.join(dest_dir_path, METADATA_INDEX_FILENAME)
+        self.entries = {}
+        self.seen = set()
+        self.stats = {"read": 0, "reused": 0}
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == METADATA_INDEX_VERSION:
+            self.entries = data["pages"]
+
+    def get(self, from_path, relative_source):
+        stat = os.stat(from_path)
+        self.seen.add(relative_source)
+        entry = self.entries.get(relative_source)
+        if entry is not None and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            self.stats["reused"] += 1
+            return entry["fields"]
+        fields = read_metadata(from_path)
+        self.entries[relative_source] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "fields": fields}
+        self.stats["read"] += 1
+        return fields
+
+    def forget(self, relative_source):
+        self.entries.pop(relative_source, None)
+
+    def save(self, prune=True):
+        # prune drops sources not looked up since the index was loaded
+        if prune:
+            self.entries = {source: entry for source, entry in self.entries.items() if source in self.seen}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            data = {"version": METADATA_INDEX_VERSION, "pages": self.entries}
+            json.dump(data, f, separators=(",", ":"), sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def format_metadata_stats(stats, drafts):
+    line = f"Metadata: {stats['read']} headers read, {stats['reused']} reused"
+    if drafts:
+        line += f", {drafts} drafts left out (build with --drafts to include them)"
+    return line
@@ -0,0 +1,155 @@
+import gzip
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from manifest import hash_bytes, load_manifest, save_manifest
+
+COMPRESSIBLE_EXTENSIONS = (".html", ".css", ".js", ".svg", ".json")
+DEFAULT_MIN_SIZE = 1024
+GZIP_SUFFIX = ".gz"
+
+
+def gzip_bytes(data):
+    # mtime=0 and no file name keep the output identical across builds
+    buffer = io.BytesIO()
+    with gzip.GzipFile(filename="", mode="wb", compresslevel=9, fileobj=buffer, mtime=0) as f:
+        f.write(data)
+    return buffer.getvalue()
+
+
+def find_compressible(dest_dir_path, min_size):
+    outputs = []
+    for root, dirs, files in os.walk(dest_dir_path):
+        for file in sorted(files):
+            # Dotfiles are build bookkeeping (the manifest, the search index state)
+            if file.startswith(".") or not file.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            path = os.path.join(root, file)
+            if os.path.getsize(path) >= min_size:
+                outputs.append(os.path.relpath(path, dest_dir_path))
+    return outputs
+
+
+def precompress_file(dest_dir_path, relative_path, previous_hash):
+    # Returns (source hash, original size, compressed size, written), or a
+    # compressed size of None when gzip doesn't make the file any smaller
+    path = os.path.join(dest_dir_path, relative_path)
+    with open(path, "rb") as f:
+        data = f.read()
+    source_hash = hash_bytes(data)
+    gzip_path = path + GZIP_SUFFIX
+    if source_hash == previous_hash and os.path.exists(gzip_path):
+        match_mtime(path, gzip_path)
+        return source_hash, len(data), os.path.getsize(gzip_path), False
+    compressed = gzip_bytes(data)
+    if len(compressed) >= len(data):
+        remove_file(gzip_path)
+        return source_hash, len(data), None, False
+    tmp_path = gzip_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(compressed)
+    os.replace(tmp_path, gzip_path)
+    match_mtime(path, gzip_path)
+    return source_hash, len(data), len(compressed), True
+
+
+def match_mtime(path, gzip_path):
+    # The server only trusts a .gz at least as new as the file it stands for
+    stat = os.stat(path)
+    os.utime(gzip_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+def precompress_outputs(dest_dir_path, min_size=DEFAULT_MIN_SIZE, workers=None):
+    # Write a .gz next to every large enough text output, on a thread pool
+    # (zlib releases the GIL). Outputs whose bytes haven't changed since the
+    # last run keep their existing .gz.
+    manifest = load_manifest(dest_dir_path)
+    previous = manifest.get("precompressed", {})
+    outputs = find_compressible(dest_dir_path, min_size)
+    stats = {"written": 0, "unchanged": 0, "removed": 0, "types": {}}
+    recorded = {}
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        results = executor.map(
+            lambda relative_path: precompress_file(dest_dir_path, relative_path, previous.get(relative_path)),
+            outputs,
+        )
+        for relative_path, (source_hash, size, compressed_size, written) in zip(outputs, results):
+            if compressed_size is None:
+                continue
+            recorded[relative_path] = source_hash
+            stats["written" if written else "unchanged"] += 1
+            totals = stats["types"].setdefault(os.path.splitext(relative_path)[1], [0, 0, 0])
+            totals[0] += 1
+            totals[1] += size
+            totals[2] += compressed_size
+
+    # Outputs that went away or shrank below the threshold lose their .gz
+    for relative_path in previous:
+        if relative_path not in recorded:
+            stats["removed"] += remove_file(os.path.join(dest_dir_path, relative_path) + GZIP_SUFFIX)
+
+    manifest["precompressed"] = recorded
+    save_manifest(dest_dir_path, manifest)
+    return stats
+
+
+def remove_precompressed(dest_dir_path):
+    # Precompression switched off: drop the .gz files an earlier build wrote
+    manifest = load_manifest(dest_dir_path)
+    previous = manifest.pop("precompressed", None)
+    if previous is None:
+        return 0
+    removed = 0
+    for relative_path in previous:
+        removed += remove_file(os.path.join(dest_dir_path, relative_path) + GZIP_SUFFIX)
+    save_manifest(dest_dir_path, manifest)
+    return removed
+
+
+def remove_file(path):
+    if os.path.exists(path):
+        os.remove(path)
+        return 1
+    return 0
+
+
+def format_precompress_stats(stats):
+    summary = (
+        f"Precompressed: {stats['written']} written, {stats['unchanged']} unchanged, "
+        f"{stats['removed']} removed"
+    )
+    for extension, (files, size, compressed_size) in sorted(stats["types"].items()):
+        summary += (
+            f"\n  {extension:<6} {files:>5} files {size:>10} -> {compressed_size:>10} bytes "
+            f"({compressed_size / size:.0%})"
+        )
+    return summary
+
+
+def accepts_gzip(accept_encoding):
+    # "gzip", "gzip;q=0.5" or "*" allow it; "gzip;q=0" rules it out
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() not in ("gzip", "*"):
+            continue
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                return float(params[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+def fresh_gzip_path(path):
+    # The .gz sibling, unless the output was rewritten since (e.g. by serve --watch)
+    gzip_path = path + GZIP_SUFFIX
+    try:
+        if os.path.getmtime(gzip_path) >= os.path.getmtime(path):
+            return gzip_path
+    except OSError:
+        pass
+    return None
@@ -0,0 +1,195 @@
+import asyncio
+import collections
+import concurrent.futures
+import io
+import os
+import posixpath
+import time
+
+import assets
+import image_size
+import search_index
+from extract import render_page
+from includes import partial_path, partials_dir
+from metadata import layout_path, read_metadata
+from server import page_source
+from static_server import DEFAULT_FILE_CACHE_SIZE, STATS_PATH, ServerStats, StaticServer, start_server
+from template import file_key, template_hash
+
+
+class PageCache:
+    # LRU of rendered pages by URL. An entry stays good while the source's
+    # mtime and size, its template and the partials it included are unchanged.
+    def __init__(self, max_bytes=DEFAULT_FILE_CACHE_SIZE):
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()
+        self.size = 0
+
+    def get(self, url_path, source_path):
+        entry = self.entries.get(url_path)
+        if entry is None or not fresh(entry, source_path):
+            return None
+        self.entries.move_to_end(url_path)
+        return entry["body"]
+
+    def store(self, url_path, entry):
+        if url_path in self.entries:
+            self.size -= len(self.entries.pop(url_path)["body"])
+        if len(entry["body"]) <= self.max_bytes:
+            self.entries[url_path] = entry
+            self.size += len(entry["body"])
+            while self.size > self.max_bytes:
+                old_url, old_entry = self.entries.popitem(last=False)
+                self.size -= len(old_entry["body"])
+
+
+def fresh(entry, source_path):
+    try:
+        if file_key(source_path) != entry["source"]:
+            return False
+        if template_hash(entry["template"]) != entry["template_hash"]:
+            return False
+        return all(file_key(path) == key for path, key in entry["partials"])
+    except (OSError, ValueError):
+        return False
+
+
+class PreviewStats(ServerStats):
+    def __init__(self):
+        super().__init__()
+        self.rendered = 0
+        self.reused = 0
+        self.render_seconds = 0.0
+
+    def as_dict(self):
+        stats = super().as_dict()
+        stats["pages_rendered"] = self.rendered
+        stats["pages_reused"] = self.reused
+        stats["render_ms"] = round(self.render_seconds * 1000, 1)
+        return stats
+
+
+class PreviewServer(StaticServer):
+    # Renders a page when it is requested instead of building the site first;
+    # everything that isn't a page comes straight from the static directory
+    def __init__(self, dir_path_static, dir_path_content, template_path, page_cache_size=DEFAULT_FILE_CACHE_SIZE):
+        super().__init__(dir_path_static)
+        self.dir_path_content = os.path.abspath(dir_path_content)
+        self.template_path = template_path
+        self.pages = PageCache(page_cache_size)
+        self.stats = PreviewStats()
+        # One render thread: the fragment cache render_page shares isn't
+        # thread-safe, and a preview serves one author
+        self.renderer = concurrent.futures.ThreadPoolExecutor(1)
+        # url -> future of the render in progress
+        self.rendering = {}
+
+    async def serve_file(self, writer, request):
+        source_path = self.find_source(request.path)
+        if source_path is None:
+            index_path = self.find_source(request.path + "/")
+            if not request.path.endswith("/") and index_path is not None and os.path.isfile(index_path):
+                return await self.respond(writer, request, 301, headers={"Location": request.path + "/"})
+            return await super().serve_file(writer, request)
+        if not os.path.isfile(source_path):
+            return await super().serve_file(writer, request)
+
+        body = self.pages.get(request.path, source_path)
+        if body is not None:
+            self.stats.reused += 1
+        else:
+            joined = request.path in self.rendering
+            try:
+                entry = await self.render_once(source_path, request.path)
+            except Exception as e:
+                # Shown in the browser, like a failed page in a build
+                body = f"{type(e).__name__}: {e}\n".encode("utf-8")
+                headers = {"Content-Type": "text/plain; charset=utf-8"}
+                return await self.respond(writer, request, 500, body, headers)
+            if joined:
+                self.stats.reused += 1
+            body = entry["body"]
+        headers = {"Content-Type": "text/html; charset=utf-8", "Cache-Control": "no-cache"}
+        return await self.respond(writer, request, 200, body, headers)
+
+    def render_once(self, source_path, url_path):
+        # Rendering is CPU work; keep the loop free for other requests. A
+        # request for a page that is already rendering waits for that render.
+        future = self.rendering.get(url_path)
+        if future is None:
+            started = time.perf_counter()
+            future = asyncio.get_running_loop().run_in_executor(self.renderer, self.render, source_path, url_path)
+            self.rendering[url_path] = future
+            future.add_done_callback(lambda done: self.rendered(url_path, done, started))
+        # A client going away mustn't cancel the render others wait for
+        return asyncio.shield(future)
+
+    def rendered(self, url_path, future, started):
+        del self.rendering[url_path]
+        if future.cancelled() or future.exception() is not None:
+            return
+        self.stats.render_seconds += time.perf_counter() - started
+        self.stats.rendered += 1
+        self.pages.store(url_path, future.result())
+
+    def find_source(self, url_path):
+        # The .md a page URL maps to, or None for URLs that aren't pages
+        if not (url_path.endswith("/") or url_path.endswith(".html")):
+            return None
+        if posixpath.normpath(url_path).startswith("/.."):
+            return None
+        path = os.path.abspath(page_source(url_path, self.dir_path_content))
+        if not path.startswith(self.dir_path_content + os.sep):
+            return None
+        return path
+
+    def render(self, source_path, url_path):
+        # generate_page's read, parse and template stages for one page, kept
+        # in memory; drafts are shown since this is for authors
+        source = file_key(source_path)
+        fields = read_metadata(source_path)
+        page_template = layout_path(self.template_path, fields.get("layout"))
+        template, values, cache_status, includes, index_entry, links = render_page(source_path, page_template, url_path)
+        output = io.StringIO()
+        template.write(output, values)
+        dir_path_partials = partials_dir(page_template)
+        return {
+            "body": output.getvalue().encode("utf-8"),
+            "source": source,
+            "template": page_template,
+            "template_hash": template_hash(page_template),
+            "partials": [
+                (path, file_key(path)) for path in (partial_path(dir_path_partials, name) for name in includes)
+            ],
+        }
+
+
+def preview(
+    dir_path_static,
+    dir_path_content,
+    template_path,
+    port=8888,
+    bind="",
+    file_cache_size=DEFAULT_FILE_CACHE_SIZE,
+):
+    # Nothing is built up front, so the first page is as quick on a large
+    # site as on a small one. Asset fingerprints, image sizes and the search
+    # index need the whole site and are left out.
+    assets.configure(None)
+    image_size.configure(None)
+    search_index.configure(False)
+    server = PreviewServer(dir_path_static, dir_path_content, template_path, file_cache_size)
+    loop = asyncio.new_event_loop()
+    listener = loop.run_until_complete(start_server(server, port, bind))
+    print(
+        f"Previewing {dir_path_content} on http://{bind or 'localhost'}:{port}/, "
+        f"rendering pages as they are requested (stats at {STATS_PATH})"
+    )
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()
+        server.renderer.shutdown(wait=False)
+        loop.close()
@@ -0,0 +1,170 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# The active profiler, if any. stage() checks this once and hands back a
+# shared no-op context otherwise, so an unprofiled build pays one global
+# lookup per stage.
+active_profiler = None
+NULL_STAGE = contextlib.nullcontext()
+
+
+class Profiler:
+    def __init__(self):
+        # (name, page, start, wall seconds, cpu seconds, pid, tid)
+        self.events = []
+
+    @contextlib.contextmanager
+    def stage(self, name, page=None):
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            self.events.append(
+                (
+                    name,
+                    page,
+                    wall_start,
+                    time.perf_counter() - wall_start,
+                    time.process_time() - cpu_start,
+                    os.getpid(),
+                    threading.get_ident(),
+                )
+            )
+
+    def merge(self, events):
+        self.events.extend(events)
+
+    def page_totals(self):
+        pages = {}
+        for name, page, start, wall, cpu, pid, tid in self.events:
+            if page is None:
+                continue
+            totals = pages.setdefault(page, {"wall": 0.0, "cpu": 0.0, "stages": {}})
+            totals["wall"] += wall
+            totals["cpu"] += cpu
+            totals["stages"][name] = totals["stages"].get(name, 0.0) + wall
+        return pages
+
+    def stage_totals(self):
+        stages = {}
+        for name, page, start, wall, cpu, pid, tid in self.events:
+            totals = stages.setdefault(name, [0.0, 0.0, 0])
+            totals[0] += wall
+            totals[1] += cpu
+            totals[2] += 1
+        return stages
+
+    def write_trace(self, path):
+        # Chrome trace-event format: open in chrome://tracing or ui.perfetto.dev
+        if not self.events:
+            return
+        origin = min(event[2] for event in self.events)
+        trace_events = []
+        for name, page, start, wall, cpu, pid, tid in self.events:
+            event = {
+                "name": name,
+                "cat": "page" if page is not None else "build",
+                "ph": "X",
+                "ts": round((start - origin) * 1e6, 3),
+                "dur": round(wall * 1e6, 3),
+                "pid": pid,
+                "tid": tid,
+                "args": {"cpu_ms": round(cpu * 1000, 3)},
+            }
+            if page is not None:
+                event["args"]["page"] = page
+            trace_events.append(event)
+        memory = peak_memory()
+        trace_events.append(
+            {
+                "name": "peak_rss",
+                "ph": "C",
+                "ts": 0,
+                "pid": os.getpid(),
+                "args": {"self_kb": memory["self_kb"], "workers_kb": memory["workers_kb"]},
+            }
+        )
+        with open(path, "w") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+
+    def format_report(self, top=10):
+        lines = [f"{'stage':<24} {'count':>6} {'wall ms':>10} {'cpu ms':>10}"]
+        for name, (wall, cpu, count) in sorted(self.stage_totals().items(), key=lambda item: -item[1][0]):
+            lines.append(f"{name:<24} {count:>6} {wall * 1000:>10.1f} {cpu * 1000:>10.1f}")
+
+        pages = self.page_totals()
+        slowest = sorted(pages.items(), key=lambda item: -item[1]["wall"])[:top]
+        if slowest:
+            stage_names = sorted({name for totals in pages.values() for name in totals["stages"]})
+            lines.append("")
+            lines.append(f"Slowest {len(slowest)} pages (wall ms)")
+            header = f"{'page':<40} {'total':>8} {'cpu':>8}"
+            for name in stage_names:
+                header += f" {name:>8}"
+            lines.append(header)
+            for page, totals in slowest:
+                line = f"{page:<40} {totals['wall'] * 1000:>8.1f} {totals['cpu'] * 1000:>8.1f}"
+                for name in stage_names:
+                    line += f" {totals['stages'].get(name, 0.0) * 1000:>8.1f}"
+                lines.append(line)
+
+        memory = peak_memory()
+        if memory["self_kb"] is not None:
+            lines.append("")
+            lines.append(
+                f"Peak memory: {memory['self_kb'] / 1024:.1f} MiB (build), "
+                f"{memory['workers_kb'] / 1024:.1f} MiB (largest worker)"
+            )
+        return "\n".join(lines)
+
+
+def stage(name, page=None):
+    if active_profiler is None:
+        return NULL_STAGE
+    return active_profiler.stage(name, page)
+
+
+def start():
+    global active_profiler
+    active_profiler = Profiler()
+    return active_profiler
+
+
+def stop():
+    global active_profiler
+    profiler = active_profiler
+    active_profiler = None
+    return profiler
+
+
+def is_active():
+    return active_profiler is not None
+
+
+def run_profiled(func, *args):
+    # Runs in a pool worker and ships the worker's events back to the parent
+    start()
+    try:
+        result = func(*args)
+    finally:
+        profiler = stop()
+    return result, profiler.events
+
+
+def peak_memory():
+    if resource is None:
+        return {"self_kb": None, "workers_kb": None}
+    scale = 1024 if os.uname().sysname == "Darwin" else 1  # macOS reports bytes
+    return {
+        "self_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale,
+        "workers_kb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale,
+    }
@@ -0,0 +1,232 @@
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from manifest import GENERATOR_VERSION, hash_bytes
+
+DEFAULT_CACHE_DIR = "./.cache/render"
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024
+# A full cache is trimmed to this fraction of its limit, so the next stores
+# don't each trigger another scan
+EVICT_TO = 0.9
+
+
+def cache_key(source_bytes):
+    # Content-addressed: the same markdown under the same renderer is the same
+    # entry. Entries record what else the body depends on (asset names), for
+    # the caller to check.
+    return hash_bytes(f"{GENERATOR_VERSION}\0".encode("utf-8") + source_bytes)
+
+
+def parse_size(text):
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    text = text.strip().upper().rstrip("B")
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+class DirectoryBackend:
+    # Entries live at root/ab/abcdef...; mtime doubles as the LRU clock
+    def __init__(self, root, max_bytes=DEFAULT_CACHE_SIZE):
+        self.root = root
+        self.max_bytes = max_bytes
+        # Bytes on disk as of the last scan plus what was stored since; None
+        # until something scans. Other writers to root make it approximate.
+        self.size = None
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key, data):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        if self.size is not None:
+            try:
+                self.size -= os.path.getsize(path)
+            except OSError:
+                pass
+            self.size += len(data)
+        os.replace(tmp_path, path)
+
+    def evict_if_full(self):
+        # Scans only once the stores since the last scan pushed past the limit
+        if self.size is not None and self.size <= self.max_bytes:
+            return 0
+        return self.evict(int(self.max_bytes * EVICT_TO))
+
+    def evict(self, target=None):
+        # Drop least recently used entries until the cache fits target bytes,
+        # max_bytes by default
+        target = self.max_bytes if target is None else target
+        entries = []
+        total = 0
+        if not os.path.isdir(self.root):
+            self.size = 0
+            return 0
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        evicted = 0
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        self.size = total
+        return evicted
+
+
+class HTTPBackend:
+    # GET/PUT <base_url>/<key>; a 404 is a miss. Eviction is the server's job.
+    def __init__(self, base_url, timeout=5):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def get(self, key):
+        try:
+            with urllib.request.urlopen(f"{self.base_url}/{key}", timeout=self.timeout) as response:
+                return response.read()
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return None
+            raise
+
+    def put(self, key, data):
+        request = urllib.request.Request(f"{self.base_url}/{key}", data=data, method="PUT")
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+    def evict(self):
+        return 0
+
+
+class RenderCache:
+    # Rendered body HTML, title, links and render context per markdown
+    # source. Lookups and stores never fail a build: backend errors count as
+    # misses.
+    def __init__(self, backend):
+        self.backend = backend
+        self.stats = {"hit": 0, "miss": 0, "error": 0, "evicted": 0}
+
+    def lookup(self, source_bytes):
+        # Returns (status, (title, html, links, context) or None); status is
+        # hit, miss or error
+        try:
+            data = self.backend.get(cache_key(source_bytes))
+        except (OSError, ValueError):
+            return "error", None
+        if data is None:
+            return "miss", None
+        try:
+            entry = json.loads(data.decode("utf-8"))
+            return "hit", (entry["title"], entry["html"], entry["links"], entry["context"])
+        except (ValueError, KeyError):
+            return "error", None
+
+    def store(self, source_bytes, title, html, links=(), context=None):
+        data = json.dumps({"title": title, "html": html, "links": list(links), "context": context or {}})
+        try:
+            self.backend.put(cache_key(source_bytes), data.encode("utf-8"))
+            return True
+        except (OSError, ValueError):
+            return False
+
+    def record(self, status):
+        if status in self.stats:
+            self.stats[status] += 1
+
+    def finish(self):
+        self.stats["evicted"] += self.backend.evict()
+
+    def format_stats(self):
+        lookups = self.stats["hit"] + self.stats["miss"]
+        rate = self.stats["hit"] / lookups if lookups else 0.0
+        return (
+            f"Render cache: {self.stats['hit']} hits, {self.stats['miss']} misses "
+            f"({rate:.0%} hit rate), {self.stats['error']} errors, {self.stats['evicted']} evicted"
+        )
+
+
+def open_cache(location, max_bytes=DEFAULT_CACHE_SIZE):
+    if location.startswith("http://") or location.startswith("https://"):
+        return RenderCache(HTTPBackend(location))
+    return RenderCache(DirectoryBackend(location, max_bytes))
+
+
+class CacheRequestHandler(BaseHTTPRequestHandler):
+    backend = None
+    lock = threading.Lock()
+
+    def key(self):
+        key = self.path.strip("/")
+        if len(key) != 64 or any(char not in "0123456789abcdef" for char in key):
+            self.send_error(400, "Bad cache key")
+            return None
+        return key
+
+    def do_GET(self):
+        key = self.key()
+        if key is None:
+            return
+        data = self.backend.get(key)
+        if data is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_PUT(self):
+        key = self.key()
+        if key is None:
+            return
+        data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.lock:
+            self.backend.put(key, data)
+            self.backend.evict_if_full()
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_cache_server(directory, port=8899, bind="", max_bytes=DEFAULT_CACHE_SIZE):
+    # A stand-in for a shared cache service, storing entries on local disk
+    handler = type("Handler", (CacheRequestHandler,), {"backend": DirectoryBackend(directory, max_bytes)})
+    httpd = ThreadingHTTPServer((bind, port), handler)
+    httpd.daemon_threads = True
+    return httpd
@@ -0,0 +1,232 @@
+import json
+import os
+import re
+import time
+
+from inline_markdown import text_to_textnodes
+from manifest import hash_bytes
+from markdown_blocks import (
+    block_type_code,
+    block_type_heading,
+    block_type_olist,
+    block_type_quote,
+    block_type_ulist,
+    scan_blocks,
+)
+from textnode import text_type_image
+
+# The browser looks a query term up by lowercasing it and fetching
+# /search/<first PREFIX_LENGTH characters>.json, plus /search/pages.json to
+# turn page ids into URLs and titles. Postings are [page id, weight] pairs,
+# heaviest first.
+SEARCH_DIR = "search"
+PAGES_FILENAME = "pages.json"
+STATE_FILENAME = ".search-index.json"
+STATE_VERSION = 1
+PREFIX_LENGTH = 2
+MIN_TERM_LENGTH = 2
+HEADING_WEIGHT = 3
+TERM_PATTERN = re.compile(r"[^\W_]+")
+STOPWORDS = frozenset(
+    "an and are as at be but by for from has have in is it its of on or that the this to was were with".split()
+)
+
+# Whether pages collect their terms while they are generated
+active = False
+
+
+def configure(enabled):
+    global active
+    active = bool(enabled)
+
+
+def block_text(block):
+    # The block's inline text without its markdown line markers
+    if block.block_type == block_type_heading:
+        return block.text.lstrip("#").strip()
+    if block.block_type == block_type_quote:
+        return " ".join(line.lstrip(">").strip() for line in block.lines)
+    if block.block_type == block_type_ulist:
+        return " ".join(line[2:] for line in block.lines)
+    if block.block_type == block_type_olist:
+        return " ".join(line.split(". ", 1)[1] for line in block.lines)
+    return " ".join(block.lines)
+
+
+def page_terms(markdown):
+    # term -> weight, counting each occurrence once, or HEADING_WEIGHT times
+    # in a heading. Code blocks and image alt text are left out.
+    terms = {}
+    for block in scan_blocks(markdown):
+        if block.block_type == block_type_code:
+            continue
+        weight = HEADING_WEIGHT if block.block_type == block_type_heading else 1
+        for text_node in text_to_textnodes(block_text(block)):
+            if text_node.text_type == text_type_image:
+                continue
+            for term in TERM_PATTERN.findall(text_node.text.lower()):
+                if len(term) < MIN_TERM_LENGTH or term in STOPWORDS:
+                    continue
+                terms[term] = terms.get(term, 0) + weight
+    return terms
+
+
+def state_path(dest_dir_path):
+    return os.path.join(dest_dir_path, STATE_FILENAME)
+
+
+def load_state(dest_dir_path):
+    empty = {"version": STATE_VERSION, "pages": {}, "shards": {}, "pages_hash": None}
+    try:
+        with open(state_path(dest_dir_path), "r") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return empty
+    if state.get("version") != STATE_VERSION:
+        return empty
+    return state
+
+
+def save_state(dest_dir_path, state):
+    path = state_path(dest_dir_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, separators=(",", ":"), sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def indexed_pages(dest_dir_path):
+    return set(load_state(dest_dir_path)["pages"])
+
+
+def assign_ids(pages):
+    # Ids stay put across builds so one edited page only touches the shards
+    # holding its terms. Once more than half the ids belong to deleted pages
+    # every page is renumbered.
+    used = [entry["id"] for entry in pages.values() if entry.get("id") is not None]
+    next_id = max(used) + 1 if used else 0
+    if next_id > 2 * len(pages):
+        for entry in pages.values():
+            entry["id"] = None
+        next_id = 0
+    for relative_dest in sorted(pages):
+        if pages[relative_dest].get("id") is None:
+            pages[relative_dest]["id"] = next_id
+            next_id += 1
+    return next_id
+
+
+def build_shards(pages):
+    shards = {}
+    for entry in pages.values():
+        for term, weight in entry["terms"].items():
+            postings = shards.setdefault(term[:PREFIX_LENGTH], {}).setdefault(term, [])
+            postings.append([entry["id"], weight])
+    for shard in shards.values():
+        for postings in shard.values():
+            postings.sort(key=lambda posting: (-posting[1], posting[0]))
+    return shards
+
+
+def encode(value):
+    return json.dumps(value, separators=(",", ":"), sort_keys=True, ensure_ascii=False).encode("utf-8")
+
+
+def write_file(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def update_index(dest_dir_path, entries, current_pages, read_entry):
+    # entries holds {"url", "title", "terms"} for the pages built this time,
+    # keyed by output path. current_pages is every page the site has now; those the
+    # index hasn't seen yet are read with read_entry(relative_dest), and the
+    # rest keep the terms recorded when they were last built.
+    start = time.perf_counter()
+    state = load_state(dest_dir_path)
+    pages = state["pages"]
+    stats = {"indexed": 0, "written": 0, "removed": 0}
+
+    for relative_dest in list(pages):
+        if relative_dest not in current_pages:
+            del pages[relative_dest]
+    for relative_dest in sorted(current_pages):
+        entry = entries.get(relative_dest)
+        if entry is None:
+            if relative_dest in pages:
+                continue
+            entry = read_entry(relative_dest)
+        old_entry = pages.get(relative_dest, {})
+        pages[relative_dest] = dict(entry, id=old_entry.get("id"))
+        stats["indexed"] += 1
+    count = assign_ids(pages)
+
+    search_dir = os.path.join(dest_dir_path, SEARCH_DIR)
+    os.makedirs(search_dir, exist_ok=True)
+    total_bytes = 0
+    page_list = [None] * count
+    for relative_dest, entry in pages.items():
+        page_list[entry["id"]] = [entry["url"], entry["title"]]
+    data = encode(page_list)
+    total_bytes += len(data)
+    pages_path = os.path.join(search_dir, PAGES_FILENAME)
+    if hash_bytes(data) != state.get("pages_hash") or not os.path.exists(pages_path):
+        write_file(pages_path, data)
+        stats["written"] += 1
+    state["pages_hash"] = hash_bytes(data)
+
+    # Only shards whose bytes changed are rewritten
+    shard_hashes = {}
+    terms = 0
+    for prefix, shard in build_shards(pages).items():
+        data = encode(shard)
+        total_bytes += len(data)
+        terms += len(shard)
+        shard_hashes[prefix] = hash_bytes(data)
+        path = os.path.join(search_dir, prefix + ".json")
+        if state["shards"].get(prefix) != shard_hashes[prefix] or not os.path.exists(path):
+            write_file(path, data)
+            stats["written"] += 1
+    for prefix in state["shards"]:
+        if prefix not in shard_hashes:
+            path = os.path.join(search_dir, prefix + ".json")
+            if os.path.exists(path):
+                os.remove(path)
+            stats["removed"] += 1
+    state["shards"] = shard_hashes
+    save_state(dest_dir_path, state)
+
+    stats["pages"] = len(pages)
+    stats["terms"] = terms
+    stats["shards"] = len(shard_hashes)
+    stats["bytes"] = total_bytes
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def remove_index(dest_dir_path):
+    # Builds without --search drop the index a previous build left behind.
+    # Only recorded files go, in case a page of the site lives under search/.
+    state = load_state(dest_dir_path)
+    search_dir = os.path.join(dest_dir_path, SEARCH_DIR)
+    names = [PAGES_FILENAME] if state["pages_hash"] else []
+    names.extend(prefix + ".json" for prefix in state["shards"])
+    for name in names:
+        path = os.path.join(search_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+    if os.path.isdir(search_dir) and not os.listdir(search_dir):
+        os.rmdir(search_dir)
+    if os.path.exists(state_path(dest_dir_path)):
+        os.remove(state_path(dest_dir_path))
+
+
+def format_search_stats(stats):
+    return (
+        f"Search index: {stats['pages']} pages ({stats['indexed']} indexed), "
+        f"{stats['terms']} terms in {stats['shards']} shards "
+        f"({stats['written']} files written, {stats['removed']} removed), "
+        f"{stats['bytes'] / 1024:.1f} KiB, {stats['seconds'] * 1000:.1f} ms"
+    )
@@ -0,0 +1,239 @@
+import asyncio
+import os
+import threading
+import time
+
+import assets
+import image_size
+from copy_directory import copy_file, sync_static
+from extract import generate_selected_pages, pages_including, stale_context_pages
+from includes import partials_dir
+from listings import DEFAULT_PAGE_SIZE as DEFAULT_LISTING_PAGE_SIZE, generate_listings
+from livereload import LiveReload
+from manifest import load_manifest
+from metadata import layout_paths
+from static_server import DEFAULT_FILE_CACHE_SIZE, STATS_PATH, StaticServer, start_server
+from watch import Watcher, edit_time
+
+
+def page_source(page_path, dir_path_content):
+    # Map a URL like /majesty/ back to contents/majesty/index.md
+    relative = page_path.lstrip("/")
+    if relative == "" or relative.endswith("/"):
+        relative += "index.html"
+    return os.path.join(dir_path_content, os.path.splitext(relative)[0] + ".md")
+
+
+class SiteBuilder:
+    # Turns a batch of changed files into the smallest rebuild that covers them
+    def __init__(
+        self,
+        dir_path_static,
+        dir_path_public,
+        dir_path_content,
+        template_path,
+        livereload,
+        fingerprint=False,
+        image_sizes=False,
+        drafts=False,
+        listings=False,
+        site_url=None,
+        page_size=DEFAULT_LISTING_PAGE_SIZE,
+    ):
+        self.dir_path_static = dir_path_static
+        self.dir_path_public = dir_path_public
+        self.dir_path_content = dir_path_content
+        self.template_path = template_path
+        self.livereload = livereload
+        self.fingerprint = fingerprint
+        self.image_sizes = image_sizes
+        self.drafts = drafts
+        self.listings = listings
+        self.site_url = site_url
+        self.page_size = page_size
+
+    def rebuild(self, changed):
+        started = time.time()
+        edited = edit_time(changed)
+        pages = []
+        template_changed = False
+        assets_changed = False
+        dir_path_partials = partials_dir(self.template_path)
+        manifest = load_manifest(self.dir_path_public)
+        for path in changed:
+            if os.path.abspath(path) == os.path.abspath(self.template_path):
+                template_changed = True
+            elif os.path.abspath(path) in map(os.path.abspath, layout_paths(self.template_path)):
+                # Pages don't record their layout, so rebuild them all
+                template_changed = True
+            elif is_within(path, dir_path_partials):
+                # Only the pages that include the partial, unless the template does
+                name = os.path.relpath(path, dir_path_partials).replace(os.sep, "/")
+                if name in manifest.get("template_includes", {}):
+                    template_changed = True
+                for relative_dest in pages_including(manifest, name):
+                    pages.append(os.path.join(self.dir_path_content, manifest["pages"][relative_dest]["source"]))
+            elif is_within(path, self.dir_path_static):
+                self.sync_asset(path)
+                assets_changed = True
+            elif is_within(path, self.dir_path_content) and path.endswith(".md"):
+                pages.append(path)
+        if assets_changed and self.refresh_assets():
+            # Just the pages, or templates, referencing a renamed asset or resized image
+            pages.extend(stale_context_pages(self.dir_path_content, self.template_path, self.dir_path_public))
+        # An edited page may also include an edited partial
+        pages = list({os.path.abspath(path): path for path in pages}.values())
+        reason = ", ".join(sorted(os.path.basename(path) for path in changed)) + " changed while serving"
+        if template_changed:
+            # Every page depends on the template
+            pages = [
+                os.path.join(root, file)
+                for root, dirs, files in os.walk(self.dir_path_content)
+                for file in files
+                if file.endswith(".md")
+            ]
+
+        # Pages someone is looking at go first, and get their reload right away
+        viewed = {}
+        for page_path in self.livereload.viewed_pages():
+            viewed[os.path.abspath(page_source(page_path, self.dir_path_content))] = page_path
+        first = [path for path in pages if os.path.abspath(path) in viewed]
+        rest = [path for path in pages if os.path.abspath(path) not in viewed]
+
+        summary = generate_selected_pages(
+            self.dir_path_content, self.template_path, self.dir_path_public, first, reason, self.drafts
+        )
+        reloaded = set(viewed[os.path.abspath(path)] for path in first)
+        pushed = None
+        if reloaded:
+            self.livereload.reload(edited, reloaded)
+            pushed = time.time()
+        summary_rest = generate_selected_pages(
+            self.dir_path_content, self.template_path, self.dir_path_public, rest, reason, self.drafts
+        )
+        if self.listings or self.site_url:
+            # Listings whose entries changed are rewritten; reload just those
+            stats = generate_listings(
+                self.dir_path_content,
+                self.template_path,
+                self.dir_path_public,
+                listings=self.listings,
+                site_url=self.site_url,
+                page_size=self.page_size,
+            )
+            if stats["urls"]:
+                self.livereload.reload(edited, set(stats["urls"]), exclude=reloaded)
+                pushed = pushed or time.time()
+        if assets_changed:
+            # Any page may use a static asset
+            self.livereload.reload(edited, exclude=reloaded)
+            pushed = pushed or time.time()
+
+        for page, error in summary["failed"] + summary_rest["failed"]:
+            print(f" ! {page}: {error}")
+        rebuilt = len(summary["rebuilt"]) + len(summary_rest["rebuilt"])
+        message = (
+            f"Rebuilt {rebuilt} page(s) for {len(changed)} change(s) in "
+            f"{(time.time() - started) * 1000:.0f} ms"
+        )
+        if pushed is not None:
+            message += f", reload pushed {(pushed - edited) * 1000:.0f} ms after the edit"
+        print(message)
+
+    def refresh_assets(self):
+        # True when an asset's hashed name or an image's size changed
+        changed = False
+        if self.fingerprint:
+            previous = assets.active_digest
+            asset_urls, stats = assets.fingerprint_assets(self.dir_path_static, self.dir_path_public)
+            assets.configure(asset_urls)
+            changed = assets.active_digest != previous
+        if self.image_sizes:
+            previous = image_size.active_digest
+            sizes, stats = image_size.probe_static_images(self.dir_path_static, self.dir_path_public)
+            image_size.configure(sizes)
+            changed = changed or image_size.active_digest != previous
+        return changed
+
+    def sync_asset(self, path):
+        dest_path = os.path.join(self.dir_path_public, os.path.relpath(path, self.dir_path_static))
+        if os.path.exists(path):
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            copy_file(path, dest_path)
+        else:
+            # Let the regular sync prune it from the manifest as well
+            sync_static(self.dir_path_static, self.dir_path_public)
+
+
+def is_within(path, dir_path):
+    return os.path.abspath(path).startswith(os.path.abspath(dir_path) + os.sep)
+
+
+def serve(
+    dir_path_static,
+    dir_path_public,
+    dir_path_content,
+    template_path,
+    port=8888,
+    bind="",
+    watch=False,
+    fingerprint=False,
+    image_sizes=False,
+    drafts=False,
+    listings=False,
+    site_url=None,
+    page_size=DEFAULT_LISTING_PAGE_SIZE,
+    file_cache_size=DEFAULT_FILE_CACHE_SIZE,
+):
+    livereload = LiveReload() if watch else None
+    server = StaticServer(dir_path_public, livereload, file_cache_size)
+    loop = asyncio.new_event_loop()
+    listener = loop.run_until_complete(start_server(server, port, bind))
+    print(f"Serving {dir_path_public} on http://{bind or 'localhost'}:{port}/ (stats at {STATS_PATH})")
+
+    if not watch:
+        try:
+            loop.run_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            listener.close()
+            loop.close()
+        return
+
+    # The event loop serves from its own thread while this one watches for edits
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    builder = SiteBuilder(
+        dir_path_static,
+        dir_path_public,
+        dir_path_content,
+        template_path,
+        livereload,
+        fingerprint,
+        image_sizes,
+        drafts,
+        listings,
+        site_url,
+        page_size,
+    )
+    watched = [dir_path_content, dir_path_static, template_path] + layout_paths(template_path)
+    if os.path.isdir(partials_dir(template_path)):
+        watched.append(partials_dir(template_path))
+    watcher = Watcher(watched)
+    print(f"Watching {', '.join(watched)} for changes...")
+    try:
+        while True:
+            changed = watcher.wait()
+            try:
+                builder.rebuild(changed)
+            except Exception as e:
+                # A bad partial or a failed copy shouldn't end the session;
+                # the next save gets another go
+                print(f" ! rebuild failed: {type(e).__name__}: {e}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.call_soon_threadsafe(listener.close)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
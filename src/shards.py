@@ -0,0 +1,153 @@
+import argparse
+import os
+import re
+
+from copy_directory import copy_file
+from manifest import GENERATOR_VERSION, hash_bytes, load_manifest, remove_output, save_manifest
+from metadata import MetadataIndex
+from search_index import load_state
+
+SHARD_DIR_PATTERN = re.compile(r"(\d+)-of-(\d+)")
+
+
+def parse_shard(value):
+    # "2/4" -> (2, 4); shards are numbered from 1
+    index, separator, count = value.partition("/")
+    if not separator or not index.isdigit() or not count.isdigit() or not 1 <= int(index) <= int(count):
+        raise argparse.ArgumentTypeError(f"expected i/N with 1 <= i <= N, got {value!r}")
+    return int(index), int(count)
+
+
+def shard_dir(dir_path_shards, index, count):
+    return os.path.join(dir_path_shards, f"{index}-of-{count}")
+
+
+def assign_shards(pages, dir_path_content, count):
+    # Pages ordered by a hash of their source path, then cut into count runs
+    # of about the same number of bytes. Every machine sees the same files,
+    # so they all agree on the split without talking to each other, and a
+    # new or edited page only moves pages near a cut.
+    keyed = []
+    for from_path, dest_path in pages:
+        relative_source = os.path.relpath(from_path, dir_path_content).replace(os.sep, "/")
+        # One extra byte so empty pages still count
+        weight = os.path.getsize(from_path) + 1
+        keyed.append((hash_bytes(relative_source.encode("utf-8")), weight, from_path, dest_path))
+    keyed.sort()
+    total = sum(weight for key, weight, from_path, dest_path in keyed)
+    assigned = {}
+    position = 0
+    for key, weight, from_path, dest_path in keyed:
+        # The shard whose run holds the middle of this page
+        assigned[(from_path, dest_path)] = min(count, (2 * position + weight) * count // (2 * total) + 1)
+        position += weight
+    return assigned
+
+
+def select_pages(pages, dir_path_content, index, count):
+    assigned = assign_shards(pages, dir_path_content, count)
+    return [page for page in pages if assigned[page] == index]
+
+
+def find_shards(dir_path_shards, count=None):
+    # The shard directories of one split, checked to be complete
+    found = {}
+    names = sorted(os.listdir(dir_path_shards)) if os.path.isdir(dir_path_shards) else []
+    for name in names:
+        match = SHARD_DIR_PATTERN.fullmatch(name)
+        if match:
+            found.setdefault(int(match.group(2)), {})[int(match.group(1))] = os.path.join(dir_path_shards, name)
+    if count is None:
+        if len(found) > 1:
+            splits = ", ".join(str(n) for n in sorted(found))
+            raise ValueError(f"Shards from more than one split ({splits}) in {dir_path_shards}; pass --shards N")
+        count = next(iter(found), None)
+    if count is None:
+        raise ValueError(f"No shards in {dir_path_shards}")
+    shards = found.get(count, {})
+    missing = [str(index) for index in range(1, count + 1) if index not in shards]
+    if missing:
+        raise ValueError(f"Missing shard(s) {', '.join(missing)} of {count} in {dir_path_shards}")
+    return [shards[index] for index in range(1, count + 1)]
+
+
+def merge_shards(dir_path_shards, dest_dir_path, count=None, force=False):
+    # Copies every shard's pages into dest and merges their manifests,
+    # metadata indexes and search entries. A page whose manifest entry
+    # matches what dest already has is left as it is.
+    manifest = load_manifest(dest_dir_path)
+    old_pages = manifest["pages"]
+    pages = {}
+    reasons = {}
+    shard_of = {}
+    metadata_entries = {}
+    index_entries = {}
+    summary = {"copied": [], "unchanged": [], "deleted": [], "failed": [], "drafts": []}
+    shard_paths = find_shards(dir_path_shards, count)
+    template_hashes = set()
+
+    for number, shard_path in enumerate(shard_paths, 1):
+        shard_manifest = load_manifest(shard_path)
+        shard = shard_manifest.get("shard", {})
+        if shard.get("index") != number or shard.get("count") != len(shard_paths):
+            raise ValueError(f"{shard_path} has no finished shard build")
+        if shard_manifest.get("version") != GENERATOR_VERSION:
+            raise ValueError(f"{shard_path} was built by another generator version")
+        template_hashes.add(shard_manifest["template_hash"])
+        for relative_dest, entry in shard_manifest["pages"].items():
+            if relative_dest in shard_of:
+                raise ValueError(f"{relative_dest} is in shards {shard_of[relative_dest]} and {number}")
+            shard_of[relative_dest] = number
+            pages[relative_dest] = entry
+            if relative_dest in shard_manifest.get("reasons", {}):
+                reasons[relative_dest] = shard_manifest["reasons"][relative_dest]
+
+            dest_path = os.path.join(dest_dir_path, relative_dest)
+            if not force and old_pages.get(relative_dest) == entry and os.path.exists(dest_path):
+                summary["unchanged"].append(relative_dest)
+                continue
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            copy_file(os.path.join(shard_path, relative_dest), dest_path)
+            summary["copied"].append(relative_dest)
+        summary["failed"].extend(tuple(failure) for failure in shard.get("failed", []))
+        summary["drafts"].extend(shard.get("drafts", []))
+        metadata_entries.update(MetadataIndex(shard_path).entries)
+        index_entries.update(load_state(shard_path)["pages"])
+    if len(template_hashes) > 1:
+        raise ValueError("Shards were built with different templates")
+    # Search terms of the pages that changed, from shards built with --search
+    copied = set(summary["copied"])
+    summary["index_entries"] = {
+        relative_dest: entry for relative_dest, entry in index_entries.items() if relative_dest in copied
+    }
+
+    # Outputs of failed pages stay until a build gets them right
+    failed = set(relative_dest for relative_dest, error in summary["failed"])
+    for relative_dest in old_pages:
+        if relative_dest not in pages and relative_dest not in failed:
+            remove_output(dest_dir_path, relative_dest)
+            summary["deleted"].append(relative_dest)
+
+    metadata_index = MetadataIndex(dest_dir_path)
+    metadata_index.entries = metadata_entries
+    metadata_index.save(prune=False)
+
+    first = load_manifest(shard_paths[0])
+    manifest["version"] = GENERATOR_VERSION
+    manifest["template_hash"] = first["template_hash"]
+    manifest["template_includes"] = first.get("template_includes", {})
+    manifest["pages"] = pages
+    manifest["reasons"] = {
+        relative_dest: reasons[relative_dest] for relative_dest in summary["copied"] if relative_dest in reasons
+    }
+    save_manifest(dest_dir_path, manifest)
+    summary["shards"] = len(shard_paths)
+    return summary
+
+
+def format_merge_stats(summary):
+    return (
+        f"Merged {summary['shards']} shards: {len(summary['copied'])} pages copied, "
+        f"{len(summary['unchanged'])} unchanged, {len(summary['deleted'])} deleted, "
+        f"{len(summary['failed'])} failed"
+    )
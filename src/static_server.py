@@ -0,0 +1,390 @@
+import asyncio
+import collections
+import email.utils
+import json
+import mimetypes
+import os
+import posixpath
+import time
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from assets import ASSET_MANIFEST_FILENAME
+from livereload import LIVERELOAD_PATH, inject_script
+from precompress import accepts_gzip, fresh_gzip_path
+
+STATS_PATH = "/__stats"
+# Files up to this size are kept in memory; larger ones go out with sendfile
+SMALL_FILE_SIZE = 64 * 1024
+DEFAULT_FILE_CACHE_SIZE = 32 * 1024 * 1024
+KEEP_ALIVE_TIMEOUT = 15
+MAX_HEADER_BYTES = 64 * 1024
+LATENCY_SAMPLES = 10000
+STATUS_REASONS = {
+    200: "OK",
+    204: "No Content",
+    206: "Partial Content",
+    301: "Moved Permanently",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    416: "Range Not Satisfiable",
+    500: "Internal Server Error",
+}
+
+
+class FileCache:
+    # LRU of small file contents, checked against mtime and size on every hit
+    def __init__(self, max_bytes=DEFAULT_FILE_CACHE_SIZE):
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()
+        self.size = 0
+
+    def read(self, path, stat):
+        entry = self.entries.get(path)
+        if entry is not None and entry[0] == stat.st_mtime_ns and len(entry[1]) == stat.st_size:
+            self.entries.move_to_end(path)
+            return entry[1]
+        with open(path, "rb") as f:
+            data = f.read()
+        if entry is not None:
+            self.size -= len(self.entries.pop(path)[1])
+        if len(data) <= self.max_bytes:
+            self.entries[path] = (stat.st_mtime_ns, data)
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                old_path, (old_mtime, old_data) = self.entries.popitem(last=False)
+                self.size -= len(old_data)
+        return data
+
+
+class ServerStats:
+    def __init__(self):
+        self.started = time.time()
+        self.requests = 0
+        self.statuses = collections.Counter()
+        self.bytes_sent = 0
+        self.sendfile_responses = 0
+        self.cache_responses = 0
+        # The most recent latencies, enough for stable percentiles
+        self.latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+
+    def record(self, status, sent, latency):
+        self.requests += 1
+        self.statuses[status] += 1
+        self.bytes_sent += sent
+        self.latencies.append(latency)
+
+    def percentiles(self):
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return {}
+        return {
+            f"p{p}": round(latencies[min(len(latencies) - 1, len(latencies) * p // 100)] * 1000, 3)
+            for p in (50, 90, 99)
+        }
+
+    def as_dict(self):
+        return {
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "requests": self.requests,
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items())},
+            "bytes_sent": self.bytes_sent,
+            "sendfile_responses": self.sendfile_responses,
+            "cache_responses": self.cache_responses,
+            "latency_ms": self.percentiles(),
+        }
+
+
+class Request:
+    def __init__(self, method, target, version, headers):
+        self.method = method
+        self.target = target
+        self.version = version
+        self.headers = headers
+        url = urlsplit(target)
+        self.path = unquote(url.path)
+        self.query = parse_qs(url.query)
+
+    def keep_alive(self):
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+
+class LiveReloadClient:
+    # Hands messages from the watcher thread to the connection's event loop
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue()
+
+    def put(self, message):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, message)
+
+
+class StaticServer:
+    # A keep-alive HTTP/1.1 file server for the public directory
+    def __init__(self, root, livereload=None, file_cache_size=DEFAULT_FILE_CACHE_SIZE):
+        self.root = os.path.abspath(root)
+        self.livereload = livereload
+        self.file_cache = FileCache(file_cache_size)
+        self.stats = ServerStats()
+        # The hashed URLs from asset-manifest.json, and the (mtime, size) of
+        # the manifest they were read from
+        self.fingerprinted = frozenset()
+        self.asset_manifest_key = None
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, asyncio.LimitOverrunError):
+                    break
+                started = time.perf_counter()
+                request = parse_request(head)
+                if request is None:
+                    await self.respond(writer, None, 400, close=True)
+                    break
+                # Request bodies aren't used, but must not be read as the next request
+                length = request.headers.get("content-length", "0")
+                if length.isdigit() and int(length):
+                    await reader.readexactly(int(length))
+                if self.livereload is not None and request.path == LIVERELOAD_PATH:
+                    await self.serve_events(writer, request)
+                    break
+                status, sent = await self.dispatch(writer, request)
+                self.stats.record(status, sent, time.perf_counter() - started)
+                if not request.keep_alive():
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, writer, request):
+        if request.path == STATS_PATH:
+            body = json.dumps(self.stats.as_dict(), indent=2).encode("utf-8")
+            return await self.respond(writer, request, 200, body, {"Content-Type": "application/json"})
+        if self.livereload is not None and request.path == LIVERELOAD_PATH + "/loaded":
+            try:
+                edited = float(request.query.get("edited", ["0"])[0])
+            except ValueError:
+                return await self.respond(writer, request, 400)
+            page_path = request.query.get("path", ["/"])[0]
+            print(f" * {page_path} refreshed {(time.time() - edited) * 1000:.0f} ms after the edit")
+            return await self.respond(writer, request, 204)
+        if request.method not in ("GET", "HEAD"):
+            return await self.respond(writer, request, 405, headers={"Allow": "GET, HEAD"})
+        return await self.serve_file(writer, request)
+
+    async def serve_file(self, writer, request):
+        path = self.translate_path(request.path)
+        if path is None:
+            return await self.respond(writer, request, 404)
+        if os.path.isdir(path):
+            if not request.path.endswith("/"):
+                return await self.respond(writer, request, 301, headers={"Location": request.path + "/"})
+            path = os.path.join(path, "index.html")
+        try:
+            stat = os.stat(path)
+        except (OSError, ValueError):
+            return await self.respond(writer, request, 404)
+        if not os.path.isfile(path):
+            return await self.respond(writer, request, 404)
+
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if content_type.startswith("text/"):
+            content_type += "; charset=utf-8"
+        headers = {"Content-Type": content_type}
+        if self.livereload is not None and path.endswith(".html"):
+            # Pages get the reload script and are never cached by the browser
+            body = inject_script(self.file_cache.read(path, stat))
+            headers["Cache-Control"] = "no-cache"
+            return await self.respond(writer, request, 200, body, headers)
+
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        range_header = request.headers.get("range")
+        if range_header is None and accepts_gzip(request.headers.get("accept-encoding", "")):
+            gzip_path = fresh_gzip_path(path)
+            if gzip_path is not None:
+                path = gzip_path
+                stat = os.stat(path)
+                etag = etag[:-1] + '-gzip"'
+                headers["Content-Encoding"] = "gzip"
+        if "Content-Encoding" in headers or os.path.exists(path + ".gz"):
+            headers["Vary"] = "Accept-Encoding"
+        headers["ETag"] = etag
+        if request.path in self.fingerprinted_urls():
+            headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        headers["Last-Modified"] = email.utils.formatdate(stat.st_mtime, usegmt=True)
+        headers["Accept-Ranges"] = "bytes"
+        if not_modified(request, etag, stat.st_mtime):
+            return await self.respond(writer, request, 304, headers=headers)
+
+        status = 200
+        start, end = 0, stat.st_size - 1
+        if range_header is not None:
+            byte_range = parse_range(range_header, stat.st_size)
+            if byte_range == "unsatisfiable":
+                headers = {"Content-Range": f"bytes */{stat.st_size}"}
+                return await self.respond(writer, request, 416, headers=headers)
+            if byte_range is not None:
+                status = 206
+                start, end = byte_range
+                headers["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+        count = end - start + 1
+
+        if stat.st_size <= SMALL_FILE_SIZE:
+            self.stats.cache_responses += 1
+            body = self.file_cache.read(path, stat)[start : end + 1]
+            return await self.respond(writer, request, status, body, headers)
+
+        headers["Content-Length"] = str(count)
+        self.write_head(writer, request, status, headers)
+        if request.method == "HEAD":
+            return status, 0
+        await writer.drain()
+        with open(path, "rb") as f:
+            # os.sendfile where the loop and socket allow it, a read loop otherwise
+            await asyncio.get_running_loop().sendfile(writer.transport, f, start, count)
+        self.stats.sendfile_responses += 1
+        return status, count
+
+    async def serve_events(self, writer, request):
+        page_path = request.query.get("path", ["/"])[0]
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\nConnection: keep-alive\r\n\r\n"
+        )
+        client = self.livereload.connect(page_path, LiveReloadClient(asyncio.get_running_loop()))
+        try:
+            while not writer.is_closing():
+                try:
+                    message = await asyncio.wait_for(client.queue.get(), 15)
+                    writer.write(f"data: {message}\n\n".encode("utf-8"))
+                except asyncio.TimeoutError:
+                    writer.write(b": ping\n\n")
+                await writer.drain()
+        finally:
+            self.livereload.disconnect(client)
+
+    def fingerprinted_urls(self):
+        # URLs asset fingerprinting wrote, whose content never changes; the
+        # manifest is read again whenever a build rewrites it
+        path = os.path.join(self.root, ASSET_MANIFEST_FILENAME)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return frozenset()
+        key = (stat.st_mtime_ns, stat.st_size)
+        if key != self.asset_manifest_key:
+            try:
+                with open(path) as f:
+                    self.fingerprinted = frozenset(json.load(f).values())
+            except (OSError, ValueError):
+                self.fingerprinted = frozenset()
+            self.asset_manifest_key = key
+        return self.fingerprinted
+
+    def translate_path(self, url_path):
+        # None for anything that would resolve outside the root, or that no
+        # file can be named (os.stat raises ValueError on a NUL)
+        if "\0" in url_path:
+            return None
+        relative = posixpath.normpath(url_path).lstrip("/")
+        if relative in ("", "."):
+            return self.root
+        path = os.path.join(self.root, *relative.split("/"))
+        if not os.path.abspath(path).startswith(self.root + os.sep):
+            return None
+        return path
+
+    def write_head(self, writer, request, status, headers):
+        lines = [f"HTTP/1.1 {status} {STATUS_REASONS[status]}"]
+        headers = dict(headers)
+        headers["Date"] = email.utils.formatdate(usegmt=True)
+        headers["Server"] = "static-site"
+        if request is None or not request.keep_alive():
+            headers["Connection"] = "close"
+        elif request.version == "HTTP/1.0":
+            headers["Connection"] = "keep-alive"
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+
+    async def respond(self, writer, request, status, body=b"", headers=None, close=False):
+        headers = dict(headers or {})
+        if status not in (204, 304):
+            headers["Content-Length"] = str(len(body))
+        self.write_head(writer, request, status, headers)
+        sent = 0
+        if request is not None and request.method != "HEAD" and status not in (204, 304):
+            writer.write(body)
+            sent = len(body)
+        await writer.drain()
+        return status, sent
+
+
+def parse_request(head):
+    try:
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, version = lines[0].split(" ")
+    except ValueError:
+        return None
+    if not version.startswith("HTTP/1."):
+        return None
+    headers = {}
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, separator, value = line.partition(":")
+        if not separator:
+            return None
+        headers[name.strip().lower()] = value.strip()
+    return Request(method, target, version, headers)
+
+
+def not_modified(request, etag, mtime):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= since
+    return False
+
+
+def parse_range(header, size):
+    # (start, end) inclusive for a single "bytes=" range, "unsatisfiable",
+    # or None to ignore the header and send the whole file
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+    first, separator, last = spec.strip().partition("-")
+    if not separator:
+        return None
+    try:
+        if first == "":
+            # bytes=-500 is the last 500 bytes
+            suffix = int(last)
+            if suffix == 0:
+                return "unsatisfiable"
+            return max(0, size - suffix), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        return "unsatisfiable"
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+async def start_server(server, port=8888, bind=""):
+    return await asyncio.start_server(server.handle, bind or None, port, limit=MAX_HEADER_BYTES)
@@ -0,0 +1,146 @@
+import os
+import re
+
+import assets
+from includes import expand_includes, partial_path, partials_dir
+from manifest import hash_bytes
+
+# Placeholders the generator knows how to fill; anything else is left as-is
+TEMPLATE_SLOTS = ("Title", "Content", "Date", "Description", "Path", "Tags", "Prefetch")
+PLACEHOLDER_PATTERN = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+URL_ATTRIBUTE_PATTERN = re.compile(r'(\b(?:href|src)=")([^"]*)(")')
+
+# hash -> Template, and the (path, mtime, size) of the template and its
+# partials -> hash so pages don't re-read the files
+compiled_templates = {}
+template_hashes = {}
+# template path -> {partial: hash} from its last expansion
+template_partials = {}
+# (template hash, asset digest) -> Template with fingerprinted asset URLs
+fingerprinted_templates = {}
+# template hash -> the href and src URLs in its literal parts
+template_urls = {}
+
+
+class Template:
+    def __init__(self, literals, slots):
+        # literals always has one more entry than slots:
+        # literals[0] slots[0] literals[1] slots[1] ... literals[-1]
+        self.literals = literals
+        self.slots = slots
+
+    def uses(self, slot):
+        return slot in self.slots
+
+    def render(self, values):
+        parts = [self.literals[0]]
+        for slot, literal in zip(self.slots, self.literals[1:]):
+            parts.append(values.get(slot, ""))
+            parts.append(literal)
+        return "".join(parts)
+
+    def write(self, stream, values):
+        # Values with a write_html method (HTML nodes) are streamed straight
+        # into the output instead of being rendered to a string first
+        write = stream.write
+        write(self.literals[0])
+        for slot, literal in zip(self.slots, self.literals[1:]):
+            value = values.get(slot, "")
+            if hasattr(value, "write_html"):
+                value.write_html(stream)
+            else:
+                write(value)
+            write(literal)
+
+    def __repr__(self):
+        return f"Template(slots: {self.slots})"
+
+
+def compile_template(text):
+    literals = []
+    slots = []
+    literal_start = 0
+    for match in PLACEHOLDER_PATTERN.finditer(text):
+        name = match.group(1)
+        if name not in TEMPLATE_SLOTS:
+            continue
+        literals.append(text[literal_start : match.start()])
+        slots.append(name)
+        literal_start = match.end()
+    literals.append(text[literal_start:])
+    return Template(literals, slots)
+
+
+def fingerprint_template(template):
+    # Rewrite href and src URLs in the literal parts once per asset mapping
+    literals = [URL_ATTRIBUTE_PATTERN.sub(fingerprint_attribute, literal) for literal in template.literals]
+    return Template(literals, template.slots)
+
+
+def fingerprint_attribute(match):
+    return match.group(1) + assets.asset_url(match.group(2)) + match.group(3)
+
+
+def file_key(path):
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def template_key(template_path):
+    paths = [template_path]
+    for name in template_partials.get(os.path.abspath(template_path), {}):
+        paths.append(partial_path(partials_dir(template_path), name))
+    try:
+        return tuple(file_key(path) for path in paths)
+    except OSError:
+        # A partial went away; expanding again reports it
+        return None
+
+
+def template_hash(template_path):
+    # Covers the template and every partial it includes
+    key = template_key(template_path)
+    if key is not None and template_hashes.get(key) in compiled_templates:
+        return template_hashes[key]
+
+    with open(template_path, "rb") as f:
+        data = f.read()
+    # Decode the same way open(..., "r") would, newlines included
+    text = data.decode().replace("\r\n", "\n").replace("\r", "\n")
+    includes = {}
+    text = expand_includes(text, partials_dir(template_path), includes)
+    template_partials[os.path.abspath(template_path)] = includes
+    if includes:
+        data += "".join(f"\0{name}\0{includes[name]}" for name in sorted(includes)).encode("utf-8")
+    digest = hash_bytes(data)
+    template_hashes[template_key(template_path)] = digest
+    if digest not in compiled_templates:
+        compiled_templates[digest] = compile_template(text)
+    return digest
+
+
+def template_includes(template_path):
+    template_hash(template_path)
+    return template_partials[os.path.abspath(template_path)]
+
+
+def template_asset_urls(template_path):
+    # The URLs fingerprinting would rewrite in the template itself
+    digest = template_hash(template_path)
+    if digest not in template_urls:
+        template_urls[digest] = [
+            match.group(2)
+            for literal in compiled_templates[digest].literals
+            for match in URL_ATTRIBUTE_PATTERN.finditer(literal)
+        ]
+    return template_urls[digest]
+
+
+def load_template(template_path):
+    digest = template_hash(template_path)
+    if assets.active_urls is None:
+        return compiled_templates[digest]
+    key = (digest, assets.active_digest)
+    if key not in fingerprinted_templates:
+        fingerprinted_templates[key] = fingerprint_template(compiled_templates[digest])
+    return fingerprinted_templates[key]
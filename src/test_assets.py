@@ -0,0 +1,138 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import assets
+from extract import generate_pages_recursive
+from manifest import load_manifest
+from render_cache import open_cache
+from template import compile_template, fingerprint_template
+from textnode import TextNode, text_node_to_html_node, text_type_image, text_type_link
+
+
+class TestAssets(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.static_dir = os.path.join(self.root, "static")
+        self.dest_dir = os.path.join(self.root, "public")
+        os.makedirs(os.path.join(self.static_dir, "images"))
+        self.write(os.path.join(self.static_dir, "index.css"), "body {}")
+        self.write(os.path.join(self.static_dir, "images", "ring.png"), "not really a png")
+
+    def tearDown(self):
+        assets.configure(None)
+        shutil.rmtree(self.root)
+
+    def write(self, path, content):
+        with open(path, "w") as f:
+            f.write(content)
+
+    def fingerprint(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return assets.fingerprint_assets(self.static_dir, self.dest_dir)
+
+    def test_hashed_copies_and_asset_manifest(self):
+        urls, stats = self.fingerprint()
+        self.assertEqual(stats["written"], 2)
+        css_url = urls["/index.css"]
+        self.assertRegex(css_url, r"^/index\.[0-9a-f]{8}\.css$")
+        with open(os.path.join(self.dest_dir, css_url.lstrip("/"))) as f:
+            self.assertEqual(f.read(), "body {}")
+        self.assertTrue(os.path.exists(os.path.join(self.dest_dir, assets.ASSET_MANIFEST_FILENAME)))
+
+    def test_unchanged_assets_keep_their_names(self):
+        first, stats = self.fingerprint()
+        second, stats = self.fingerprint()
+        self.assertEqual(first, second)
+        self.assertEqual((stats["written"], stats["unchanged"]), (0, 2))
+
+    def test_changed_asset_gets_a_new_name_and_the_old_one_is_pruned(self):
+        first, stats = self.fingerprint()
+        self.write(os.path.join(self.static_dir, "index.css"), "body { color: red; }")
+        second, stats = self.fingerprint()
+        self.assertNotEqual(first["/index.css"], second["/index.css"])
+        self.assertEqual(first["/images/ring.png"], second["/images/ring.png"])
+        self.assertEqual(stats["pruned"], 1)
+        self.assertFalse(os.path.exists(os.path.join(self.dest_dir, first["/index.css"].lstrip("/"))))
+
+    def test_remove_fingerprints(self):
+        urls, stats = self.fingerprint()
+        self.assertEqual(assets.remove_fingerprints(self.dest_dir), 2)
+        self.assertEqual(os.listdir(self.dest_dir), [".build-manifest.json"])
+
+    def test_asset_url(self):
+        assets.configure({"/index.css": "/index.12345678.css"})
+        self.assertEqual(assets.asset_url("/index.css"), "/index.12345678.css")
+        self.assertEqual(assets.asset_url("/index.css?v=2#top"), "/index.12345678.css?v=2#top")
+        self.assertEqual(assets.asset_url("/other.css"), "/other.css")
+        self.assertEqual(assets.asset_url("https://example.com/index.css"), "https://example.com/index.css")
+
+    def test_rewritten_while_rendering(self):
+        assets.configure({"/index.css": "/index.12345678.css", "/images/ring.png": "/images/ring.87654321.png"})
+        template = fingerprint_template(compile_template('<link href="/index.css">{{ Content }}'))
+        self.assertEqual(template.render({"Content": ""}), '<link href="/index.12345678.css">')
+        image = text_node_to_html_node(TextNode("ring", text_type_image, "/images/ring.png"))
+        self.assertEqual(image.to_html(), '<img src="/images/ring.87654321.png" alt="ring"></img>')
+        link = text_node_to_html_node(TextNode("home", text_type_link, "/"))
+        self.assertEqual(link.to_html(), '<a href="/">home</a>')
+
+    def test_pages_rebuild_when_fingerprints_change(self):
+        content_dir = os.path.join(self.root, "contents")
+        template_path = os.path.join(self.root, "template.html")
+        os.makedirs(content_dir)
+        self.write(template_path, '<link href="/index.css" rel="stylesheet">{{ Content }}')
+        self.write(os.path.join(content_dir, "index.md"), "# Home\n\n![ring](/images/ring.png)")
+        urls, stats = self.fingerprint()
+        assets.configure(urls)
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_pages_recursive(content_dir, template_path, self.dest_dir)
+        with open(os.path.join(self.dest_dir, "index.html")) as f:
+            html = f.read()
+        self.assertIn(f'href="{urls["/index.css"]}"', html)
+        self.assertIn(f'src="{urls["/images/ring.png"]}"', html)
+
+        self.write(os.path.join(self.static_dir, "index.css"), "body { margin: 0; }")
+        urls, stats = self.fingerprint()
+        assets.configure(urls)
+        with contextlib.redirect_stdout(io.StringIO()):
+            summary = generate_pages_recursive(content_dir, template_path, self.dest_dir)
+        self.assertEqual(summary["rebuilt"], ["index.html"])
+        with open(os.path.join(self.dest_dir, "index.html")) as f:
+            self.assertIn(f'href="{urls["/index.css"]}"', f.read())
+
+    def test_only_pages_referencing_a_renamed_asset_rebuild(self):
+        content_dir = os.path.join(self.root, "contents")
+        template_path = os.path.join(self.root, "template.html")
+        os.makedirs(content_dir)
+        self.write(template_path, '<link href="/index.css" rel="stylesheet">{{ Content }}')
+        self.write(os.path.join(content_dir, "index.md"), "# Home\n\n![ring](/images/ring.png)")
+        self.write(os.path.join(content_dir, "other.md"), "# Other\n\nNo images")
+        cache = open_cache(os.path.join(self.root, "cache"))
+
+        def build(**kwargs):
+            assets.configure(self.fingerprint()[0])
+            with contextlib.redirect_stdout(io.StringIO()):
+                return generate_pages_recursive(content_dir, template_path, self.dest_dir, cache=cache, **kwargs)
+
+        build()
+        self.write(os.path.join(self.static_dir, "images", "ring.png"), "another ring")
+        self.assertEqual(build()["rebuilt"], ["index.html"])
+        self.assertEqual(load_manifest(self.dest_dir)["reasons"]["index.html"], ["asset fingerprints changed"])
+        # The cached render of index.md named the old image, so it wasn't used
+        self.assertEqual((cache.stats["hit"], cache.stats["miss"]), (0, 3))
+        with open(os.path.join(self.dest_dir, "index.html")) as f:
+            self.assertIn(assets.asset_url("/images/ring.png"), f.read())
+
+        self.write(os.path.join(self.static_dir, "index.css"), "body { margin: 0; }")
+        self.assertEqual(sorted(build()["rebuilt"]), ["index.html", "other.html"])
+        self.assertEqual(
+            load_manifest(self.dest_dir)["reasons"]["other.html"], ["template asset fingerprints changed"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
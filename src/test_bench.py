@@ -0,0 +1,50 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from bench import compare_results, generate_corpus, synthetic_list
+from markdown_blocks import block_type_olist, block_type_ulist, scan_blocks
+
+
+class TestBench(unittest.TestCase):
+
+    def setUp(self):
+        self.roots = [tempfile.mkdtemp(), tempfile.mkdtemp()]
+
+    def tearDown(self):
+        for root in self.roots:
+            shutil.rmtree(root)
+
+    def read_pages(self, content_dir):
+        pages = {}
+        for root, dirs, files in os.walk(content_dir):
+            for file in files:
+                path = os.path.join(root, file)
+                with open(path) as f:
+                    pages[os.path.relpath(path, content_dir)] = f.read()
+        return pages
+
+    def test_corpus_is_deterministic(self):
+        first, _ = generate_corpus(self.roots[0], pages=5, static_files=2, seed=7)
+        second, _ = generate_corpus(self.roots[1], pages=5, static_files=2, seed=7)
+        self.assertEqual(len(self.read_pages(first)), 5)
+        self.assertEqual(self.read_pages(first), self.read_pages(second))
+
+    def test_every_list_level_parses_as_a_list(self):
+        blocks = list(scan_blocks(synthetic_list(random.Random(0), 3)))
+        self.assertEqual(
+            [block.block_type for block in blocks], [block_type_ulist, block_type_olist, block_type_ulist]
+        )
+
+    def test_compare_flags_regressions_above_threshold(self):
+        baseline = {"stages": {"to_html": 1.0, "write": 1.0}}
+        results = {"stages": {"to_html": 1.05, "write": 1.5}}
+        rows, regressions = compare_results(results, baseline, 0.10)
+        self.assertEqual(regressions, ["write"])
+        self.assertEqual(len(rows), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
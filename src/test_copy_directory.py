@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from copy_directory import copy_file, copy_files_recursive, sync_static
+
+
+class TestSyncStatic(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.static_dir = os.path.join(self.root, "static")
+        self.public_dir = os.path.join(self.root, "public")
+        os.makedirs(os.path.join(self.static_dir, "images"))
+        self.write(os.path.join(self.static_dir, "index.css"), "body { color: red; }")
+        self.write(os.path.join(self.static_dir, "images", "logo.png"), "not really a png")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, path, content):
+        with open(path, "w") as f:
+            f.write(content)
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_first_sync_copies_everything(self):
+        stats = sync_static(self.static_dir, self.public_dir)
+        self.assertEqual(stats["copied_files"], 2)
+        self.assertEqual(stats["skipped_files"], 0)
+        self.assertEqual(self.read(os.path.join(self.public_dir, "index.css")), "body { color: red; }")
+
+    def test_second_sync_skips_unchanged_files(self):
+        sync_static(self.static_dir, self.public_dir)
+        stats = sync_static(self.static_dir, self.public_dir)
+        self.assertEqual(stats["copied_files"], 0)
+        self.assertEqual(stats["copied_bytes"], 0)
+        self.assertEqual(stats["skipped_files"], 2)
+
+    def test_checksum_catches_same_size_same_mtime_edit(self):
+        sync_static(self.static_dir, self.public_dir)
+        css_path = os.path.join(self.static_dir, "index.css")
+        stat = os.stat(css_path)
+        self.write(css_path, "body { color: tan; }")
+        os.utime(css_path, (stat.st_atime, stat.st_mtime))
+        self.assertEqual(sync_static(self.static_dir, self.public_dir)["copied_files"], 0)
+        stats = sync_static(self.static_dir, self.public_dir, checksum=True)
+        self.assertEqual(stats["copied_files"], 1)
+        self.assertEqual(self.read(os.path.join(self.public_dir, "index.css")), "body { color: tan; }")
+
+    def test_prune_only_touches_previously_synced_files(self):
+        sync_static(self.static_dir, self.public_dir)
+        self.write(os.path.join(self.public_dir, "index.html"), "generated page")
+        shutil.rmtree(os.path.join(self.static_dir, "images"))
+        stats = sync_static(self.static_dir, self.public_dir)
+        self.assertEqual(stats["pruned_files"], 1)
+        self.assertFalse(os.path.exists(os.path.join(self.public_dir, "images")))
+        self.assertTrue(os.path.exists(os.path.join(self.public_dir, "index.html")))
+
+    def test_hardlink_does_not_write_through_to_source(self):
+        stats = copy_files_recursive(self.static_dir, self.public_dir, hardlink=True)
+        self.assertEqual(stats["copied_files"], 2)
+        copy_file(os.path.join(self.static_dir, "images", "logo.png"), os.path.join(self.public_dir, "index.css"))
+        self.assertEqual(self.read(os.path.join(self.static_dir, "index.css")), "body { color: red; }")
+
+
+if __name__ == "__main__":
+    unittest.main()
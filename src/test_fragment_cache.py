@@ -0,0 +1,61 @@
+import unittest
+
+import fragment_cache
+from fragment_cache import FragmentCache
+from markdown_blocks import markdown_to_html_node
+
+FOOTER = "> Copyright the *Fellowship*, all rights reserved"
+
+
+class TestFragmentCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = fragment_cache.configure(1024 * 1024)
+
+    def tearDown(self):
+        fragment_cache.configure(fragment_cache.DEFAULT_FRAGMENT_CACHE_SIZE)
+
+    def test_repeated_blocks_render_once(self):
+        first = markdown_to_html_node(f"# One\n\nFirst page\n\n{FOOTER}").to_html()
+        second = markdown_to_html_node(f"# Two\n\nSecond page\n\n{FOOTER}").to_html()
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.cache.misses, 5)
+        self.assertTrue(second.endswith(
+            "<blockquote>Copyright the <i>Fellowship</i>, all rights reserved</blockquote></div>"
+        ))
+        self.assertIn("<h1>One</h1>", first)
+
+    def test_same_output_without_cache(self):
+        markdown = f"# Title\n\n- one\n- two\n\n```\ncode  \n```\n\n{FOOTER}\n\n{FOOTER}"
+        cached = markdown_to_html_node(markdown).to_html()
+        fragment_cache.configure(0)
+        self.assertIsNone(fragment_cache.active())
+        self.assertEqual(markdown_to_html_node(markdown).to_html(), cached)
+
+    def test_block_type_is_part_of_the_key(self):
+        self.assertNotEqual(
+            fragment_cache.block_key("paragraph", ["text"]),
+            fragment_cache.block_key("heading", ["text"]),
+        )
+        # A large block costs a fixed-size key, not a second copy of its text
+        self.assertEqual(len(fragment_cache.block_key("code", ["x" * 100000])), 64)
+
+    def test_lru_bounded_by_size(self):
+        cache = FragmentCache(max_bytes=25)
+        cache.put("a", "x" * 9)
+        cache.put("b", "x" * 9)
+        cache.get("a")
+        cache.put("c", "x" * 9)
+        self.assertEqual(list(cache.entries), ["a", "c"])
+        self.assertLessEqual(cache.size, 25)
+        cache.put("huge", "x" * 100)
+        self.assertIsNone(cache.get("huge"))
+
+    def test_format_stats(self):
+        cache = FragmentCache()
+        cache.add_stats(3, 1)
+        self.assertEqual(cache.format_stats(), "Fragment cache: 3 hits, 1 misses (75% hit rate)")
+
+
+if __name__ == "__main__":
+    unittest.main()
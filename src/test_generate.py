@@ -1,6 +1,17 @@
+import argparse
 import unittest
 import os
-from extract import generate_page, extract_title
+import shutil
+import tempfile
+from extract import (
+    explain_page,
+    generate_page,
+    generate_pages_recursive,
+    generate_selected_pages,
+    extract_title,
+    parse_jobs,
+)
+from manifest import load_manifest
 
 class TestGeneratePageSimple(unittest.TestCase):
 
@@ -49,5 +60,172 @@ class TestGeneratePageSimple(unittest.TestCase):
         self.assertIn("<title>Simple Title</title>", generated_content)
         self.assertIn("<body><p>This is a simple paragraph without links.</p></body>", generated_content)
 
+class TestGeneratePagesIncremental(unittest.TestCase):
+
+    def setUp(self):
+        # Build a tiny site in a scratch directory
+        self.root = tempfile.mkdtemp()
+        self.content_dir = os.path.join(self.root, "contents")
+        self.dest_dir = os.path.join(self.root, "public")
+        self.template_path = os.path.join(self.root, "template.html")
+        os.makedirs(os.path.join(self.content_dir, "blog"))
+        self.write(self.template_path, "<title>{{ Title }}</title>{{ Content }}")
+        self.write(os.path.join(self.content_dir, "index.md"), "# Home\n\nWelcome")
+        self.write(os.path.join(self.content_dir, "blog", "index.md"), "# Blog\n\nPosts")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, path, content):
+        with open(path, "w") as f:
+            f.write(content)
+
+    def test_first_build_renders_everything(self):
+        summary = generate_pages_recursive(self.content_dir, self.template_path, self.dest_dir)
+        self.assertEqual(sorted(summary["rebuilt"]), [os.path.join("blog", "index.html"), "index.html"])
+        self.assertEqual(summary["skipped"], [])
+        manifest = load_manifest(self.dest_dir)
+        self.assertEqual(manifest["pages"]["index.html"]["source"], "index.md")
+
+    def test_unchanged_pages_are_skipped(self):
+        generate_pages_recursive(self.content_dir, self.template_path, self.dest_dir)
+        self.write(os.path.join(self.content_dir, "index.md"), "# Home\n\nWelcome back")
+        summary = generate_pages_recursive(self.content_dir, self.template_path, self.dest_dir)
+        self.assertEqual(summary["rebuilt"], ["index.html"])
+        self.assertEqual(summary["skipped"], [os.path.join("blog", "index.html")])
+        with open(os.path.join(self.dest_dir, "index.html")) as f:
+            self.assertIn("Welcome back", f.read())
+
+    def test_template_change_rebuilds_everything(self):
+        generate_pages_recursive(self.content_dir, self.template_path, self.dest_dir)
+        self.write(self.template_path, "<h1>{{ Title }}</h1>{{ Content }}")
+        summary = generate_pages_recursive(self.content_dir, self.template_path, self.dest_dir)
+        self.assertEqual(len(summary["rebuilt"]), 2)
+
+    def test_path_and_date_are_attribute_escaped(self):
+        self.write(self.template_path, '<a href="{{ Path }}" title="{{ Date }}">{{ Title }}</a>')
+        self.write(os.path.join(self.content_dir, 'say "friend".md'), "# Door\n\nEnter")
+        generate_pages_recursive(self.content_dir, self.template_path, self.dest_dir)
+        with open(os.path.join(self.dest_dir, 'say "friend".html')) as f:
+            self.assertTrue(f.read().startswith('<a href="/say &quot;friend&quot;.html" title="'))
+
+    def test_force_rebuilds_everything(self):
+        generate_pages_recursive(self.content_dir, self.template_path, self.dest_dir)
+        summary = generate_pages_recursive(self.content_dir, self.template_path, self.dest_dir, force=True)
+        self.assertEqual(len(summary["rebuilt"]), 2)
+        self.assertEqual(summary["skipped"], [])
+
+    def test_removed_source_deletes_output(self):
+        generate_pages_recursive(self.content_dir, self.template_path, self.dest_dir)
+        shutil.rmtree(os.path.join(self.content_dir, "blog"))
+        summary = generate_pages_recursive(self.content_dir, self.template_path, self.dest_dir)
+        self.assertEqual(summary["deleted"], [os.path.join("blog", "index.html")])
+        self.assertFalse(os.path.exists(os.path.join(self.dest_dir, "blog")))
+
+    def test_parallel_build_matches_serial_build(self):
+        serial_dir = os.path.join(self.root, "serial")
+        generate_pages_recursive(self.content_dir, self.template_path, serial_dir)
+        summary = generate_pages_recursive(self.content_dir, self.template_path, self.dest_dir, jobs=2)
+        self.assertEqual(len(summary["rebuilt"]), 2)
+        for page in summary["rebuilt"]:
+            with open(os.path.join(serial_dir, page), "rb") as f:
+                serial_html = f.read()
+            with open(os.path.join(self.dest_dir, page), "rb") as f:
+                self.assertEqual(f.read(), serial_html)
+
+    def test_jobs_must_be_zero_or_positive(self):
+        self.assertEqual(parse_jobs("0"), 0)
+        self.assertEqual(parse_jobs("4"), 4)
+        for value in ("-2", "two", ""):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                parse_jobs(value)
+
+    def test_failed_page_is_reported_and_retried(self):
+        self.write(os.path.join(self.content_dir, "blog", "index.md"), "# Blog\n\nan **unclosed tag")
+        summary = generate_pages_recursive(self.content_dir, self.template_path, self.dest_dir, jobs=2)
+        self.assertEqual(summary["rebuilt"], ["index.html"])
+        self.assertEqual(summary["failed"][0][0], os.path.join("blog", "index.html"))
+        self.assertIn("ValueError", summary["failed"][0][1])
+        summary = generate_pages_recursive(self.content_dir, self.template_path, self.dest_dir)
+        self.assertEqual(len(summary["failed"]), 1)
+
+    def test_selected_pages_keep_manifest_in_step(self):
+        generate_pages_recursive(self.content_dir, self.template_path, self.dest_dir)
+        blog_path = os.path.join(self.content_dir, "blog", "index.md")
+        self.write(blog_path, "# Blog\n\nNew post")
+        summary = generate_selected_pages(self.content_dir, self.template_path, self.dest_dir, [blog_path])
+        self.assertEqual(summary["rebuilt"], [os.path.join("blog", "index.html")])
+        # The full build now agrees nothing is stale
+        summary = generate_pages_recursive(self.content_dir, self.template_path, self.dest_dir)
+        self.assertEqual(summary["rebuilt"], [])
+
+class TestIncludes(unittest.TestCase):
+
+    def setUp(self):
+        # Two pages, one of which includes a footer that includes a copyright line
+        self.root = tempfile.mkdtemp()
+        self.content_dir = os.path.join(self.root, "contents")
+        self.dest_dir = os.path.join(self.root, "public")
+        self.partials_dir = os.path.join(self.root, "partials")
+        self.template_path = os.path.join(self.root, "template.html")
+        os.makedirs(os.path.join(self.content_dir, "blog"))
+        os.makedirs(self.partials_dir)
+        self.write(self.template_path, "{{ include nav.html }}<title>{{ Title }}</title>{{ Content }}")
+        self.write(os.path.join(self.partials_dir, "nav.html"), "<nav>Home</nav>\n")
+        self.write(os.path.join(self.partials_dir, "footer.md"), "Footer, {{ include copyright.md }}\n")
+        self.write(os.path.join(self.partials_dir, "copyright.md"), "*all rights reserved*\n")
+        self.write(os.path.join(self.content_dir, "index.md"), "# Home\n\nWelcome")
+        self.write(os.path.join(self.content_dir, "blog", "index.md"), "# Blog\n\n{{ include footer.md }}")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, path, content):
+        with open(path, "w") as f:
+            f.write(content)
+
+    def build(self):
+        return generate_pages_recursive(self.content_dir, self.template_path, self.dest_dir)
+
+    def test_includes_are_expanded(self):
+        self.build()
+        with open(os.path.join(self.dest_dir, "blog", "index.html")) as f:
+            self.assertEqual(
+                f.read(),
+                "<nav>Home</nav><title>Blog</title><div><h1>Blog</h1>"
+                "<p>Footer, <i>all rights reserved</i></p></div>",
+            )
+
+    def test_changed_partial_rebuilds_only_pages_including_it(self):
+        self.build()
+        self.write(os.path.join(self.partials_dir, "copyright.md"), "*some rights reserved*\n")
+        summary = self.build()
+        self.assertEqual(summary["rebuilt"], [os.path.join("blog", "index.html")])
+        self.assertEqual(summary["skipped"], ["index.html"])
+        lines = explain_page("/blog/", self.content_dir, self.template_path, self.dest_dir)
+        self.assertIn("  - included partial copyright.md changed", lines)
+        self.assertIn("      copyright.md", lines)
+
+    def test_template_partial_rebuilds_everything(self):
+        self.build()
+        self.write(os.path.join(self.partials_dir, "nav.html"), "<nav>Home | Blog</nav>\n")
+        summary = self.build()
+        self.assertEqual(len(summary["rebuilt"]), 2)
+        lines = explain_page("index.html", self.content_dir, self.template_path, self.dest_dir)
+        self.assertIn("  - template partial nav.html changed", lines)
+
+    def test_unchanged_page_explains_it_was_skipped(self):
+        self.build()
+        self.build()
+        source = os.path.join(self.content_dir, "index.md")
+        lines = explain_page(source, self.content_dir, self.template_path, self.dest_dir)
+        self.assertIn("Not rebuilt in the last build: nothing it depends on changed", lines)
+
+    def test_include_cycle_fails_the_page(self):
+        self.write(os.path.join(self.partials_dir, "copyright.md"), "{{ include footer.md }}")
+        summary = self.build()
+        self.assertEqual(summary["failed"][0][0], os.path.join("blog", "index.html"))
+        self.assertIn("Include cycle: footer.md -> copyright.md -> footer.md", summary["failed"][0][1])
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,50 @@
+import io
+import unittest
+
+from htmlnode import LeafNode, ParentNode
+from template import compile_template
+
+
+class TestStreamingRender(unittest.TestCase):
+
+    def setUp(self):
+        self.node = ParentNode(
+            "div",
+            [
+                ParentNode("p", [LeafNode("b", "Bold"), LeafNode(None, " and "), LeafNode("i", "italic")]),
+                LeafNode("a", "link", {"href": "/majesty"}),
+            ],
+        )
+        self.expected = '<div><p><b>Bold</b> and <i>italic</i></p><a href="/majesty">link</a></div>'
+
+    def test_to_html_is_unchanged(self):
+        self.assertEqual(self.node.to_html(), self.expected)
+
+    def test_iter_html_yields_chunks(self):
+        chunks = list(self.node.iter_html())
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks), self.expected)
+
+    def test_write_html_text_stream(self):
+        stream = io.StringIO()
+        self.node.write_html(stream)
+        self.assertEqual(stream.getvalue(), self.expected)
+
+    def test_write_html_bytes_stream(self):
+        stream = io.BytesIO()
+        ParentNode("p", [LeafNode(None, "café")]).write_html(stream)
+        self.assertEqual(stream.getvalue(), "<p>café</p>".encode("utf-8"))
+
+    def test_invalid_node_raises_while_streaming(self):
+        with self.assertRaises(ValueError):
+            ParentNode("div", [LeafNode("p", None)]).write_html(io.StringIO())
+
+    def test_template_streams_node_into_slot(self):
+        template = compile_template("<title>{{ Title }}</title><body>{{ Content }}</body>")
+        stream = io.StringIO()
+        template.write(stream, {"Title": "Home", "Content": self.node})
+        self.assertEqual(stream.getvalue(), f"<title>Home</title><body>{self.expected}</body>")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import contextlib
+import io
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+import zlib
+
+import image_size
+from extract import generate_pages_recursive
+from image_size import probe_image, probe_static_images
+from manifest import load_manifest
+from textnode import TextNode, text_node_to_html_node, text_type_image
+
+
+def png_bytes(width, height):
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    chunk = struct.pack(">I", len(ihdr)) + b"IHDR" + ihdr + struct.pack(">I", zlib.crc32(b"IHDR" + ihdr))
+    return b"\x89PNG\r\n\x1a\n" + chunk + b"\x00" * 100
+
+
+def jpeg_bytes(width, height):
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + b"\x00" * 9
+    # A DHT segment (C4) must not be mistaken for a frame header
+    dht = b"\xff\xc4" + struct.pack(">H", 5) + b"\x00\x00\x00"
+    sof = b"\xff\xc0" + struct.pack(">HBHHB", 11, 8, height, width, 1) + b"\x01\x11\x00"
+    return b"\xff\xd8" + app0 + dht + sof + b"\xff\xd9"
+
+
+class TestImageSize(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        image_size.configure(None)
+        shutil.rmtree(self.root)
+
+    def write(self, relative_path, data):
+        path = os.path.join(self.root, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_png(self):
+        self.assertEqual(probe_image(self.write("a.png", png_bytes(1344, 896))), (1344, 896))
+
+    def test_gif(self):
+        self.assertEqual(probe_image(self.write("a.gif", b"GIF89a" + struct.pack("<HH", 40, 30) + b"\x00" * 20)), (40, 30))
+
+    def test_jpeg(self):
+        self.assertEqual(probe_image(self.write("a.jpg", jpeg_bytes(800, 600))), (800, 600))
+
+    def test_webp(self):
+        vp8x = b"RIFF\x00\x00\x00\x00WEBPVP8X" + b"\x0a\x00\x00\x00" + b"\x00" * 4
+        vp8x += (639).to_bytes(3, "little") + (479).to_bytes(3, "little")
+        self.assertEqual(probe_image(self.write("x.webp", vp8x)), (640, 480))
+        bits = (99 & 0x3FFF) | ((49 & 0x3FFF) << 14)
+        vp8l = b"RIFF\x00\x00\x00\x00WEBPVP8L" + b"\x00" * 4 + b"\x2f" + bits.to_bytes(4, "little")
+        self.assertEqual(probe_image(self.write("l.webp", vp8l)), (100, 50))
+        vp8 = b"RIFF\x00\x00\x00\x00WEBPVP8 " + b"\x00" * 7 + b"\x9d\x01\x2a" + struct.pack("<HH", 320, 240)
+        self.assertEqual(probe_image(self.write("v.webp", vp8)), (320, 240))
+
+    def test_truncated_images(self):
+        # Cut off inside the size fields: unsized, not a struct.error
+        self.assertIsNone(probe_image(self.write("a.png", png_bytes(1344, 896)[:20])))
+        self.assertIsNone(probe_image(self.write("a.gif", b"GIF89a\x28\x00")))
+        self.assertIsNone(probe_image(self.write("a.jpg", jpeg_bytes(800, 600)[:35])))
+        vp8 = b"RIFF\x00\x00\x00\x00WEBPVP8 " + b"\x00" * 7 + b"\x9d\x01\x2a\x40"
+        self.assertIsNone(probe_image(self.write("v.webp", vp8)))
+        vp8l = b"RIFF\x00\x00\x00\x00WEBPVP8L" + b"\x00" * 4 + b"\x2f\x63"
+        self.assertIsNone(probe_image(self.write("l.webp", vp8l)))
+        vp8x = b"RIFF\x00\x00\x00\x00WEBPVP8X" + b"\x0a\x00\x00\x00" + b"\x00" * 4 + b"\x7f\x02"
+        self.assertIsNone(probe_image(self.write("x.webp", vp8x)))
+
+    def test_unknown_format(self):
+        self.assertIsNone(probe_image(self.write("a.png", b"not an image")))
+
+    def test_static_images_are_probed_once(self):
+        static_dir = os.path.join(self.root, "static")
+        dest_dir = os.path.join(self.root, "public")
+        self.write("static/images/ring.png", png_bytes(10, 20))
+        self.write("static/images/copy.png", png_bytes(10, 20))
+        self.write("static/readme.txt", b"text")
+        sizes, stats = probe_static_images(static_dir, dest_dir)
+        self.assertEqual(sizes, {"/images/copy.png": (10, 20), "/images/ring.png": (10, 20)})
+        # Both files have the same content, so only one was read for its header
+        self.assertEqual(stats, {"probed": 1, "reused": 1})
+        sizes, stats = probe_static_images(static_dir, dest_dir)
+        self.assertEqual(stats, {"probed": 0, "reused": 2})
+
+    def test_rendered_image_attributes(self):
+        image_size.configure({"/images/ring.png": (10, 20)})
+        node = text_node_to_html_node(TextNode("ring", text_type_image, "/images/ring.png"))
+        self.assertEqual(
+            node.to_html(),
+            '<img src="/images/ring.png" alt="ring" width="10" height="20" loading="lazy" decoding="async"></img>',
+        )
+        node = text_node_to_html_node(TextNode("far", text_type_image, "https://example.com/far.png"))
+        self.assertEqual(node.props_to_html(), ' src="https://example.com/far.png" alt="far" loading="lazy" decoding="async"')
+        image_size.configure(None)
+        node = text_node_to_html_node(TextNode("ring", text_type_image, "/images/ring.png"))
+        self.assertEqual(node.to_html(), '<img src="/images/ring.png" alt="ring"></img>')
+
+    def test_only_pages_showing_a_resized_image_rebuild(self):
+        static_dir = os.path.join(self.root, "static")
+        content_dir = os.path.join(self.root, "contents")
+        dest_dir = os.path.join(self.root, "public")
+        template_path = self.write("template.html", b"{{ Content }}")
+        self.write("static/images/ring.png", png_bytes(10, 20))
+        self.write("static/images/map.png", png_bytes(30, 40))
+        self.write("contents/index.md", b"# Home\n\n![ring](/images/ring.png)")
+        self.write("contents/map.md", b"# Map\n\n![map](/images/map.png)")
+        self.write("contents/text.md", b"# Text\n\nNo images")
+
+        def build():
+            image_size.configure(probe_static_images(static_dir, dest_dir)[0])
+            with contextlib.redirect_stdout(io.StringIO()):
+                return generate_pages_recursive(content_dir, template_path, dest_dir)
+
+        build()
+        self.write("static/images/ring.png", png_bytes(11, 20))
+        self.assertEqual(build()["rebuilt"], ["index.html"])
+        self.assertEqual(load_manifest(dest_dir)["reasons"]["index.html"], ["image sizes changed"])
+        # A page without images doesn't depend on sizing at all
+        image_size.configure(None)
+        with contextlib.redirect_stdout(io.StringIO()):
+            summary = generate_pages_recursive(content_dir, template_path, dest_dir)
+        self.assertEqual(sorted(summary["rebuilt"]), ["index.html", "map.html"])
+
+
+if __name__ == "__main__":
+    unittest.main()
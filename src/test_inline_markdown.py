@@ -0,0 +1,90 @@
+import random
+import unittest
+
+from inline_markdown import (
+    split_nodes_delimiter,
+    split_nodes_image,
+    split_nodes_link,
+    text_to_textnodes,
+)
+from textnode import (
+    TextNode,
+    text_type_text,
+    text_type_bold,
+    text_type_italic,
+    text_type_code,
+    text_type_image,
+    text_type_link,
+)
+
+
+def staged_text_to_textnodes(text):
+    # The original five-stage pipeline, kept here as the reference
+    nodes = [TextNode(text, text_type_text)]
+    nodes = split_nodes_delimiter(nodes, "**", text_type_bold)
+    nodes = split_nodes_delimiter(nodes, "*", text_type_italic)
+    nodes = split_nodes_delimiter(nodes, "`", text_type_code)
+    nodes = split_nodes_image(nodes)
+    nodes = split_nodes_link(nodes)
+    return nodes
+
+
+def tokenize(func, text):
+    try:
+        return [(node.text, node.text_type, node.url) for node in func(text)]
+    except ValueError as e:
+        return str(e)
+
+
+class TestTextToTextNodes(unittest.TestCase):
+
+    def test_all_inline_types(self):
+        nodes = text_to_textnodes(
+            "This is **text** with an *italic* word and a `code block` and an "
+            "![obi wan image](https://i.imgur.com/fJRm4Vk.jpeg) and a [link](https://boot.dev)"
+        )
+        self.assertEqual(
+            nodes,
+            [
+                TextNode("This is ", text_type_text),
+                TextNode("text", text_type_bold),
+                TextNode(" with an ", text_type_text),
+                TextNode("italic", text_type_italic),
+                TextNode(" word and a ", text_type_text),
+                TextNode("code block", text_type_code),
+                TextNode(" and an ", text_type_text),
+                TextNode("obi wan image", text_type_image, "https://i.imgur.com/fJRm4Vk.jpeg"),
+                TextNode(" and a ", text_type_text),
+                TextNode("link", text_type_link, "https://boot.dev"),
+            ],
+        )
+
+    def test_unclosed_delimiter_raises(self):
+        for text in ["**bold", "*italic", "`code", "*a **b** c*", "`a *b* c`"]:
+            with self.assertRaises(ValueError):
+                text_to_textnodes(text)
+
+    def test_matches_staged_pipeline(self):
+        samples = [
+            "",
+            "plain text",
+            "a***b***c",
+            "**bold with *star* and `tick`**",
+            "wow![x](y)[l](u)!",
+            "[a](b) ![c](d) [e](f)",
+            "![a] [b](c)",
+            "line\n[l](u)\n`code`",
+        ]
+        for text in samples:
+            self.assertEqual(tokenize(text_to_textnodes, text), tokenize(staged_text_to_textnodes, text), text)
+
+    def test_matches_staged_pipeline_randomized(self):
+        pieces = ["a", "b", " ", "*", "**", "`", "[", "]", "(", ")", "!", "![x](y)", "[l](u)", "\n"]
+        rng = random.Random(0)
+        for _ in range(20000):
+            text = "".join(rng.choice(pieces) for _ in range(rng.randrange(14)))
+            self.assertEqual(tokenize(text_to_textnodes, text), tokenize(staged_text_to_textnodes, text), text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from extract import generate_pages_recursive
+from link_graph import check_links, page_links, resolve
+from manifest import load_manifest
+from render_cache import open_cache
+
+
+class TestLinks(unittest.TestCase):
+
+    def test_page_links_with_block_spans(self):
+        markdown = (
+            "# Title\n\nSee [the road](/road/)\nand ![map](map.png)\n\n```\n[not](/a-link/)\n```\n\n- [site](https://x.org)"
+        )
+        self.assertEqual(
+            page_links(markdown),
+            [
+                ["link", "/road/", 3, 4],
+                ["image", "map.png", 3, 4],
+                ["link", "https://x.org", 10, 10],
+            ],
+        )
+
+    def test_page_links_strip_list_markers(self):
+        # "* " bullets are not italic delimiters, whatever the item count
+        markdown = "# [Home](/)\n\n* one [a](/a/)\n* two\n* [ ] [b](/b/)\n\n> quoted [c](/c/)"
+        self.assertEqual(
+            page_links(markdown),
+            [
+                ["link", "/", 1, 1],
+                ["link", "/a/", 3, 5],
+                ["link", "/b/", 3, 5],
+                ["link", "/c/", 7, 7],
+            ],
+        )
+        self.assertEqual(page_links("* [a](/a/)\n* [b](/b/)"), [["link", "/a/", 1, 2], ["link", "/b/", 1, 2]])
+
+    def test_resolve(self):
+        self.assertEqual(resolve("/majesty/", "index.html"), "majesty/index.html")
+        self.assertEqual(resolve("/", "posts/a.html"), "index.html")
+        self.assertEqual(resolve("b.html#top", "posts/a.html"), "posts/b.html")
+        self.assertEqual(resolve("../images/x%20y.png", "posts/a.html"), "images/x y.png")
+        for url in ("https://x.org/", "mailto:a@b.c", "//cdn.org/x.js", "#section"):
+            self.assertIsNone(resolve(url, "index.html"))
+
+
+class TestLinkGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.content_dir = os.path.join(self.root, "contents")
+        self.dest_dir = os.path.join(self.root, "public")
+        self.template_path = os.path.join(self.root, "template.html")
+        os.makedirs(os.path.join(self.content_dir, "posts"))
+        self.write(self.template_path, "<head>{{ Prefetch }}</head>{{ Content }}")
+        self.write(
+            os.path.join(self.content_dir, "index.md"), "# Home\n\n[One](/posts/one.html) [Two](/posts/two.html)"
+        )
+        self.write(os.path.join(self.content_dir, "posts", "one.md"), "# One\n\n[Two](two.html) [Home](/)")
+        self.write(os.path.join(self.content_dir, "posts", "two.md"), "# Two\n\n![Missing](/images/gone.png)")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, path, content):
+        with open(path, "w") as f:
+            f.write(content)
+
+    def read(self, relative_path):
+        with open(os.path.join(self.dest_dir, relative_path)) as f:
+            return f.read()
+
+    def build(self, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return generate_pages_recursive(self.content_dir, self.template_path, self.dest_dir, **kwargs)
+
+    def test_broken_links_are_reported_with_their_source_lines(self):
+        self.build()
+        broken = check_links(self.content_dir, load_manifest(self.dest_dir))
+        two = os.path.join(self.content_dir, "posts", "two.md")
+        self.assertEqual(broken, [(two, 3, 3, "image", "/images/gone.png")])
+
+    def test_links_are_recorded_from_fresh_cached_and_parallel_renders(self):
+        self.build()
+        pages = load_manifest(self.dest_dir)["pages"]
+        links = {relative_dest: entry["links"] for relative_dest, entry in pages.items()}
+        self.assertEqual(links["index.html"], [["link", "/posts/one.html", 3, 3], ["link", "/posts/two.html", 3, 3]])
+        cache = open_cache(os.path.join(self.root, "cache"))
+        for kwargs in ({"cache": cache}, {"cache": cache}, {"jobs": 2}):
+            self.build(force=True, **kwargs)
+            pages = load_manifest(self.dest_dir)["pages"]
+            self.assertEqual({relative_dest: entry["links"] for relative_dest, entry in pages.items()}, links)
+        # The second build was served by the render cache
+        self.assertEqual(cache.stats["hit"], 3)
+
+    def test_renaming_a_page_rebuilds_the_pages_linking_to_it(self):
+        self.build()
+        os.rename(os.path.join(self.content_dir, "posts", "two.md"), os.path.join(self.content_dir, "posts", "2.md"))
+        summary = self.build()
+        self.assertEqual(
+            sorted(summary["rebuilt"]), ["index.html", os.path.join("posts", "2.html"), os.path.join("posts", "one.html")]
+        )
+        reasons = load_manifest(self.dest_dir)["reasons"]
+        self.assertEqual(reasons["index.html"], ["linked page /posts/two.html was removed"])
+
+    def test_prefetch_hints_for_the_most_linked_neighbours(self):
+        self.build(prefetch=1)
+        # two.html has two pages linking to it, home one
+        head = self.read("index.html").split("</head>")[0]
+        self.assertEqual(head, '<head><link rel="prefetch" href="/posts/two.html">')
+        self.assertEqual(self.read("posts/two.html").split("</head>")[0], "<head>")
+        self.assertEqual(self.build(prefetch=1)["rebuilt"], [])
+        summary = self.build()
+        self.assertEqual(sorted(summary["rebuilt"]), ["index.html", os.path.join("posts", "one.html")])
+        self.assertEqual(self.read("index.html").split("</head>")[0], "<head>")
+
+
+if __name__ == "__main__":
+    unittest.main()
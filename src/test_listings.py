@@ -0,0 +1,130 @@
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import assets
+import listings
+from extract import generate_pages_recursive
+
+
+def post(number, title=None, tags="[hobbit]"):
+    title = title or f"Post {number}"
+    return f"---\ntitle: {title}\ndate: 2024-0{number}-01\ntags: {tags}\n---\n# Heading\n\nBody {number}\n"
+
+
+class TestListings(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.content_dir = os.path.join(self.root, "contents")
+        self.dest_dir = os.path.join(self.root, "public")
+        self.template_path = os.path.join(self.root, "template.html")
+        os.makedirs(os.path.join(self.content_dir, "posts"))
+        self.write(self.template_path, "<title>{{ Title }}</title>{{ Content }}")
+        self.write(os.path.join(self.content_dir, "index.md"), "# Home\n\nWelcome")
+        for number in (1, 2, 3):
+            self.write_post(number, post(number))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, path, content):
+        with open(path, "w") as f:
+            f.write(content)
+
+    def write_post(self, number, content):
+        self.write(os.path.join(self.content_dir, "posts", f"p{number}.md"), content)
+
+    def read(self, relative_path):
+        with open(os.path.join(self.dest_dir, relative_path)) as f:
+            return f.read()
+
+    def build(self, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_pages_recursive(self.content_dir, self.template_path, self.dest_dir)
+        kwargs.setdefault("page_size", 2)
+        return listings.generate_listings(self.content_dir, self.template_path, self.dest_dir, **kwargs)
+
+    def test_sections_tags_and_archive_are_paginated(self):
+        stats = self.build()
+        archive = self.read("archive/index.html")
+        self.assertIn("<title>Archive (page 1 of 2)</title>", archive)
+        self.assertLess(archive.index("/posts/p3.html"), archive.index("/posts/p2.html"))
+        self.assertIn('<a href="/archive/page/2/" rel="next">Older</a>', archive)
+        self.assertIn("/posts/p1.html", self.read("archive/page/2/index.html"))
+        self.assertIn("/posts/p3.html", self.read("posts/index.html"))
+        self.assertIn('<a href="/tags/hobbit/">hobbit (3)</a>', self.read("tags/index.html"))
+        self.assertIn("/posts/p1.html", self.read("tags/hobbit/page/2/index.html"))
+        self.assertEqual(stats["written"], 7)
+
+    def test_tags_with_the_same_slug_get_separate_pages(self):
+        slugs = listings.tag_slugs(["C++", "C#", "hobbit"])
+        self.assertEqual(slugs["hobbit"], "hobbit")
+        self.assertNotEqual(slugs["C++"], slugs["C#"])
+        self.assertTrue(slugs["C++"].startswith("c-") and slugs["C#"].startswith("c-"))
+        self.write_post(1, post(1, tags="[C++]"))
+        self.write_post(2, post(2, tags="[C#]"))
+        self.build()
+        self.assertIn("/posts/p1.html", self.read(f"tags/{slugs['C++']}/index.html"))
+        self.assertIn("/posts/p2.html", self.read(f"tags/{slugs['C#']}/index.html"))
+
+    def test_page_size_must_be_positive(self):
+        self.assertEqual(listings.parse_page_size("5"), 5)
+        for value in ("0", "-1", "ten"):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                listings.parse_page_size(value)
+
+    def test_only_listings_whose_entries_changed_are_rewritten(self):
+        self.build()
+        self.assertEqual(self.build()["written"], 0)
+        # Post 1 is on the second page of every listing
+        self.write_post(1, post(1, title="Renamed"))
+        stats = self.build()
+        self.assertEqual(sorted(stats["urls"]), ["/archive/page/2/", "/posts/page/2/", "/tags/hobbit/page/2/"])
+        self.assertIn("Renamed", self.read("posts/page/2/index.html"))
+
+    def test_listings_rebuild_when_template_fingerprints_change(self):
+        self.addCleanup(assets.configure, None)
+        self.write(self.template_path, '<link href="/index.css"><title>{{ Title }}</title>{{ Content }}')
+        assets.configure({"/index.css": "/index.11111111.css"})
+        self.build()
+        assets.configure({"/index.css": "/index.22222222.css"})
+        self.assertEqual(self.build()["written"], 7)
+        self.assertIn('href="/index.22222222.css"', self.read("archive/index.html"))
+
+    def test_dropped_listings_are_removed_and_hand_written_pages_win(self):
+        self.build()
+        self.write_post(3, post(3, tags="[]"))
+        self.write(os.path.join(self.content_dir, "posts", "index.md"), "# All posts\n\nHand written")
+        stats = self.build()
+        # Two hobbit posts fit on one page now
+        self.assertFalse(os.path.exists(os.path.join(self.dest_dir, "tags", "hobbit", "page")))
+        self.assertIn("Hand written", self.read("posts/index.html"))
+        self.assertEqual(stats["removed"], 2)
+
+    def test_sitemap_and_feed(self):
+        self.build(listings=False, site_url="https://example.org/")
+        sitemap = self.read(listings.SITEMAP_FILENAME)
+        self.assertIn("<loc>https://example.org/posts/p2.html</loc><lastmod>2024-02-01</lastmod>", sitemap)
+        self.assertIn("<loc>https://example.org/</loc>", sitemap)
+        feed = self.read(listings.FEED_FILENAME)
+        self.assertIn("<title>Home</title>", feed)
+        self.assertIn("<updated>2024-03-01T00:00:00Z</updated>", feed)
+        self.assertEqual(feed.count("<entry>"), 3)
+        self.assertFalse(os.path.exists(os.path.join(self.dest_dir, "archive")))
+
+    def test_remove_listings(self):
+        self.build(site_url="https://example.org")
+        listings.remove_listings(self.dest_dir)
+        self.assertEqual(
+            sorted(os.listdir(self.dest_dir)), [".build-manifest.json", ".metadata-index.json", "index.html", "posts"]
+        )
+        self.assertEqual(sorted(os.listdir(os.path.join(self.dest_dir, "posts"))), ["p1.html", "p2.html", "p3.html"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import io
+import unittest
+
+from markdown_blocks import (
+    block_type_code,
+    block_type_heading,
+    block_type_paragraph,
+    block_type_ulist,
+    markdown_to_blocks,
+    markdown_to_html_node,
+    scan_blocks,
+)
+
+
+class TestScanBlocks(unittest.TestCase):
+
+    def test_blocks_and_line_spans(self):
+        markdown = "# Title\n\nSome **bold**\ntext\n\n\n- one\n- two\n"
+        blocks = list(scan_blocks(markdown))
+        self.assertEqual(
+            [(block.block_type, block.start_line, block.end_line) for block in blocks],
+            [(block_type_heading, 1, 1), (block_type_paragraph, 3, 4), (block_type_ulist, 7, 8)],
+        )
+        self.assertEqual(blocks[1].text, "Some **bold**\ntext")
+
+    def test_matches_split_on_blank_lines(self):
+        markdown = "  # Title  \n\nparagraph\n  indented\n\n\n\n> quote\n> more  "
+        expected = [block.strip() for block in markdown.split("\n\n") if block != ""]
+        self.assertEqual(markdown_to_blocks(markdown), expected)
+
+    def test_fence_keeps_blank_lines(self):
+        markdown = "intro\n\n```\nfirst\n\nsecond\n```\n\noutro"
+        blocks = list(scan_blocks(markdown))
+        self.assertEqual([block.block_type for block in blocks], [block_type_paragraph, block_type_code, block_type_paragraph])
+        self.assertEqual(blocks[1].text, "```\nfirst\n\nsecond\n```")
+        self.assertEqual((blocks[1].start_line, blocks[1].end_line), (3, 7))
+        html = markdown_to_html_node(markdown).to_html()
+        self.assertIn("<pre><code>first\n\nsecond\n</code></pre>", html)
+
+    def test_unclosed_fence_falls_back_to_paragraphs(self):
+        self.assertEqual(markdown_to_blocks("```\nfirst\n\nsecond"), ["```\nfirst", "second"])
+
+    def test_long_closed_fence_stays_code(self):
+        code = ["line"] * 500 + [""] + ["line"] * 500
+        blocks = list(scan_blocks("\n".join(["```"] + code + ["```", "", "after"])))
+        self.assertEqual([block.block_type for block in blocks], [block_type_code, block_type_paragraph])
+        self.assertEqual((blocks[0].start_line, blocks[0].end_line), (1, 1003))
+
+    def test_inline_code_line_is_not_a_fence(self):
+        self.assertEqual(markdown_to_blocks("```code```\n\nafter"), ["```code```", "after"])
+
+    def test_reads_from_an_iterator_of_lines(self):
+        stream = io.StringIO("# Title\r\n\r\nBody text\r\n")
+        self.assertEqual(markdown_to_html_node(stream).to_html(), "<div><h1>Title</h1><p>Body text</p></div>")
+
+    def test_markup_characters_in_text_and_code_are_escaped(self):
+        html = markdown_to_html_node("Fish & <chips>\n\n```\nif a < b:\n```").to_html()
+        self.assertEqual(html, "<div><p>Fish &amp; &lt;chips&gt;</p><pre><code>if a &lt; b:\n</code></pre></div>")
+
+    def test_task_list_checkboxes_stay_markup(self):
+        html = markdown_to_html_node("- [ ] pack <rope>\n- [x] **leave**").to_html()
+        self.assertEqual(
+            html,
+            '<div><ul><li><input type="checkbox" disabled> pack &lt;rope&gt;</li>'
+            '<li><input type="checkbox" checked disabled> <b>leave</b></li></ul></div>',
+        )
+
+    def test_crlf_and_lf_agree(self):
+        markdown = "# Title\n\n* a\n* b\n\n1. x\n2. y"
+        self.assertEqual(
+            markdown_to_html_node(markdown).to_html(),
+            markdown_to_html_node(markdown.replace("\n", "\r\n")).to_html(),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
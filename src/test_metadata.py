@@ -0,0 +1,166 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from extract import generate_pages_recursive, generate_selected_pages
+from markdown_blocks import scan_blocks
+from metadata import MetadataIndex, layout_path, parse_front_matter, read_metadata, split_front_matter
+
+POST = """---
+title: "Riddles in the Dark"
+date: 2024-03-01
+tags: [hobbit, gollum]
+draft: false
+layout: post
+---
+# Chapter Five
+
+Bilbo finds a ring
+"""
+
+
+class TestFrontMatter(unittest.TestCase):
+
+    def test_parse_values(self):
+        fields = parse_front_matter(["title: 'Quoted: yes'", "draft: yes", "tags:", "  - one", "  - two", "# note"])
+        self.assertEqual(fields["title"], "Quoted: yes")
+        self.assertIs(fields["draft"], True)
+        self.assertEqual(fields["tags"], ["one", "two"])
+        self.assertEqual(parse_front_matter(["tags: a, b"])["tags"], ["a", "b"])
+        with self.assertRaises(ValueError):
+            parse_front_matter(["not a field"])
+
+    def test_dates_are_checked_and_sort_as_strings(self):
+        dates = [
+            parse_front_matter([f"date: {value}"])["date"]
+            for value in ("2024-03-01", "2024-03-01T09:30:00+02:00", "2024-02-29 23:00")
+        ]
+        self.assertEqual(dates, ["2024-03-01", "2024-03-01T07:30:00Z", "2024-02-29T23:00:00Z"])
+        self.assertEqual(sorted(dates), [dates[2], dates[0], dates[1]])
+        for value in ("March 1st", "2024-13-01", "2024-3-1"):
+            with self.assertRaisesRegex(ValueError, "Invalid date"):
+                parse_front_matter([f"date: {value}"])
+
+    def test_split_keeps_line_numbers(self):
+        fields, body = split_front_matter(POST)
+        self.assertEqual(fields["tags"], ["hobbit", "gollum"])
+        self.assertEqual(fields["date"], "2024-03-01")
+        blocks = list(scan_blocks(body))
+        self.assertEqual((blocks[0].text, blocks[0].start_line), ("# Chapter Five", 8))
+
+    def test_without_front_matter(self):
+        fields, body = split_front_matter("# Title\n\n---\n")
+        self.assertEqual(body, "# Title\n\n---\n")
+        self.assertEqual((fields["tags"], fields["draft"]), ([], False))
+
+
+class TestMetadataIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, relative_path, content, mode="w"):
+        path = os.path.join(self.root, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, mode) as f:
+            f.write(content)
+        return path
+
+    def test_reads_only_the_header(self):
+        # Bytes past the header aren't valid UTF-8, so reading them would fail
+        path = self.write("post.md", b"# Title\n\n" + b"x" * 100000 + b"\xff\xfe", "wb")
+        self.assertEqual(read_metadata(path)["title"], "Title")
+        path = self.write("other.md", POST.encode("utf-8") + b"x" * 100000 + b"\xff", "wb")
+        self.assertEqual(read_metadata(path)["title"], "Riddles in the Dark")
+
+    def test_entries_are_reused_until_the_file_changes(self):
+        path = self.write("contents/post.md", POST)
+        public = os.path.join(self.root, "public")
+        index = MetadataIndex(public)
+        index.get(path, "post.md")
+        index.save()
+        index = MetadataIndex(public)
+        self.assertEqual(index.get(path, "post.md")["layout"], "post")
+        self.assertEqual(index.stats, {"read": 0, "reused": 1})
+        self.write("contents/post.md", POST.replace("draft: false", "draft: true"))
+        self.assertIs(index.get(path, "post.md")["draft"], True)
+        self.assertEqual(index.stats["read"], 1)
+
+    def test_layout_path(self):
+        template_path = self.write("template.html", "{{ Content }}")
+        self.write("template.post.html", "{{ Content }}")
+        self.assertEqual(layout_path(template_path, None), template_path)
+        self.assertEqual(layout_path(template_path, "post"), os.path.join(self.root, "template.post.html"))
+        with self.assertRaises(ValueError):
+            layout_path(template_path, "../template")
+        with self.assertRaises(ValueError):
+            layout_path(template_path, "missing")
+
+
+class TestFrontMatterPages(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.content_dir = os.path.join(self.root, "contents")
+        self.dest_dir = os.path.join(self.root, "public")
+        self.template_path = os.path.join(self.root, "template.html")
+        os.makedirs(os.path.join(self.content_dir, "posts"))
+        self.write(self.template_path, "<title>{{ Title }}</title>{{ Content }}")
+        self.write(os.path.join(self.root, "template.post.html"), "<h1>{{ Title }}</h1><p>{{ Date }} {{ Tags }}</p>")
+        self.write(os.path.join(self.content_dir, "index.md"), "# Home\n\nWelcome")
+        self.post_path = os.path.join(self.content_dir, "posts", "riddles.md")
+        self.write(self.post_path, POST)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, path, content):
+        with open(path, "w") as f:
+            f.write(content)
+
+    def read(self, relative_path):
+        with open(os.path.join(self.dest_dir, relative_path)) as f:
+            return f.read()
+
+    def build(self, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return generate_pages_recursive(self.content_dir, self.template_path, self.dest_dir, **kwargs)
+
+    def test_layout_title_date_and_tags(self):
+        self.build()
+        self.assertEqual(
+            self.read("posts/riddles.html"), "<h1>Riddles in the Dark</h1><p>2024-03-01 hobbit, gollum</p>"
+        )
+        self.assertEqual(self.read("index.html"), "<title>Home</title><div><h1>Home</h1><p>Welcome</p></div>")
+
+    def test_drafts_are_left_out_unless_asked_for(self):
+        self.write(self.post_path, POST.replace("draft: false", "draft: true"))
+        summary = self.build()
+        self.assertEqual(summary["drafts"], ["posts/riddles.html"])
+        self.assertFalse(os.path.exists(os.path.join(self.dest_dir, "posts", "riddles.html")))
+        summary = self.build(drafts=True)
+        self.assertEqual(summary["rebuilt"], ["posts/riddles.html"])
+
+    def test_page_turning_into_a_draft_loses_its_output(self):
+        self.build()
+        self.write(self.post_path, POST.replace("draft: false", "draft: true"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            summary = generate_selected_pages(self.content_dir, self.template_path, self.dest_dir, [self.post_path])
+        self.assertEqual(summary["drafts"], ["posts/riddles.html"])
+        self.assertFalse(os.path.exists(os.path.join(self.dest_dir, "posts", "riddles.html")))
+
+    def test_bad_front_matter_fails_the_page(self):
+        self.write(self.post_path, POST.replace("layout: post", "layout: missing"))
+        summary = self.build()
+        self.assertEqual(summary["failed"], [("posts/riddles.html", "ValueError: Layout not found: missing")])
+        self.assertEqual(summary["rebuilt"], ["index.html"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from precompress import accepts_gzip, fresh_gzip_path, precompress_outputs, remove_precompressed
+
+
+class TestPrecompress(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.html = "<p>" + "the road goes ever on and on " * 100 + "</p>"
+        self.write("index.html", self.html)
+        self.write("small.css", "p{}")
+        self.write("image.png", "x" * 4096)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, relative_path, content):
+        with open(os.path.join(self.root, relative_path), "w") as f:
+            f.write(content)
+
+    def test_writes_gzip_for_large_text_outputs(self):
+        stats = precompress_outputs(self.root, min_size=1024)
+        self.assertEqual(stats["written"], 1)
+        self.assertEqual(sorted(f for f in os.listdir(self.root) if f.endswith(".gz")), ["index.html.gz"])
+        with gzip.open(os.path.join(self.root, "index.html.gz"), "rt") as f:
+            self.assertEqual(f.read(), self.html)
+        files, size, compressed_size = stats["types"][".html"]
+        self.assertEqual((files, size), (1, len(self.html)))
+        self.assertLess(compressed_size, size)
+
+    def test_unchanged_outputs_are_skipped(self):
+        precompress_outputs(self.root)
+        with open(os.path.join(self.root, "index.html.gz"), "rb") as f:
+            first = f.read()
+        # Rewritten with the same bytes, as a forced rebuild would
+        self.write("index.html", self.html)
+        stats = precompress_outputs(self.root)
+        self.assertEqual((stats["written"], stats["unchanged"]), (0, 1))
+        with open(os.path.join(self.root, "index.html.gz"), "rb") as f:
+            self.assertEqual(f.read(), first)
+        self.assertIsNotNone(fresh_gzip_path(os.path.join(self.root, "index.html")))
+
+    def test_stale_gzip_is_removed(self):
+        precompress_outputs(self.root)
+        os.remove(os.path.join(self.root, "index.html"))
+        stats = precompress_outputs(self.root)
+        self.assertEqual(stats["removed"], 1)
+        self.assertFalse(os.path.exists(os.path.join(self.root, "index.html.gz")))
+
+    def test_remove_when_switched_off(self):
+        precompress_outputs(self.root)
+        self.assertEqual(remove_precompressed(self.root), 1)
+        self.assertEqual(remove_precompressed(self.root), 0)
+
+    def test_rewritten_output_makes_gzip_stale(self):
+        precompress_outputs(self.root)
+        path = os.path.join(self.root, "index.html")
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertIsNone(fresh_gzip_path(path))
+
+    def test_accepts_gzip(self):
+        self.assertTrue(accepts_gzip("gzip, deflate, br"))
+        self.assertTrue(accepts_gzip("br;q=1.0, gzip;q=0.8"))
+        self.assertTrue(accepts_gzip("*"))
+        self.assertFalse(accepts_gzip("gzip;q=0"))
+        self.assertFalse(accepts_gzip("identity"))
+        self.assertFalse(accepts_gzip(""))
+
+
+if __name__ == "__main__":
+    unittest.main()
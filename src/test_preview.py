@@ -0,0 +1,124 @@
+import asyncio
+import http.client
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from preview import PreviewServer
+from static_server import start_server
+
+
+class TestPreviewServer(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.static_dir = os.path.join(self.root, "static")
+        self.content_dir = os.path.join(self.root, "contents")
+        self.template_path = os.path.join(self.root, "template.html")
+        os.makedirs(os.path.join(self.root, "partials"))
+        os.makedirs(os.path.join(self.content_dir, "majesty"))
+        os.makedirs(self.static_dir)
+        self.write("template.html", "<title>{{ Title }}</title>{{ Content }}{{ include footer.html }}")
+        self.write("partials/footer.html", "<footer>v1</footer>")
+        self.write("contents/index.md", "# Home\n\nWelcome")
+        self.write("contents/majesty/index.md", "# Majesty\n\nThe road goes ever on")
+        self.write("static/index.css", "body { color: #c9d1d9; }")
+        self.loop = asyncio.new_event_loop()
+        self.server = PreviewServer(self.static_dir, self.content_dir, self.template_path)
+        listener = self.loop.run_until_complete(start_server(self.server, 0, "127.0.0.1"))
+        self.port = listener.sockets[0].getsockname()[1]
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        tasks = asyncio.all_tasks(self.loop)
+        for task in tasks:
+            task.cancel()
+
+        async def finish():
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        self.loop.run_until_complete(finish())
+        self.loop.close()
+        self.server.renderer.shutdown()
+        shutil.rmtree(self.root)
+
+    def write(self, relative_path, text, mtime_ns=None):
+        path = os.path.join(self.root, relative_path)
+        with open(path, "w") as f:
+            f.write(text)
+        if mtime_ns is not None:
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+
+    def get(self, path):
+        connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        connection.request("GET", path)
+        response = connection.getresponse()
+        body = response.read()
+        connection.close()
+        return response, body
+
+    def stats(self):
+        return json.loads(self.get("/__stats")[1])
+
+    def test_pages_render_on_request_and_are_reused(self):
+        response, body = self.get("/majesty/")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(
+            body, b"<title>Majesty</title><div><h1>Majesty</h1><p>The road goes ever on</p></div><footer>v1</footer>"
+        )
+        self.get("/majesty/")
+        stats = self.stats()
+        self.assertEqual((stats["pages_rendered"], stats["pages_reused"]), (1, 1))
+        self.assertIn(b"Welcome", self.get("/")[1])
+
+    def test_concurrent_requests_for_a_page_share_one_render(self):
+        render = self.server.render
+
+        def slow_render(source_path, url_path):
+            time.sleep(0.2)
+            return render(source_path, url_path)
+
+        self.server.render = slow_render
+        bodies = []
+        threads = [threading.Thread(target=lambda: bodies.append(self.get("/majesty/")[1])) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(bodies)), 1)
+        self.assertIn(b"The road goes ever on", bodies[0])
+        stats = self.stats()
+        self.assertEqual((stats["pages_rendered"], stats["pages_reused"]), (1, 2))
+
+    def test_edited_source_or_partial_renders_again(self):
+        self.get("/majesty/")
+        self.write("contents/majesty/index.md", "# Majesty\n\nEdited", 10**18)
+        self.assertIn(b"<p>Edited</p>", self.get("/majesty/")[1])
+        self.write("partials/footer.html", "<footer>v2</footer>", 10**18)
+        self.assertIn(b"<footer>v2</footer>", self.get("/majesty/")[1])
+        self.assertEqual(self.stats()["pages_rendered"], 3)
+
+    def test_static_files_redirects_and_missing_pages(self):
+        response, body = self.get("/index.css")
+        self.assertEqual(body, b"body { color: #c9d1d9; }")
+        response, body = self.get("/majesty")
+        self.assertEqual((response.status, response.getheader("Location")), (301, "/majesty/"))
+        self.assertEqual(self.get("/missing/")[0].status, 404)
+        self.assertEqual(self.get("/../template.html")[0].status, 404)
+
+    def test_render_errors_are_shown(self):
+        self.write("contents/broken.md", "# Broken\n\n{{ include missing.html }}")
+        response, body = self.get("/broken.html")
+        self.assertEqual(response.status, 500)
+        self.assertIn(b"Include not found: missing.html", body)
+
+
+if __name__ == "__main__":
+    unittest.main()
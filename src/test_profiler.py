@@ -0,0 +1,51 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import profiler
+
+
+class TestProfiler(unittest.TestCase):
+
+    def tearDown(self):
+        profiler.stop()
+
+    def test_stage_is_a_no_op_when_inactive(self):
+        self.assertIs(profiler.stage("parse", "/"), profiler.NULL_STAGE)
+        with profiler.stage("parse", "/"):
+            pass
+
+    def test_records_stages_per_page(self):
+        active = profiler.start()
+        with profiler.stage("parse", "/"):
+            pass
+        with profiler.stage("render+write", "/"):
+            pass
+        with profiler.stage("parse", "/majesty/"):
+            pass
+        self.assertIs(profiler.stop(), active)
+        self.assertEqual(sorted(active.page_totals()), ["/", "/majesty/"])
+        self.assertEqual(active.stage_totals()["parse"][2], 2)
+        self.assertIn("Slowest 2 pages", active.format_report(top=5))
+
+    def test_writes_chrome_trace(self):
+        active = profiler.start()
+        with profiler.stage("sync_static"):
+            pass
+        root = tempfile.mkdtemp()
+        try:
+            path = os.path.join(root, "trace.json")
+            active.write_trace(path)
+            with open(path) as f:
+                trace = json.load(f)
+        finally:
+            shutil.rmtree(root)
+        event = trace["traceEvents"][0]
+        self.assertEqual((event["name"], event["ph"], event["cat"]), ("sync_static", "X", "build"))
+        self.assertIn("dur", event)
+
+
+if __name__ == "__main__":
+    unittest.main()
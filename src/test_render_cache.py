@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from extract import generate_pages_recursive
+from render_cache import DirectoryBackend, RenderCache, make_cache_server, open_cache, parse_size
+
+
+class TestRenderCache(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.root, "cache")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_round_trip_and_stats(self):
+        cache = open_cache(self.cache_dir)
+        self.assertEqual(cache.lookup(b"# Home"), ("miss", None))
+        links = [["link", "/", 3, 3]]
+        self.assertTrue(cache.store(b"# Home", "Home", "<div><h1>Home</h1></div>", links, {"assets": "3f2a"}))
+        self.assertEqual(
+            cache.lookup(b"# Home"), ("hit", ("Home", "<div><h1>Home</h1></div>", links, {"assets": "3f2a"}))
+        )
+        cache.record("hit")
+        cache.record("miss")
+        self.assertIn("1 hits, 1 misses (50% hit rate)", cache.format_stats())
+
+    def test_lru_eviction(self):
+        backend = DirectoryBackend(self.cache_dir, max_bytes=250)
+        cache = RenderCache(backend)
+        for i in range(3):
+            cache.store(f"page {i}".encode(), "Title", "x" * 60)
+            # Distinct mtimes so the LRU order is unambiguous
+            time.sleep(0.01)
+        cache.lookup(b"page 0")
+        cache.finish()
+        self.assertEqual(cache.stats["evicted"], 1)
+        self.assertEqual(cache.lookup(b"page 1"), ("miss", None))
+        self.assertEqual(cache.lookup(b"page 0")[0], "hit")
+
+    def test_eviction_waits_until_the_cache_is_over_its_limit(self):
+        backend = DirectoryBackend(self.cache_dir, max_bytes=250)
+        self.assertEqual(backend.evict_if_full(), 0)
+        for i in range(3):
+            backend.put(f"{i:064x}", b"x" * 80)
+            time.sleep(0.01)
+        self.assertEqual((backend.size, backend.evict_if_full()), (240, 0))
+        backend.put(f"{3:064x}", b"x" * 80)
+        # Trimmed below the limit, so the next store doesn't scan again
+        self.assertEqual(backend.evict_if_full(), 2)
+        self.assertEqual(backend.size, 160)
+        self.assertIsNone(backend.get(f"{0:064x}"))
+
+    def test_http_backend_against_stand_in_server(self):
+        httpd = make_cache_server(self.cache_dir, port=0, bind="127.0.0.1")
+        thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+        thread.start()
+        try:
+            cache = open_cache(f"http://127.0.0.1:{httpd.server_address[1]}")
+            self.assertEqual(cache.lookup(b"# Home"), ("miss", None))
+            cache.store(b"# Home", "Home", "<h1>Home</h1>")
+            self.assertEqual(cache.lookup(b"# Home"), ("hit", ("Home", "<h1>Home</h1>", [], {})))
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+
+    def test_unreachable_server_is_an_error_not_a_failure(self):
+        cache = open_cache("http://127.0.0.1:9/")
+        self.assertEqual(cache.lookup(b"# Home"), ("error", None))
+        self.assertFalse(cache.store(b"# Home", "Home", "<h1>Home</h1>"))
+
+    def test_cached_build_matches_uncached_build(self):
+        content_dir = os.path.join(self.root, "contents")
+        os.makedirs(content_dir)
+        with open(os.path.join(content_dir, "index.md"), "w") as f:
+            f.write("# Home\n\nSome **bold** [link](/majesty)")
+        template_path = os.path.join(self.root, "template.html")
+        with open(template_path, "w") as f:
+            f.write("<title>{{ Title }}</title>{{ Content }}")
+
+        outputs = []
+        for name in ("plain", "cold", "warm"):
+            dest_dir = os.path.join(self.root, name)
+            cache = None if name == "plain" else open_cache(self.cache_dir)
+            generate_pages_recursive(content_dir, template_path, dest_dir, cache=cache)
+            if cache is not None:
+                expected = {"cold": "miss", "warm": "hit"}[name]
+                self.assertEqual(cache.stats[expected], 1)
+            with open(os.path.join(dest_dir, "index.html")) as f:
+                outputs.append(f.read())
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertEqual(outputs[0], outputs[2])
+
+    def test_parse_size(self):
+        self.assertEqual(parse_size("512"), 512)
+        self.assertEqual(parse_size("2K"), 2048)
+        self.assertEqual(parse_size("1.5GB"), int(1.5 * 1024 ** 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
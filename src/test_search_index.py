@@ -0,0 +1,122 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import search_index
+from extract import generate_pages_recursive, generate_selected_pages
+from search_index import page_terms
+
+
+class TestPageTerms(unittest.TestCase):
+
+    def test_headings_weigh_more_and_code_is_left_out(self):
+        terms = page_terms("# The Ring\n\nOne **ring** to rule them\n\n```\nring = 1\n```")
+        self.assertEqual(terms["ring"], search_index.HEADING_WEIGHT + 1)
+        self.assertEqual(terms["rule"], 1)
+        self.assertNotIn("the", terms)
+        self.assertNotIn("1", terms)
+
+    def test_markers_links_and_images(self):
+        terms = page_terms("* [Mordor](/mordor/) walk\n\n1. shire ![hobbit hole](/hole.png)\n\n> quoted lines")
+        self.assertEqual(terms["mordor"], 1)
+        self.assertIn("shire", terms)
+        self.assertIn("quoted", terms)
+        self.assertNotIn("hobbit", terms)
+
+
+class TestSearchIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.content_dir = os.path.join(self.root, "contents")
+        self.dest_dir = os.path.join(self.root, "public")
+        self.template_path = os.path.join(self.root, "template.html")
+        os.makedirs(os.path.join(self.content_dir, "blog"))
+        self.write(self.template_path, "<title>{{ Title }}</title>{{ Content }}")
+        self.write(os.path.join(self.content_dir, "index.md"), "# Home\n\nWelcome to the shire")
+        self.write(os.path.join(self.content_dir, "blog", "index.md"), "# Blog\n\nShire news and mordor news")
+        search_index.configure(True)
+
+    def tearDown(self):
+        search_index.configure(False)
+        shutil.rmtree(self.root)
+
+    def write(self, path, content):
+        with open(path, "w") as f:
+            f.write(content)
+
+    def build(self, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return generate_pages_recursive(self.content_dir, self.template_path, self.dest_dir, **kwargs)
+
+    def read(self, name):
+        with open(os.path.join(self.dest_dir, search_index.SEARCH_DIR, name)) as f:
+            return json.load(f)
+
+    def lookup(self, term):
+        pages = self.read(search_index.PAGES_FILENAME)
+        try:
+            postings = self.read(term[:search_index.PREFIX_LENGTH] + ".json").get(term, [])
+        except FileNotFoundError:
+            return []
+        return [(pages[page_id][0], weight) for page_id, weight in postings]
+
+    def test_shards_by_prefix(self):
+        summary = self.build()
+        self.assertEqual(summary["search"]["pages"], 2)
+        self.assertEqual(self.lookup("shire"), [("/blog/", 1), ("/", 1)])
+        self.assertEqual(self.lookup("news"), [("/blog/", 2)])
+        self.assertEqual(self.lookup("blog"), [("/blog/", search_index.HEADING_WEIGHT)])
+        self.assertEqual(self.read(search_index.PAGES_FILENAME)[0], ["/blog/", "Blog"])
+
+    def test_only_changed_pages_and_shards_are_updated(self):
+        self.build()
+        self.write(os.path.join(self.content_dir, "index.md"), "# Home\n\nWelcome to the shire, and rivendell")
+        summary = self.build()
+        self.assertEqual(summary["search"]["indexed"], 1)
+        # pages.json is unchanged; only the new term's shard is written
+        self.assertEqual(summary["search"]["written"], 1)
+        self.assertEqual(self.lookup("rivendell"), [("/", 1)])
+
+    def test_deleted_page_leaves_the_index(self):
+        self.build()
+        os.remove(os.path.join(self.content_dir, "blog", "index.md"))
+        summary = self.build()
+        self.assertEqual(self.lookup("news"), [])
+        # blog, mordor and news only appeared on the deleted page
+        self.assertEqual(summary["search"]["removed"], 3)
+        self.assertFalse(os.path.exists(os.path.join(self.dest_dir, search_index.SEARCH_DIR, "ne.json")))
+
+    def test_pages_built_before_the_index_are_read_from_source(self):
+        search_index.configure(False)
+        self.build()
+        search_index.configure(True)
+        summary = self.build()
+        self.assertEqual(summary["rebuilt"], [])
+        self.assertEqual(summary["search"]["indexed"], 2)
+        self.assertEqual(self.lookup("mordor"), [("/blog/", 1)])
+
+    def test_parallel_build_and_selected_pages(self):
+        self.build(jobs=2)
+        blog_path = os.path.join(self.content_dir, "blog", "index.md")
+        self.write(blog_path, "# Blog\n\nGondor news")
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_selected_pages(self.content_dir, self.template_path, self.dest_dir, [blog_path])
+        self.assertEqual(self.lookup("gondor"), [("/blog/", 1)])
+        self.assertEqual(self.lookup("mordor"), [])
+
+    def test_remove_index_keeps_pages_under_search(self):
+        os.makedirs(os.path.join(self.content_dir, "search"))
+        self.write(os.path.join(self.content_dir, "search", "index.md"), "# Search\n\nFind things")
+        self.build()
+        search_index.remove_index(self.dest_dir)
+        self.assertEqual(os.listdir(os.path.join(self.dest_dir, search_index.SEARCH_DIR)), ["index.html"])
+        self.assertFalse(os.path.exists(os.path.join(self.dest_dir, search_index.STATE_FILENAME)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+import shards
+from extract import find_pages, generate_pages_recursive
+from manifest import load_manifest
+
+COUNT = 3
+
+
+def build_shard(content_dir, template_path, shard_dir_path, index):
+    # Runs in its own process, standing in for one machine
+    with contextlib.redirect_stdout(io.StringIO()):
+        summary = generate_pages_recursive(content_dir, template_path, shard_dir_path, shard=(index, COUNT))
+    return summary["rebuilt"]
+
+
+class TestShards(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.content_dir = os.path.join(self.root, "contents")
+        self.template_path = os.path.join(self.root, "template.html")
+        self.shards_dir = os.path.join(self.root, "shards")
+        self.dest_dir = os.path.join(self.root, "public")
+        os.makedirs(os.path.join(self.content_dir, "posts"))
+        self.write(self.template_path, "<title>{{ Title }}</title>{{ Content }}")
+        self.write(os.path.join(self.content_dir, "index.md"), "# Home\n\nWelcome")
+        for number in range(12):
+            self.write_post(number, f"# Post {number}\n\n" + "words " * (number * 40))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, path, content):
+        with open(path, "w") as f:
+            f.write(content)
+
+    def write_post(self, number, content):
+        self.write(os.path.join(self.content_dir, "posts", f"p{number}.md"), content)
+
+    def build_shards(self):
+        with ProcessPoolExecutor(COUNT) as executor:
+            futures = [
+                executor.submit(
+                    build_shard,
+                    self.content_dir,
+                    self.template_path,
+                    shards.shard_dir(self.shards_dir, index, COUNT),
+                    index,
+                )
+                for index in range(1, COUNT + 1)
+            ]
+            return [future.result() for future in futures]
+
+    def test_split_is_deterministic_complete_and_balanced(self):
+        pages = find_pages(self.content_dir, self.dest_dir)
+        assigned = shards.assign_shards(pages, self.content_dir, COUNT)
+        self.assertEqual(assigned, shards.assign_shards(list(reversed(pages)), self.content_dir, COUNT))
+        self.assertEqual(set(assigned), set(pages))
+        loads = [0] * COUNT
+        for (from_path, dest_path), index in assigned.items():
+            loads[index - 1] += os.path.getsize(from_path)
+        biggest = max(os.path.getsize(from_path) for from_path, dest_path in pages)
+        self.assertLessEqual(max(loads) - min(loads), 2 * biggest)
+
+    def test_merged_shards_match_a_single_build(self):
+        rebuilt = self.build_shards()
+        self.assertEqual(sum(len(pages) for pages in rebuilt), 13)
+        summary = shards.merge_shards(self.shards_dir, self.dest_dir)
+        self.assertEqual((len(summary["copied"]), summary["failed"]), (13, []))
+
+        single_dir = os.path.join(self.root, "single")
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_pages_recursive(self.content_dir, self.template_path, single_dir)
+        self.assertEqual(load_manifest(self.dest_dir)["pages"], load_manifest(single_dir)["pages"])
+        for relative_dest in load_manifest(single_dir)["pages"]:
+            with open(os.path.join(self.dest_dir, relative_dest)) as merged, open(
+                os.path.join(single_dir, relative_dest)
+            ) as single:
+                self.assertEqual(merged.read(), single.read())
+
+    def test_merging_again_copies_only_what_changed(self):
+        self.build_shards()
+        shards.merge_shards(self.shards_dir, self.dest_dir)
+        self.write_post(3, "# Post three\n\nEdited")
+        os.remove(os.path.join(self.content_dir, "posts", "p5.md"))
+        self.build_shards()
+        summary = shards.merge_shards(self.shards_dir, self.dest_dir)
+        self.assertIn(os.path.join("posts", "p3.html"), summary["copied"])
+        self.assertEqual(summary["deleted"], [os.path.join("posts", "p5.html")])
+        self.assertFalse(os.path.exists(os.path.join(self.dest_dir, "posts", "p5.html")))
+        with open(os.path.join(self.dest_dir, "posts", "p3.html")) as f:
+            self.assertIn("Edited", f.read())
+
+    def test_incomplete_split_is_refused(self):
+        build_shard(self.content_dir, self.template_path, shards.shard_dir(self.shards_dir, 1, COUNT), 1)
+        with self.assertRaisesRegex(ValueError, "Missing shard"):
+            shards.merge_shards(self.shards_dir, self.dest_dir)
+        self.assertEqual(shards.parse_shard("2/3"), (2, 3))
+        with self.assertRaises(argparse.ArgumentTypeError):
+            shards.parse_shard("4/3")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,205 @@
+import asyncio
+import gzip
+import http.client
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import static_server
+from livereload import LiveReload
+from static_server import FileCache, StaticServer, parse_range, start_server
+
+
+class TestStaticServer(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.root, "majesty"))
+        self.page = b"<html><body><p>" + b"one ring " * 200 + b"</p></body></html>"
+        self.write("majesty/index.html", self.page)
+        self.write("index.css", b"body { color: #c9d1d9; }")
+        self.large = os.urandom(static_server.SMALL_FILE_SIZE * 3)
+        self.write("large.png", self.large)
+        self.livereload = None
+        self.loop = None
+
+    def tearDown(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            # Connections still waiting for a keep-alive request
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+
+            async def finish():
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+            self.loop.run_until_complete(finish())
+            self.loop.close()
+        shutil.rmtree(self.root)
+
+    def write(self, relative_path, data):
+        with open(os.path.join(self.root, relative_path), "wb") as f:
+            f.write(data)
+
+    def connect(self):
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+            server = StaticServer(self.root, self.livereload)
+            listener = self.loop.run_until_complete(start_server(server, 0, "127.0.0.1"))
+            self.port = listener.sockets[0].getsockname()[1]
+            self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+            self.thread.start()
+        return http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+
+    def get(self, connection, path, headers=None, method="GET"):
+        connection.request(method, path, headers=headers or {})
+        response = connection.getresponse()
+        return response, response.read()
+
+    def test_keep_alive_serves_several_requests_on_one_connection(self):
+        connection = self.connect()
+        response, body = self.get(connection, "/majesty/")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, self.page)
+        self.assertEqual(response.getheader("Content-Type"), "text/html; charset=utf-8")
+        sock = connection.sock
+        response, body = self.get(connection, "/index.css")
+        self.assertEqual(body, b"body { color: #c9d1d9; }")
+        self.assertIs(connection.sock, sock)
+
+    def test_large_file_goes_out_with_sendfile(self):
+        connection = self.connect()
+        response, body = self.get(connection, "/large.png")
+        self.assertEqual(body, self.large)
+        response, body = self.get(connection, "/__stats")
+        self.assertEqual(json.loads(body)["sendfile_responses"], 1)
+
+    def test_etag_and_last_modified_give_304(self):
+        connection = self.connect()
+        response, body = self.get(connection, "/index.css")
+        etag = response.getheader("ETag")
+        response, body = self.get(connection, "/index.css", {"If-None-Match": etag})
+        self.assertEqual((response.status, body), (304, b""))
+        last_modified = response.getheader("Last-Modified")
+        response, body = self.get(connection, "/index.css", {"If-Modified-Since": last_modified})
+        self.assertEqual(response.status, 304)
+
+    def test_range_requests(self):
+        connection = self.connect()
+        response, body = self.get(connection, "/large.png", {"Range": "bytes=100-199"})
+        self.assertEqual(response.status, 206)
+        self.assertEqual(body, self.large[100:200])
+        self.assertEqual(response.getheader("Content-Range"), f"bytes 100-199/{len(self.large)}")
+        response, body = self.get(connection, "/index.css", {"Range": "bytes=-6"})
+        self.assertEqual(body, b"1d9; }")
+        response, body = self.get(connection, "/index.css", {"Range": "bytes=5000-"})
+        self.assertEqual(response.status, 416)
+
+    def test_head_has_headers_but_no_body(self):
+        connection = self.connect()
+        response, body = self.get(connection, "/large.png", method="HEAD")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader("Content-Length"), str(len(self.large)))
+        self.assertEqual(body, b"")
+
+    def test_precompressed_sibling(self):
+        self.write("majesty/index.html.gz", gzip.compress(self.page))
+        connection = self.connect()
+        response, body = self.get(connection, "/majesty/", {"Accept-Encoding": "gzip"})
+        self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+        self.assertEqual(gzip.decompress(body), self.page)
+        response, body = self.get(connection, "/majesty/")
+        self.assertIsNone(response.getheader("Content-Encoding"))
+        self.assertEqual(response.getheader("Vary"), "Accept-Encoding")
+
+    def test_only_fingerprinted_assets_are_immutable(self):
+        self.write("index.0123abcd.css", b"body { color: #c9d1d9; }")
+        self.write("release.20240101.css", b"body {}")
+        self.write("asset-manifest.json", json.dumps({"/index.css": "/index.0123abcd.css"}).encode("utf-8"))
+        connection = self.connect()
+        response, body = self.get(connection, "/index.0123abcd.css")
+        self.assertEqual(response.getheader("Cache-Control"), "public, max-age=31536000, immutable")
+        for path in ("/index.css", "/release.20240101.css"):
+            response, body = self.get(connection, path)
+            self.assertIsNone(response.getheader("Cache-Control"))
+
+    def test_redirects_missing_and_outside_paths(self):
+        connection = self.connect()
+        response, body = self.get(connection, "/majesty")
+        self.assertEqual((response.status, response.getheader("Location")), (301, "/majesty/"))
+        response, body = self.get(connection, "/nowhere.html")
+        self.assertEqual(response.status, 404)
+        response, body = self.get(connection, "/%2e%2e/%2e%2e/etc/passwd")
+        self.assertEqual(response.status, 404)
+        response, body = self.get(connection, "/index.css%00.png")
+        self.assertEqual(response.status, 404)
+
+    def test_stats_report_statuses_and_latency(self):
+        connection = self.connect()
+        self.get(connection, "/index.css")
+        self.get(connection, "/nowhere.html")
+        response, body = self.get(connection, "/__stats")
+        stats = json.loads(body)
+        self.assertEqual(stats["requests"], 2)
+        self.assertEqual(stats["statuses"], {"200": 1, "404": 1})
+        self.assertIn("p99", stats["latency_ms"])
+
+    def test_live_reload_injects_script_and_pushes_events(self):
+        self.livereload = LiveReload()
+        connection = self.connect()
+        response, body = self.get(connection, "/majesty/")
+        self.assertIn(b"EventSource", body)
+        self.assertTrue(body.endswith(b"</body></html>"))
+
+        events = self.connect()
+        events.request("GET", "/__livereload?path=/majesty/")
+        response = events.getresponse()
+        self.assertEqual(response.getheader("Content-Type"), "text/event-stream")
+        for _ in range(100):
+            if self.livereload.viewed_pages():
+                break
+            threading.Event().wait(0.01)
+        self.livereload.reload(123.0, {"/majesty/"})
+        self.assertEqual(response.fp.readline(), b'data: {"edited": 123.0}\n')
+        response, body = self.get(connection, "/__livereload/loaded?edited=soon&path=/majesty/")
+        self.assertEqual(response.status, 400)
+
+
+class TestServerHelpers(unittest.TestCase):
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range("bytes=0-9", 100), (0, 9))
+        self.assertEqual(parse_range("bytes=90-", 100), (90, 99))
+        self.assertEqual(parse_range("bytes=-10", 100), (90, 99))
+        self.assertEqual(parse_range("bytes=50-500", 100), (50, 99))
+        self.assertEqual(parse_range("bytes=100-", 100), "unsatisfiable")
+        self.assertIsNone(parse_range("bytes=0-1,5-6", 100))
+        self.assertIsNone(parse_range("items=0-1", 100))
+
+    def test_file_cache_revalidates_and_evicts(self):
+        root = tempfile.mkdtemp()
+        try:
+            cache = FileCache(max_bytes=10)
+            path = os.path.join(root, "a.txt")
+            with open(path, "wb") as f:
+                f.write(b"first")
+            self.assertEqual(cache.read(path, os.stat(path)), b"first")
+            with open(path, "wb") as f:
+                f.write(b"second!")
+            self.assertEqual(cache.read(path, os.stat(path)), b"second!")
+            other = os.path.join(root, "b.txt")
+            with open(other, "wb") as f:
+                f.write(b"12345")
+            cache.read(other, os.stat(other))
+            self.assertEqual(list(cache.entries), [other])
+        finally:
+            shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    unittest.main()
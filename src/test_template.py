@@ -0,0 +1,45 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from template import compile_template, load_template
+
+
+class TestTemplate(unittest.TestCase):
+
+    def test_compile_splits_literals_and_slots(self):
+        template = compile_template("<title>{{ Title }}</title><body>{{ Content }}</body>")
+        self.assertEqual(template.literals, ["<title>", "</title><body>", "</body>"])
+        self.assertEqual(template.slots, ["Title", "Content"])
+
+    def test_render_matches_str_replace(self):
+        text = "<title> {{ Title }} </title>\n<p>{{ Content }}</p>\n{{ Title }}"
+        template = compile_template(text)
+        expected = text.replace("{{ Title }}", "Hi").replace("{{ Content }}", "<b>x</b>")
+        self.assertEqual(template.render({"Title": "Hi", "Content": "<b>x</b>"}), expected)
+
+    def test_unknown_placeholders_are_left_alone(self):
+        template = compile_template("{{ Title }} {{ Nope }}")
+        self.assertEqual(template.render({"Title": "Hi"}), "Hi {{ Nope }}")
+
+    def test_extra_slots(self):
+        template = compile_template("{{Path}}|{{ Date }}|{{ Description }}")
+        self.assertTrue(template.uses("Date"))
+        self.assertEqual(template.render({"Path": "/a/", "Date": "2024-01-01"}), "/a/|2024-01-01|")
+
+    def test_load_template_is_cached_by_hash(self):
+        root = tempfile.mkdtemp()
+        try:
+            first_path = os.path.join(root, "first.html")
+            second_path = os.path.join(root, "second.html")
+            for path in (first_path, second_path):
+                with open(path, "w") as f:
+                    f.write("<h1>{{ Title }}</h1>")
+            self.assertIs(load_template(first_path), load_template(second_path))
+        finally:
+            shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,8 @@
 import unittest
 import sys
 sys.path.append('//wsl.localhost/Ubuntu/home/lazaros/server/public/src')
-from textnode import TextNode
+from htmlnode import LeafNode, RawHTMLNode, escape_text
+from textnode import TextNode, text_node_to_html_node, text_type_bold, text_type_image, text_type_link
 
 class TestTextNode(unittest.TestCase):
     def test_eq(self):
@@ -9,6 +10,43 @@ class TestTextNode(unittest.TestCase):
         node2 = TextNode("This is a text node", "bold")
         self.assertEqual(node, node2)
 
+    def test_string_text_type_is_normalized(self):
+        node = TextNode("This is a text node", "bold")
+        self.assertIs(node.text_type, text_type_bold)
+        self.assertEqual(str(node.text_type), "bold")
+
+    def test_nodes_are_slotted(self):
+        node = TextNode("This is a text node", text_type_bold)
+        self.assertFalse(hasattr(node, "__dict__"))
+        self.assertFalse(hasattr(text_node_to_html_node(node), "__dict__"))
+
+    def test_link_and_image_props(self):
+        link = text_node_to_html_node(TextNode("home", text_type_link, "/"))
+        self.assertEqual(link.props, {"href": "/"})
+        self.assertEqual(link.to_html(), '<a href="/">home</a>')
+        image = text_node_to_html_node(TextNode("elves", text_type_image, "/images/rivendell.png"))
+        self.assertEqual(image.to_html(), '<img src="/images/rivendell.png" alt="elves"></img>')
+
+    def test_text_and_attributes_are_escaped(self):
+        bold = text_node_to_html_node(TextNode("a < b & c", text_type_bold))
+        self.assertEqual(bold.to_html(), "<b>a &lt; b &amp; c</b>")
+        link = text_node_to_html_node(TextNode("<home>", text_type_link, '/?a=1&b="2"'))
+        self.assertEqual(link.to_html(), '<a href="/?a=1&amp;b=&quot;2&quot;">&lt;home&gt;</a>')
+        image = text_node_to_html_node(TextNode('say "friend"', text_type_image, "/door.png"))
+        self.assertEqual(image.to_html(), '<img src="/door.png" alt="say &quot;friend&quot;"></img>')
+        self.assertEqual(LeafNode("p", "x", {"title": "<\"&>"}).to_html(), '<p title="&lt;&quot;&amp;&gt;">x</p>')
+
+    def test_clean_text_is_returned_as_is(self):
+        text = "nothing to escape here"
+        self.assertIs(escape_text(text), text)
+
+    def test_raw_html_is_not_escaped_again(self):
+        self.assertEqual(RawHTMLNode("<p>a &amp; b</p>").to_html(), "<p>a &amp; b</p>")
+
+    def test_invalid_text_type(self):
+        with self.assertRaises(ValueError):
+            text_node_to_html_node(TextNode("text", "underline"))
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
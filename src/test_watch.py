@@ -0,0 +1,195 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import assets
+from copy_directory import sync_static
+from extract import generate_pages_recursive
+from server import SiteBuilder, page_source
+from watch import Watcher
+
+
+class TestWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.page_path = os.path.join(self.root, "index.md")
+        self.write(self.page_path, "# Home")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, path, content):
+        with open(path, "w") as f:
+            f.write(content)
+
+    def test_no_changes(self):
+        watcher = Watcher([self.root])
+        self.assertEqual(watcher.poll(), [])
+
+    def test_added_modified_and_removed_files(self):
+        watcher = Watcher([self.root])
+        new_path = os.path.join(self.root, "new.md")
+        self.write(new_path, "# New")
+        self.write(self.page_path, "# Home, edited")
+        self.assertEqual(sorted(watcher.poll()), sorted([new_path, self.page_path]))
+        os.remove(new_path)
+        self.assertEqual(watcher.poll(), [new_path])
+
+    def test_single_file_path(self):
+        watcher = Watcher([self.page_path])
+        self.write(self.page_path, "# Home, edited again")
+        self.assertEqual(watcher.poll(), [self.page_path])
+
+
+class TestPageSource(unittest.TestCase):
+
+    def test_maps_urls_to_markdown(self):
+        self.assertEqual(page_source("/", "contents"), os.path.join("contents", "index.md"))
+        self.assertEqual(page_source("/majesty/", "contents"), os.path.join("contents", "majesty", "index.md"))
+        self.assertEqual(page_source("/contents.html", "contents"), os.path.join("contents", "contents.md"))
+
+
+class StubLiveReload:
+    # Stands in for LiveReload: a fixed set of viewed pages, and every
+    # reload recorded with the pages rebuilt by the time it was pushed
+    def __init__(self, viewed, rebuilt):
+        self.viewed = viewed
+        self.rebuilt = rebuilt
+        self.reloads = []
+
+    def viewed_pages(self):
+        return set(self.viewed)
+
+    def reload(self, edited, page_paths=None, exclude=()):
+        self.reloads.append((page_paths, set(exclude), self.rebuilt()))
+
+
+class TestSiteBuilder(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.static_dir = os.path.join(self.root, "static")
+        self.dest_dir = os.path.join(self.root, "public")
+        self.content_dir = os.path.join(self.root, "contents")
+        self.template_path = os.path.join(self.root, "template.html")
+        self.partials_dir = os.path.join(self.root, "partials")
+        for directory in (self.static_dir, self.partials_dir, os.path.join(self.content_dir, "posts")):
+            os.makedirs(directory)
+        self.write(self.template_path, '{{ include nav.html }}<link href="/index.css">{{ Content }}')
+        self.write(os.path.join(self.root, "template.post.html"), "<article>{{ Content }}</article>")
+        self.write(os.path.join(self.partials_dir, "nav.html"), "<nav></nav>")
+        self.write(os.path.join(self.partials_dir, "footer.md"), "Footer")
+        self.write(os.path.join(self.static_dir, "index.css"), "body {}")
+        self.write(os.path.join(self.static_dir, "ring.png"), "ring")
+        self.write(os.path.join(self.content_dir, "index.md"), "# Home\n\n{{ include footer.md }}")
+        self.write(os.path.join(self.content_dir, "about.md"), "# About\n\nWho we are")
+        self.write(os.path.join(self.content_dir, "posts", "ring.md"), "# Ring\n\n![ring](/ring.png)")
+
+    def tearDown(self):
+        assets.configure(None)
+        shutil.rmtree(self.root)
+
+    def write(self, path, content):
+        with open(path, "w") as f:
+            f.write(content)
+
+    def build(self, viewed=(), fingerprint=False):
+        # A first build, then every page marked stale so a rebuild shows
+        self.livereload = StubLiveReload(viewed, self.rebuilt)
+        self.builder = SiteBuilder(
+            self.static_dir, self.dest_dir, self.content_dir, self.template_path, self.livereload, fingerprint
+        )
+        with contextlib.redirect_stdout(io.StringIO()):
+            sync_static(self.static_dir, self.dest_dir)
+            self.builder.refresh_assets()
+            generate_pages_recursive(self.content_dir, self.template_path, self.dest_dir)
+        for page in self.pages():
+            self.write(os.path.join(self.dest_dir, page), "stale")
+
+    def pages(self):
+        return sorted(
+            os.path.relpath(os.path.join(root, file), self.dest_dir)
+            for root, dirs, files in os.walk(self.dest_dir)
+            for file in files
+            if file.endswith(".html")
+        )
+
+    def rebuilt(self):
+        rebuilt = []
+        for page in self.pages():
+            with open(os.path.join(self.dest_dir, page)) as f:
+                if f.read() != "stale":
+                    rebuilt.append(page)
+        return rebuilt
+
+    def rebuild(self, *changed):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.builder.rebuild(list(changed))
+        return self.rebuilt()
+
+    def test_edited_page_rebuilds_alone(self):
+        self.build()
+        path = os.path.join(self.content_dir, "about.md")
+        self.write(path, "# About\n\nWho we are now")
+        self.assertEqual(self.rebuild(path), ["about.html"])
+        self.assertEqual(self.livereload.reloads, [])
+
+    def test_template_and_layouts_rebuild_every_page(self):
+        every_page = ["about.html", "index.html", os.path.join("posts", "ring.html")]
+        self.build()
+        self.assertEqual(self.rebuild(self.template_path), every_page)
+        self.build()
+        self.assertEqual(self.rebuild(os.path.join(self.root, "template.post.html")), every_page)
+
+    def test_partials_rebuild_the_pages_including_them(self):
+        self.build()
+        footer = os.path.join(self.partials_dir, "footer.md")
+        self.write(footer, "Footer, edited")
+        self.assertEqual(self.rebuild(footer), ["index.html"])
+        # The template includes the nav, so every page does
+        self.build()
+        self.assertEqual(len(self.rebuild(os.path.join(self.partials_dir, "nav.html"))), 3)
+
+    def test_viewed_pages_rebuild_first_and_reload_before_the_rest(self):
+        self.build(viewed=["/about.html", "/"])
+        self.assertEqual(len(self.rebuild(self.template_path)), 3)
+        # The viewed pages' reload went out before the other page was built
+        self.assertEqual(self.livereload.reloads, [({"/about.html", "/"}, set(), ["about.html", "index.html"])])
+
+    def test_static_file_reloads_every_viewer(self):
+        self.build(viewed=["/about.html"])
+        path = os.path.join(self.static_dir, "index.css")
+        self.write(path, "body { margin: 0; }")
+        # Without fingerprinting no page changes, but any page may use the file
+        self.assertEqual(self.rebuild(path), [])
+        with open(os.path.join(self.dest_dir, "index.css")) as f:
+            self.assertEqual(f.read(), "body { margin: 0; }")
+        self.assertEqual(self.livereload.reloads, [(None, set(), [])])
+
+    def test_renamed_asset_rebuilds_the_pages_referencing_it(self):
+        self.build(viewed=["/posts/ring.html"], fingerprint=True)
+        path = os.path.join(self.static_dir, "ring.png")
+        self.write(path, "a new ring")
+        ring = os.path.join("posts", "ring.html")
+        self.assertEqual(self.rebuild(path), [ring])
+        self.assertEqual(
+            self.livereload.reloads,
+            [({"/posts/ring.html"}, set(), [ring]), (None, {"/posts/ring.html"}, [ring])],
+        )
+
+    def test_renamed_template_asset_rebuilds_every_page(self):
+        self.build(fingerprint=True)
+        path = os.path.join(self.static_dir, "index.css")
+        self.write(path, "body { margin: 0; }")
+        self.assertEqual(len(self.rebuild(path)), 3)
+        with open(os.path.join(self.dest_dir, "about.html")) as f:
+            self.assertIn(assets.asset_url("/index.css"), f.read())
+        self.assertNotEqual(assets.asset_url("/index.css"), "/index.css")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,17 +1,39 @@
-from htmlnode import LeafNode
+from enum import IntEnum
 
-text_type_text = "text"
-text_type_bold = "bold"
-text_type_italic = "italic"
-text_type_code = "code"
-text_type_link = "link"
-text_type_image = "image"
+import image_size
+from assets import asset_url
+from htmlnode import ImageNode, LeafNode, LinkNode
+
+
+class TextType(IntEnum):
+    TEXT = 0
+    BOLD = 1
+    ITALIC = 2
+    CODE = 3
+    LINK = 4
+    IMAGE = 5
+
+    def __str__(self):
+        return self.name.lower()
+
+
+text_type_text = TextType.TEXT
+text_type_bold = TextType.BOLD
+text_type_italic = TextType.ITALIC
+text_type_code = TextType.CODE
+text_type_link = TextType.LINK
+text_type_image = TextType.IMAGE
+
+# Lets callers keep passing the old string names ("bold", "link", ...)
+text_types_by_name = {str(text_type): text_type for text_type in TextType}
 
 
 class TextNode:
+    __slots__ = ("text", "text_type", "url")
+
     def __init__(self, text, text_type, url=None):
         self.text = text
-        self.text_type = text_type
+        self.text_type = text_types_by_name.get(text_type, text_type)
         self.url = url
 
     def __eq__(self, other):
@@ -25,17 +47,26 @@ class TextNode:
         return f"TextNode({self.text}, {self.text_type}, {self.url})"
 
 
+text_node_converters = {
+    text_type_text: lambda text_node: LeafNode(None, text_node.text),
+    text_type_bold: lambda text_node: LeafNode("b", text_node.text),
+    text_type_italic: lambda text_node: LeafNode("i", text_node.text),
+    text_type_code: lambda text_node: LeafNode("code", text_node.text),
+    # Asset URLs are swapped for their fingerprinted names as the node is made
+    text_type_link: lambda text_node: LinkNode(text_node.text, asset_url(text_node.url)),
+    text_type_image: lambda text_node: image_node(text_node),
+}
+
+
+def image_node(text_node):
+    # Sizes are looked up by the URL as written, before fingerprinting
+    lazy = image_size.active_sizes is not None
+    size = image_size.image_size(text_node.url)
+    return ImageNode(asset_url(text_node.url), text_node.text, size, lazy)
+
+
 def text_node_to_html_node(text_node):
-    if text_node.text_type == text_type_text:
-        return LeafNode(None, text_node.text)
-    if text_node.text_type == text_type_bold:
-        return LeafNode("b", text_node.text)
-    if text_node.text_type == text_type_italic:
-        return LeafNode("i", text_node.text)
-    if text_node.text_type == text_type_code:
-        return LeafNode("code", text_node.text)
-    if text_node.text_type == text_type_link:
-        return LeafNode("a", text_node.text, {"href": text_node.url})
-    if text_node.text_type == text_type_image:
-        return LeafNode("img", "", {"src": text_node.url, "alt": text_node.text})
-    raise ValueError(f"Invalid text type: {text_node.text_type}")
+    converter = text_node_converters.get(text_node.text_type)
+    if converter is None:
+        raise ValueError(f"Invalid text type: {text_node.text_type}")
+    return converter(text_node)
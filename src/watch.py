@@ -0,0 +1,58 @@
+import os
+import time
+
+
+class Watcher:
+    # Polls mtimes and sizes; portable and cheap enough for a content tree
+    def __init__(self, paths, interval=0.25):
+        self.paths = paths
+        self.interval = interval
+        self.state = self.snapshot()
+
+    def snapshot(self):
+        state = {}
+        for path in self.paths:
+            if os.path.isfile(path):
+                self.stat_into(state, path)
+                continue
+            for root, dirs, files in os.walk(path):
+                for file in files:
+                    self.stat_into(state, os.path.join(root, file))
+        return state
+
+    def stat_into(self, state, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        state[path] = (stat.st_mtime_ns, stat.st_size)
+
+    def poll(self):
+        new_state = self.snapshot()
+        changed = []
+        for path, signature in new_state.items():
+            if self.state.get(path) != signature:
+                changed.append(path)
+        for path in self.state:
+            if path not in new_state:
+                changed.append(path)
+        self.state = new_state
+        return changed
+
+    def wait(self):
+        while True:
+            changed = self.poll()
+            if changed:
+                return changed
+            time.sleep(self.interval)
+
+
+def edit_time(paths):
+    # The newest mtime among the changed files, or now for deletions
+    times = []
+    for path in paths:
+        try:
+            times.append(os.stat(path).st_mtime)
+        except OSError:
+            times.append(time.time())
+    return max(times)